@@ -0,0 +1,120 @@
+# 📁 文件：benchmarks/code_blocks.py
+# 代码块提取对比：整段正则 vs 单遍围栏解析，以及流式场景下每段重扫累计文本 vs 增量解析，在数百KB的对话记录上计时
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.fences import FenceParser, parse_blocks, is_runnable  # noqa: E402
+
+# 原先 CodeCapture 使用的正则
+LEGACY = re.compile(r'```(?:python)?\s*(.*?)```', re.DOTALL)
+
+PROSE = "模型假设人群均匀混合，感染率与接触次数成正比。我们比较不同参数下的峰值时间与最终规模。\n"
+PYTHON = "import numpy as np\n\ndef step(s, i, r, beta={b}, gamma=0.1):\n    new = beta * s * i\n" \
+         "    return s - new, i + new - gamma * i, r + gamma * i\n\nprint(step(0.99, 0.01, 0.0))\n"
+SECTIONS = [
+    lambda rng: PROSE * rng.randint(2, 8),
+    lambda rng: f"```python\n{PYTHON.format(b=rng.random())}```\n",
+    lambda rng: "```bash\npip install numpy matplotlib\n```\n",
+    lambda rng: f"```\n{PYTHON.format(b=rng.random())}```\n",
+    lambda rng: ">>> 示例：\n```python\n>>> step(0.99, 0.01, 0.0)\n(0.98, 0.02, 0.0)\n```\n",
+    lambda rng: "````markdown\n在回复中这样给出代码：\n```python\nprint('x')\n```\n````\n",
+]
+
+
+def make_transcript(size_kb, seed):
+    rng = random.Random(seed)
+    parts, total = [], 0
+    while total < size_kb * 1024:
+        part = rng.choice(SECTIONS)(rng)
+        parts.append(part)
+        total += len(part.encode("utf-8"))
+    parts.append(f"```python\n{PYTHON.format(b=0.5)}")  # 末尾未闭合的代码块
+    return "".join(parts)
+
+
+def chunks_of(text, size, seed):
+    rng = random.Random(seed)
+    pos = 0
+    while pos < len(text):
+        step = rng.randint(1, size)
+        yield text[pos:pos + step]
+        pos += step
+
+
+def legacy_blocks(text):
+    return [block.strip() for block in LEGACY.findall(text)]
+
+
+def parser_blocks(text):
+    return [b.code for b in parse_blocks(text) if is_runnable(b)]
+
+
+def legacy_stream(chunks):
+    """不做增量解析时，每收到一段都要对累计文本重新匹配"""
+    text, blocks = "", []
+    for chunk in chunks:
+        text += chunk
+        blocks = legacy_blocks(text)
+    return blocks
+
+
+def parser_stream(chunks):
+    parser = FenceParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return [b.code for b in parser.blocks if is_runnable(b)]
+
+
+def _compiles(code):
+    try:
+        compile(code, "<block>", "exec")
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+
+def best_time(func, repeats, *args):
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='代码块提取性能对比')
+    parser.add_argument('--sizes-kb', type=int, nargs='+', default=[100, 300, 800])
+    parser.add_argument('--chunk-chars', type=int, default=64, help="流式场景每段的最大字符数")
+    parser.add_argument('--stream-max-kb', type=int, default=300, help="重扫方式的流式测试只在不超过该大小时运行")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'size (KB)':>10}{'method':>10}{'time (s)':>11}{'blocks':>8}{'runnable':>10}")
+    for size in args.sizes_kb:
+        text = make_transcript(size, args.seed)
+        truth = len(parse_blocks(text))
+        for name, func in [('regex', legacy_blocks), ('parser', parser_blocks)]:
+            elapsed, blocks = best_time(func, args.repeats, text)
+            runnable = sum(1 for b in blocks if _compiles(b))
+            print(f"{'whole':<8}{size:>10}{name:>10}{elapsed:>11.4f}{len(blocks):>8}{runnable:>10}")
+        chunks = list(chunks_of(text, args.chunk_chars, args.seed))
+        for name, func in [('regex', legacy_stream), ('parser', parser_stream)]:
+            if name == 'regex' and size > args.stream_max_kb:
+                continue
+            elapsed, blocks = best_time(func, 1 if name == 'regex' else args.repeats, chunks)
+            runnable = sum(1 for b in blocks if _compiles(b))
+            print(f"{'stream':<8}{size:>10}{name:>10}{elapsed:>11.4f}{len(blocks):>8}{runnable:>10}")
+        print(f"{'':<8}{size:>10}{'fences':>10}{'':>11}{truth:>8}")
+
+
+if __name__ == '__main__':
+    main()
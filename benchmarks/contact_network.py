@@ -0,0 +1,99 @@
+# 📁 文件：benchmarks/contact_network.py
+# 真实接触网络的读取对比：首次解析边列表建CSR缓存、之后内存映射缓存、networkx读取边列表，
+# 以及在映射的CSR上直接运行 sparse / event 引擎的耗时；读取方式另测Python堆峰值内存（内存映射的页面不计入）
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from test import EpidemicModels, load_contact_network, write_contact_network  # noqa: E402
+
+
+def make_edge_list(path, nodes, degree, seed):
+    """环形格点按0.3的概率随机重连（与watts_strogatz相近），节点编号随机取自 [0, 100×节点数)，
+    模拟真实数据中不连续的编号"""
+    rng = np.random.default_rng(seed)
+    ids = rng.choice(100 * nodes, size=nodes, replace=False)
+    u = np.repeat(np.arange(nodes), degree // 2)
+    v = (u + np.tile(np.arange(1, degree // 2 + 1), nodes)) % nodes
+    rewire = rng.random(len(v)) < 0.3
+    v[rewire] = rng.integers(0, nodes, size=rewire.sum())
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# u v\n")
+        pd.DataFrame({'u': ids[u], 'v': ids[v]}).to_csv(f, sep=' ', header=False, index=False)
+    return len(u)
+
+
+def measure(func, trace=True):
+    """耗时取自不开追踪的一次运行；trace=True 时再以 tracemalloc 追踪运行一次得到峰值内存（MB），否则为None"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='接触网络读取与模拟基准')
+    parser.add_argument('--nodes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--degree', type=int, default=10, help="平均度（偶数）")
+    parser.add_argument('--steps', type=int, default=50)
+    parser.add_argument('--engines', nargs='+', default=['sparse', 'event'], choices=['sparse', 'event'])
+    parser.add_argument('--networkx-max-edges', type=int, default=1_000_000,
+                        help="networkx读取只在边数不超过该值时运行")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    model = EpidemicModels(render_mode='off')
+    print(f"{'nodes':>10}{'edges':>11}{'case':>12}{'time (s)':>11}{'peak (MB)':>11}  note")
+    for nodes in args.nodes:
+        workdir = tempfile.mkdtemp(prefix='contact-network-')
+        try:
+            edge_path = os.path.join(workdir, 'edges.txt')
+            cache = os.path.join(workdir, 'cache')
+            edges = make_edge_list(edge_path, nodes, args.degree, args.seed)
+            text_mb = os.path.getsize(edge_path) / 2 ** 20
+
+            def row(case, elapsed, peak, note=""):
+                peak = "-" if peak is None else f"{peak:.1f}"
+                print(f"{nodes:>10}{edges:>11}{case:>12}{elapsed:>11.3f}{peak:>11}  {note}")
+
+            elapsed, peak, network = measure(lambda: write_contact_network(edge_path, cache))
+            row('build', elapsed, peak, f"edge list {text_mb:.0f} MB -> cache {dir_size(cache) / 2 ** 20:.0f} MB")
+            elapsed, peak, network = measure(lambda: load_contact_network(edge_path, cache))
+            row('mmap', elapsed, peak)
+            if edges <= args.networkx_max_edges:
+                elapsed, peak, _ = measure(
+                    lambda: model.graph_to_csr(nx.read_edgelist(edge_path, nodetype=int, data=False)))
+                row('networkx', elapsed, peak, "read_edgelist + graph_to_csr")
+            for engine in args.engines:
+                elapsed, peak, (_, trace) = measure(lambda: model.network_simulation(
+                    network, args.steps, engine=engine, seed=args.seed, record='counts'), trace=False)
+                _, infected, recovered = trace.counts[-1]
+                row(engine, elapsed, peak, f"final size {(infected + recovered) / len(network):.1%}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# 📁 文件：benchmarks/llm_client.py
+# LLM客户端调度检查：在本地模拟服务器上测量连接复用、429/5xx退避重试、备用模型回退与对冲请求
+
+import os
+import sys
+import time
+import argparse
+
+from openai import OpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.llm_client import DeepSeekClient, close_shared_clients  # noqa: E402
+from utils.metrics import CallMetrics  # noqa: E402
+from utils.mock_server import MockLLMServer  # noqa: E402
+
+PROFILES = {
+    "fast": {"ttft": 0.02},
+    "flaky": {"fail_first": 2, "status": 503},
+    "limited": {"fail_first": 1, "status": 429, "retry_after": 0.2},
+    "down": {"fail_first": 10 ** 6, "status": 500},
+    "slow": {"ttft": 2.0},
+}
+
+# (名称, 主模型, 备用模型, 对冲等待秒数)
+SCENARIOS = [
+    ('5xx retry', 'flaky', None, None),
+    ('429 retry-after', 'limited', None, None),
+    ('fallback', 'down', 'fast', None),
+    ('hedge', 'slow', 'fast', 0.3),
+]
+
+
+def time_connections(base_url, server, requests):
+    """顺序发送请求：每次新建客户端 vs 共用连接池，返回 (耗时, 新建TCP连接数)"""
+    results = {}
+    for mode in ['fresh', 'pooled']:
+        before = server.stats["connections"]
+        start = time.perf_counter()
+        if mode == 'pooled':
+            client = DeepSeekClient({"api_key": "mock", "base_url": base_url, "model": "fast"})
+        for _ in range(requests):
+            if mode == 'fresh':
+                with OpenAI(api_key="mock", base_url=base_url, max_retries=0) as fresh:
+                    fresh.chat.completions.create(model="fast", messages=[{"role": "user", "content": "hi"}])
+            else:
+                client.create({"model": "fast", "messages": [{"role": "user", "content": "hi"}]})
+        results[mode] = (time.perf_counter() - start, server.stats["connections"] - before)
+    return results
+
+
+def run_scenario(base_url, model, fallback, hedge_after, max_retries):
+    metrics = CallMetrics()
+    config = {"api_key": "mock", "base_url": base_url, "model": model, "max_retries": max_retries,
+              "fallback_model": fallback, "hedge_after": hedge_after}
+    client = DeepSeekClient(config, agent_name=model, metrics=metrics)
+    start = time.perf_counter()
+    try:
+        response = client.create({"model": model, "messages": [{"role": "user", "content": "hi"}]})
+        served_by = response.model
+    except Exception as e:
+        served_by = type(e).__name__
+    call = metrics.calls[-1]
+    return time.perf_counter() - start, served_by, call["retries"], call["hedged"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM客户端连接池与重试策略检查')
+    parser.add_argument('--requests', type=int, default=50, help="连接复用测试的请求数")
+    parser.add_argument('--max-retries', type=int, default=3)
+    args = parser.parse_args()
+
+    with MockLLMServer(profiles=PROFILES) as server:
+        base_url = server.base_url
+        print(f"{'client':<12}{'requests':>9}{'time (s)':>11}{'connections':>13}")
+        for mode, (elapsed, connections) in time_connections(base_url, server, args.requests).items():
+            print(f"{mode:<12}{args.requests:>9}{elapsed:>11.3f}{connections:>13}")
+
+        print(f"\n{'scenario':<18}{'model':>8}{'served by':>22}{'retries':>9}{'hedged':>8}{'time (s)':>10}")
+        for name, model, fallback, hedge_after in SCENARIOS:
+            elapsed, served_by, retries, hedged = run_scenario(base_url, model, fallback, hedge_after,
+                                                               args.max_retries)
+            print(f"{name:<18}{model:>8}{served_by:>22}{retries:>9}{str(hedged):>8}{elapsed:>10.3f}")
+    close_shared_clients()
+
+
+if __name__ == '__main__':
+    main()
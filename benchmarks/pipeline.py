@@ -0,0 +1,145 @@
+# 📁 文件：benchmarks/pipeline.py
+# 整条协作流程的离线基准：本地回放服务器按延迟与生成速度配置返回录制的对话，main.py 经 DEEPSEEK_BASE_URL 连接，
+# 测量单次运行、流式输出与批量并发下的总耗时、LLM等待时间与编排开销
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from utils.mock_server import MockLLMServer, Transcript  # noqa: E402
+
+MAIN = os.path.join(ROOT, "main.py")
+
+# 回放的延迟配置：ttft 首token等待秒数，tokens_per_s 生成速度（0为不限速），未给出的项取录制值
+PROFILES = {
+    "instant": {"ttft": 0, "tokens_per_s": 0},
+    "fast": {"ttft": 0.05, "tokens_per_s": 1500},
+    "deepseek": {"ttft": 0.8, "tokens_per_s": 50, "jitter": 0.2},
+    "recorded": {},
+}
+
+# 场景名称 -> main.py参数；batch 场景的参数由 --jobs 与 --batch-workers 生成
+SCENARIOS = {
+    "single": [],
+    "stream": ["--stream"],
+    "patches": ["--code-patches"],
+    "batch": None,
+}
+
+CODE = ("import numpy as np\n\n"
+        "def sir(beta=0.3, gamma=0.1, days=160, n=1000):\n"
+        "    s, i, r = n - 1.0, 1.0, 0.0\n"
+        "    history = []\n"
+        "    for _ in range(days):\n"
+        "        new, rec = beta * s * i / n, gamma * i\n"
+        "        s, i, r = s - new, i + new - rec, r + rec\n"
+        "        history.append((s, i, r))\n"
+        "    return np.array(history)\n\n"
+        "print(sir()[-1])\n")
+PROSE = "传播动力学由接触率与恢复率共同决定，基本再生数决定疫情能否暴发。"
+
+# 没有录制记录时使用的合成对话：按系统提示开头匹配各角色，内容长度接近真实回复
+SYNTHETIC = [
+    ("你只负责总结研究主题的背景", PROSE * 12 + "\n背景分析完成，请Questioner提出科学问题。"),
+    ("你只基于研究背景提出", PROSE * 6 + "\n问题已提出，请Coder编写模型代码。"),
+    ("你只负责编写Python建模代码", f"```python\n{CODE}```\n代码编写完成，请BugFinder检查。"),
+    ("你检查代码错误", PROSE * 4 + "\n问题已标记，请Fixer修复。"),
+    ("你修复BugFinder的问题", f"```python\n{CODE}```\n修复完成，请Verifier验证。"),
+    ("你验证代码合理性", PROSE * 2 + f"\n```python\n{CODE}```\n验证通过，请Writer撰写论文。"),
+    ("仅在收到'请Writer撰写论文'后", "# 研究论文\n## 引言\n" + PROSE * 30 + "\n论文撰写完成，TERMINATE"),
+]
+
+
+def synthetic_transcript():
+    return Transcript([{"role": role, "content": content} for role, content in SYNTHETIC])
+
+
+def run_main(base_url, flags, stdin, workdir, timeout):
+    """在独立目录中运行一次 main.py，返回 (耗时, 各次运行的指标报告列表)"""
+    env = dict(os.environ, DEEPSEEK_BASE_URL=base_url, DEEPSEEK_API_KEY="replay")
+    log_path = os.path.join(workdir, "stdout.log")
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        code = subprocess.run([sys.executable, MAIN, "--rate-limit", "0", *flags], input=stdin, text=True,
+                              cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT, timeout=timeout).returncode
+    wall = time.perf_counter() - start
+    if code:
+        raise RuntimeError(f"main.py 退出码{code}，输出见 {log_path}")
+    reports = []
+    for path in glob.glob(os.path.join(workdir, "output", "**", "run_metrics.json"), recursive=True):
+        with open(path, encoding="utf-8") as f:
+            reports.append(json.load(f))
+    return wall, reports
+
+
+def run_scenario(server, name, args, workdir):
+    if name == "batch":
+        jobs_path = os.path.join(workdir, "jobs.jsonl")
+        with open(jobs_path, "w", encoding="utf-8") as f:
+            for n in range(args.jobs):
+                f.write(json.dumps({"id": f"job{n}", "theme": f"传染病建模{n}", "text": "比较SIR与SEIR"},
+                                   ensure_ascii=False) + "\n")
+        flags = ["--batch", jobs_path, "--batch-workers", str(args.batch_workers)]
+    else:
+        flags = SCENARIOS[name]
+    before = dict(server.stats["replayed"])
+    wall, reports = run_main(server.base_url, flags, "传染病建模\n比较SIR与SEIR\n", workdir, args.timeout)
+    collab = sum(r["collaboration_time"] for r in reports)
+    llm = sum(c["latency"] for r in reports for c in r["calls"])
+    return {
+        "wall_time": round(wall, 4), "runs": len(reports), "calls": sum(len(r["calls"]) for r in reports),
+        "collaboration_time": round(collab, 4), "llm_time": round(llm, 4),
+        "overhead": round(collab - llm, 4),  # 各次运行内不在等待LLM的时间：建群聊、选发言者、代码捕获、写文件
+        "startup": round(wall - collab, 4) if name != "batch" else None,  # 解释器启动、导入与创建智能体
+        "parallelism": round(collab / wall, 2),
+        "replayed": {k: server.stats["replayed"][k] - before[k] for k in before},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='协作流程离线基准（录制回放）')
+    parser.add_argument('--transcript', type=str, default=None,
+                        help="python -m utils.mock_server record 录制的JSONL；不给出时使用内置的合成对话")
+    parser.add_argument('--profiles', nargs='+', default=['instant', 'fast'], choices=list(PROFILES))
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--jobs', type=int, default=6, help="批量场景的任务数")
+    parser.add_argument('--batch-workers', type=int, default=3, help="批量场景的并发任务数")
+    parser.add_argument('--timeout', type=float, default=600, help="每次运行的超时秒数")
+    parser.add_argument('--output', type=str, default=None, help="把结果写入该JSON文件")
+    parser.add_argument('--keep', action='store_true', help="保留各次运行的工作目录")
+    args = parser.parse_args()
+
+    transcript = Transcript.load(args.transcript) if args.transcript else synthetic_transcript()
+    results = {}
+    print(f"{'profile':<10}{'scenario':<10}{'wall (s)':>10}{'startup':>9}{'llm (s)':>9}{'overhead':>10}"
+          f"{'calls':>7}{'parallel':>10}  replayed")
+    for profile in args.profiles:
+        with MockLLMServer(profiles={"*": PROFILES[profile]}, transcript=transcript, chunk_chars=8) as server:
+            for name in args.scenarios:
+                workdir = tempfile.mkdtemp(prefix=f"pipeline-{profile}-{name}-")
+                result = run_scenario(server, name, args, workdir)  # 出错时保留工作目录以便查看输出
+                if not args.keep:
+                    shutil.rmtree(workdir, ignore_errors=True)
+                results[f"{profile}/{name}"] = result
+                startup = "" if result["startup"] is None else f"{result['startup']:.2f}"
+                replayed = " ".join(f"{k}={v}" for k, v in result["replayed"].items())
+                print(f"{profile:<10}{name:<10}{result['wall_time']:>10.2f}{startup:>9}{result['llm_time']:>9.2f}"
+                      f"{result['overhead']:>10.2f}{result['calls']:>7}{result['parallelism']:>10.2f}  {replayed}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"transcript": args.transcript or "synthetic", "profiles": {p: PROFILES[p] for p in args.profiles},
+                       "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\nResults saved: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+# 📁 文件：benchmarks/simulations.py
+# 模拟引擎基准：网络传播、SIR/SEIR常微分方程与考试焦虑分析在不同规模下的耗时、峰值内存与吞吐量，
+# 结果写入JSON基线，与上次基线对比标记性能回退；关闭绘图，完全离线运行
+
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import numpy as np
+import scipy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from test import EpidemicModels, VALID_GRAPH_TYPES  # noqa: E402
+from test2 import ExamAnxietySimulator  # noqa: E402
+
+SUITES = ['network', 'ode', 'students']
+
+# 默认扫描范围与 --quick 时的缩小版本
+SWEEPS = {
+    'sizes': ([1000, 10000, 100000], [1000, 5000]),
+    'steps': ([50, 200], [50]),
+    'days': ([160, 1600, 16000], [160, 1600]),
+    'students': ([1000, 10000, 100000], [1000, 10000]),
+}
+
+
+def measure(func, repeats, trace=True):
+    """峰值内存（MB）由一次 tracemalloc 追踪运行得到，它同时作为预热（延迟导入、缓存）；
+    最短耗时取自之后不开追踪的重复运行。trace=False 时只计时，峰值内存返回None"""
+    peak = None
+    if trace:
+        tracemalloc.start()
+        try:
+            with redirect_stdout(io.StringIO()):
+                func()
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best, peak
+
+
+def network_cases(args):
+    for graph_type in args.graph_types:
+        for size in args.sizes:
+            # 随机图的连边概率固定为0.05，边数随规模平方增长
+            if graph_type == 'random' and size > args.random_max_size:
+                continue
+            model = EpidemicModels(network_size=size, render_mode='off')
+            # 图与CSR在计时之外只构建一次，各用例只计传播引擎本身（与 network_engines.py 相同）
+            start = time.perf_counter()
+            graph = model.build_graph(graph_type, seed=args.seed)
+            adj = model.graph_to_csr(graph)
+            extra = {'build_time': round(time.perf_counter() - start, 6)}
+
+            for steps in args.steps:
+                for engine in args.engines:
+                    if engine == 'python' and size > args.python_max_size:
+                        continue
+                    key = f"network/{graph_type}/n={size}/steps={steps}/{engine}"
+                    params = {'graph_type': graph_type, 'nodes': size, 'steps': steps, 'engine': engine}
+
+                    def run(model=model, graph=graph, adj=adj, steps=steps, engine=engine):
+                        rng = np.random.default_rng(args.seed)
+                        if engine == 'python':
+                            model._simulate_python(graph, steps, rng, record='counts')
+                        elif engine == 'sparse':
+                            model._simulate_sparse(adj, steps, rng, record='counts')
+                        else:
+                            model._simulate_event(adj, steps, rng, record='counts')
+
+                    yield key, params, run, extra, steps, 'steps/s'
+
+
+def ode_cases(args):
+    for model_type in ['SIR', 'SEIR']:
+        for days in args.days:
+            model = EpidemicModels(days=days, render_mode='off')
+            run = model.run_sir_simulation if model_type == 'SIR' else model.run_seir_simulation
+            yield f"ode/{model_type}/days={days}", {'model': model_type, 'days': days}, run, {}, days, 'days/s'
+
+
+def student_cases(args):
+    for n in args.students:
+        def run(n=n):
+            simulator = ExamAnxietySimulator(n_students=n, render_mode='off', seed=args.seed, n_boot=args.n_boot,
+                                             workers=args.workers)
+            simulator.run_full_analysis()
+
+        yield f"students/n={n}", {'students': n, 'n_boot': args.n_boot}, run, {}, n, 'students/s'
+
+
+def run_suites(args):
+    cases = {}
+    producers = {'network': network_cases, 'ode': ode_cases, 'students': student_cases}
+    print(f"{'case':<48}{'time (s)':>11}{'peak (MB)':>11}{'throughput':>14}  unit")
+    for suite in args.suites:
+        for key, params, run, extra, work, unit in producers[suite](args):
+            wall, peak = measure(run, args.repeats)
+            result = {'suite': suite, **params, 'wall_time': round(wall, 6), 'peak_mb': round(peak, 3), 'unit': unit,
+                      **extra, 'throughput': round(work / wall, 3)}
+            cases[key] = result
+            print(f"{key:<48}{wall:>11.4f}{peak:>11.1f}{result['throughput']:>14.1f}  {unit}")
+    return cases
+
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'scipy': scipy.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def compare(cases, baseline, threshold, min_time):
+    """耗时或峰值内存比基线高出 threshold（比例）以上的用例；耗时差小于 min_time 秒的视为噪声"""
+    regressions = []
+    for key, result in cases.items():
+        old = baseline['cases'].get(key)
+        if old is None:
+            continue
+        if result['wall_time'] > old['wall_time'] * (1 + threshold) \
+                and result['wall_time'] - old['wall_time'] > min_time:
+            regressions.append((key, 'wall_time', old['wall_time'], result['wall_time']))
+        if result['peak_mb'] > old['peak_mb'] * (1 + threshold):
+            regressions.append((key, 'peak_mb', old['peak_mb'], result['peak_mb']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模拟引擎基准测试与回退检查')
+    parser.add_argument('--suites', nargs='+', default=SUITES, choices=SUITES)
+    parser.add_argument('--quick', action='store_true', help="使用缩小的扫描范围，用于快速检查")
+    parser.add_argument('--sizes', type=int, nargs='+', default=None, help="网络节点数")
+    parser.add_argument('--graph-types', nargs='+', default=VALID_GRAPH_TYPES, choices=VALID_GRAPH_TYPES)
+    parser.add_argument('--steps', type=int, nargs='+', default=None, help="网络传播步数")
+    parser.add_argument('--engines', nargs='+', default=['sparse', 'event'], choices=['sparse', 'event', 'python'])
+    parser.add_argument('--random-max-size', type=int, default=2000,
+                        help="随机图（连边概率0.05）只在不超过该规模时运行")
+    parser.add_argument('--python-max-size', type=int, default=10000,
+                        help="python参考引擎只在不超过该规模时运行")
+    parser.add_argument('--days', type=int, nargs='+', default=None, help="SIR/SEIR的积分天数")
+    parser.add_argument('--students', type=int, nargs='+', default=None, help="考试焦虑分析的学生人数")
+    parser.add_argument('--n-boot', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help="把本次结果写入该JSON文件（可作为新的基线）")
+    parser.add_argument('--baseline', type=str, default=None, help="与该JSON基线对比，出现回退时以状态码1退出")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定回退的相对增幅")
+    parser.add_argument('--min-time', type=float, default=0.005, help="耗时差低于该秒数时不判定为回退")
+    args = parser.parse_args()
+    for name, (full, quick) in SWEEPS.items():
+        if getattr(args, name) is None:
+            setattr(args, name, quick if args.quick else full)
+
+    cases = run_suites(args)
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'environment': environment(),
+              'repeats': args.repeats, 'seed': args.seed, 'cases': cases}
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nResults saved: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['environment'] != report['environment']:
+            print("⚠️ 基线来自不同的运行环境，对比结果仅供参考")
+        regressions = compare(cases, baseline, args.threshold, args.min_time)
+        missing = len(set(cases) - set(baseline['cases']))
+        print(f"\n与基线 {args.baseline} 对比（阈值 +{args.threshold:.0%}，基线中没有的用例{missing}个）:")
+        for key, metric, old, new in regressions:
+            print(f"  ❌ {key} {metric}: {old:g} → {new:g} (+{new / old - 1:.0%})")
+        if regressions:
+            raise SystemExit(1)
+        print("  ✅ 没有超过阈值的回退")
+
+
+if __name__ == '__main__':
+    main()
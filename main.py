@@ -4,10 +4,26 @@
 import os
 import re
 import time
+import asyncio
 import argparse
+import json
+import threading
+import uuid
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from autogen import AssistantAgent, UserProxyAgent, GroupChat, GroupChatManager
 from dotenv import load_dotenv
+from utils.orchestrator import Stage, DagOrchestrator, split_code_chunks
+from utils.llm_cache import ResponseCache, DEFAULT_CACHE_PATH
+from utils.llm_client import DeepSeekClient, RateLimiter
+from utils.metrics import CallMetrics
+from utils.logger import DEFAULT_LOG_PATH, get_logger
+from utils.artifacts import ArtifactStore, DEFAULT_ARTIFACT_ROOT, digest_of
+from utils.context import ContextPruner
+from utils.sandbox import ExecutionSandbox, ExecutionFeedback
+from utils.speaker import HandoffSelector
+from utils.patching import PatchError, DIFF_LANGUAGES, apply_patch, make_patch
+from utils.fences import FenceParser, PYTHON_LANGUAGES, parse_blocks, is_runnable
 
 load_dotenv()
 
@@ -21,6 +37,60 @@ parser.add_argument('--chat-model', type=str, default='deepseek-chat',
                     help="非编码类Agent使用的模型")
 parser.add_argument('--save-all', action='store_true',
                     help="保存所有中间代码版本")
+parser.add_argument('--orchestration', type=str, default='groupchat', choices=['groupchat', 'dag'],
+                    help="编排方式: 'groupchat'-轮流发言(默认), 'dag'-按依赖关系异步并发调用")
+parser.add_argument('--speaker-selection', type=str, default='round_robin', choices=['round_robin', 'fsm'],
+                    help="groupchat模式的发言顺序: 'round_robin'-轮流发言(默认), 'fsm'-按交接语句的规则状态机(不调用LLM，支持Verifier退回Fixer)")
+parser.add_argument('--max-fix-loops', type=int, default=2,
+                    help="fsm模式下验证未通过时从Verifier回到Fixer的最多次数")
+parser.add_argument('--max-concurrency', type=int, default=4,
+                    help="dag模式下每个模型的最大并发请求数")
+parser.add_argument('--review-chunk-lines', type=int, default=80,
+                    help="dag模式下BugFinder按该行数分段并发审查代码")
+parser.add_argument('--stream', action='store_true',
+                    help="流式输出：逐token显示回复，并增量写入论文与代码版本文件")
+parser.add_argument('--prune-context', action='store_true',
+                    help="按角色裁剪发给LLM的历史：只保留最新代码版本，背景与问题改为摘要")
+parser.add_argument('--context-budget', type=int, default=8000,
+                    help="裁剪后每次请求的估算token上限（配合 --prune-context）")
+parser.add_argument('--code-patches', action='store_true',
+                    help="Fixer与Verifier只输出unified diff补丁，由本地应用到最新代码上并校验")
+parser.add_argument('--execute', action='store_true',
+                    help="在受限子进程中实际运行每个代码版本，并把运行结果与报错反馈给BugFinder/Fixer/Verifier")
+parser.add_argument('--exec-timeout', type=float, default=60,
+                    help="每个代码版本的运行时间上限（秒）")
+parser.add_argument('--exec-memory-mb', type=float, default=2048,
+                    help="每个代码版本的内存上限（MB，仅Linux/macOS）")
+parser.add_argument('--exec-workers', type=int, default=2,
+                    help="同时运行的代码版本数")
+parser.add_argument('--cache', action=argparse.BooleanOptionalAction, default=False,
+                    help="启用/禁用LLM响应磁盘缓存（按模型、系统提示与消息前缀命中）")
+parser.add_argument('--cache-path', type=str, default=DEFAULT_CACHE_PATH,
+                    help="缓存数据库路径")
+parser.add_argument('--cache-ttl', type=float, default=168,
+                    help="缓存有效期（小时）")
+parser.add_argument('--cache-max-mb', type=float, default=512,
+                    help="缓存容量上限（MB），超出后按最近访问时间淘汰")
+parser.add_argument('--max-retries', type=int, default=3,
+                    help="遇到429/5xx或连接错误时的最大重试次数（带随机抖动的指数退避）")
+parser.add_argument('--fallback-model', type=str, default=None,
+                    help="备用模型：主模型重试用尽后改用它，或在主模型响应过慢时并发对冲")
+parser.add_argument('--hedge-after', type=float, default=20,
+                    help="主模型超过该秒数仍未返回首个token时，同时向备用模型发请求（配合 --fallback-model，0表示不对冲）")
+parser.add_argument('--batch', type=str, default=None, metavar='JOBS.jsonl',
+                    help="批量模式：逐行读取JSONL中的主题（theme/title 与 text/body 字段），并发运行，结果写入 output/batch/<文件名>/<任务id>/")
+parser.add_argument('--batch-workers', type=int, default=3,
+                    help="批量模式下同时进行的任务数")
+parser.add_argument('--artifact-root', type=str, default=DEFAULT_ARTIFACT_ROOT,
+                    help="产物库目录：代码版本、论文与报告按内容去重压缩保存，可按主题查询（python -m utils.artifacts）")
+parser.add_argument('--log-path', type=str, default=DEFAULT_LOG_PATH,
+                    help="每轮发言的JSON-lines日志文件（批量任务共用，按run字段区分）")
+parser.add_argument('--log-max-mb', type=float, default=10,
+                    help="日志文件超过该大小后滚动保存")
+parser.add_argument('--resume', type=str, default=None, metavar='RUN_ID',
+                    help="从检查点续跑一次中断的运行（运行编号见启动时的输出或 python -m utils.artifacts runs），已完成的发言不再请求LLM")
+parser.add_argument('--rate-limit', type=float, default=60,
+                    help="所有Agent与任务共享的API请求速率上限（次/分钟），0表示不限制")
 args = parser.parse_args()
 
 # ==== 计时器装饰器 ====
@@ -37,10 +107,10 @@ def time_tracker(func):
 
 # ==== DeepSeek API配置 ====
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")  # 可指向本地模拟服务器
 
 def get_llm_config(model_name):
-    return {
+    config = {
         "config_list": [{
             "model": model_name,
             "api_key": DEEPSEEK_API_KEY,
@@ -50,6 +120,13 @@ def get_llm_config(model_name):
         "timeout": 120,
         "temperature": 0.3
     }
+    # 所有请求都经由 DeepSeekClient：共用连接池，逐次记录token、首token时间与耗时
+    config["config_list"][0]["model_client_cls"] = "DeepSeekClient"
+    config["config_list"][0]["max_retries"] = args.max_retries
+    if args.fallback_model and args.fallback_model != model_name:
+        config["config_list"][0]["fallback_model"] = args.fallback_model
+        config["config_list"][0]["hedge_after"] = args.hedge_after
+    return config
 
 # ==== 模型选择逻辑 ====
 def select_agent_model(agent_name):
@@ -73,42 +150,58 @@ def create_agent(name, system_message):
     )
 
 # ==== 创建智能体 ====
-researcher = create_agent(
-    "Researcher",
-    "你只负责总结研究主题的背景与研究基础，用清晰条目列出核心知识点。完成后说：'背景分析完成，请Questioner提出科学问题。'"
-)
-questioner = create_agent(
-    "Questioner",
-    "你只基于研究背景提出3-5个值得深入研究的科学问题，并聚焦可量化。完成后说：'问题已提出，请Coder编写模型代码。'"
-)
-coder = create_agent(
-    "Coder",
-    "你只负责编写Python建模代码，输出完整可执行文件，完成后说：'代码编写完成，请BugFinder检查。'"
-)
-bug_finder = create_agent(
-    "BugFinder",
-    "你检查代码错误并指出行号和描述，完成后说：'问题已标记，请Fixer修复。'"
-)
-fixer = create_agent(
-    "Fixer",
-    "你修复BugFinder的问题，输出修复后的完整代码，完成后说：'修复完成，请Verifier验证。'"
-)
-verifier = create_agent(
-    "Verifier",
-    "你验证代码合理性并简要评价，输出最后可运行的完整代码块，必须一字不差把完整代码输出，完成后说：'验证通过，请Writer撰写论文。'"
-)
-writer = create_agent(
-    "Writer",
-    "仅在收到'请Writer撰写论文'后，根据前面内容生成完整Markdown研究论文，结构：引言、方法、结果、讨论、结论。完成后说：'论文撰写完成，TERMINATE'"
-)
+# 补丁模式下Fixer与Verifier只输出diff，完整代码由CodeCapture在本地重建；示例由 make_patch 生成，保证能被 apply_patch 应用
+PATCH_EXAMPLE = make_patch("def step(s, i, beta=0.3):\n    new = beta * s * i\n    return s - new, i + new\n",
+                           "def step(s, i, beta=0.3, gamma=0.1):\n    new = beta * s * i\n"
+                           "    return s - new, i + new - gamma * i\n")
+PATCH_PROTOCOL = ("只输出针对当前最新代码的unified diff补丁（放在```diff代码块中，每个hunk以@@ -行号 +行号 @@开头，"
+                  "保留前后各3行未改动的上下文），不要重复输出完整代码（格式示例：\n```diff\n" + PATCH_EXAMPLE + "\n```\n）")
+
+def create_team():
+    """创建一组互相独立的智能体；批量模式下每个任务各用一组"""
+    researcher = create_agent(
+        "Researcher",
+        "你只负责总结研究主题的背景与研究基础，用清晰条目列出核心知识点。完成后说：'背景分析完成，请Questioner提出科学问题。'"
+    )
+    questioner = create_agent(
+        "Questioner",
+        "你只基于研究背景提出3-5个值得深入研究的科学问题，并聚焦可量化。完成后说：'问题已提出，请Coder编写模型代码。'"
+    )
+    coder = create_agent(
+        "Coder",
+        "你只负责编写Python建模代码，输出完整可执行文件，完成后说：'代码编写完成，请BugFinder检查。'"
+    )
+    bug_finder = create_agent(
+        "BugFinder",
+        "你检查代码错误并指出行号和描述，完成后说：'问题已标记，请Fixer修复。'"
+    )
+    fixer = create_agent(
+        "Fixer",
+        f"你修复BugFinder的问题，{PATCH_PROTOCOL}，完成后说：'修复完成，请Verifier验证。'" if args.code_patches else
+        "你修复BugFinder的问题，输出修复后的完整代码，完成后说：'修复完成，请Verifier验证。'"
+    )
+    # fsm发言顺序下，Verifier可以把代码退回Fixer
+    verify_fail = "；若仍有无法在此修正的错误，指出问题后改说：'验证未通过，请Fixer修复。'" if args.speaker_selection == 'fsm' else ""
+    verifier = create_agent(
+        "Verifier",
+        f"你验证代码合理性并简要评价，如仍需修改，{PATCH_PROTOCOL}；无需修改则不输出代码，完成后说：'验证通过，请Writer撰写论文。'{verify_fail}"
+        if args.code_patches else
+        f"你验证代码合理性并简要评价，输出最后可运行的完整代码块，必须一字不差把完整代码输出，完成后说：'验证通过，请Writer撰写论文。'{verify_fail}"
+    )
+    writer = create_agent(
+        "Writer",
+        "仅在收到'请Writer撰写论文'后，根据前面内容生成完整Markdown研究论文，结构：引言、方法、结果、讨论、结论。完成后说：'论文撰写完成，TERMINATE'"
+    )
+    return [researcher, questioner, coder, bug_finder, fixer, verifier, writer]
 
 # ==== 用户代理 ====
 @time_tracker
-def create_user_proxy():
+def create_user_proxy(interactive=True):
+    """interactive=False 时（批量模式）不向终端请求输入"""
     try:
         return UserProxyAgent(
             name="Student",
-            human_input_mode="TERMINATE",
+            human_input_mode="TERMINATE" if interactive else "NEVER",
             max_consecutive_auto_reply=5,
             code_execution_config={"work_dir": "workspace", "use_docker": False, "timeout": 300},
             description="Student user proxy agent for research collaboration",
@@ -116,121 +209,833 @@ def create_user_proxy():
         )
     except Exception:
         return UserProxyAgent(
-            name="Student", human_input_mode="ALWAYS",
+            name="Student", human_input_mode="ALWAYS" if interactive else "NEVER",
             max_consecutive_auto_reply=5,
             code_execution_config={"work_dir": "workspace", "use_docker": False}
         )
 
-user = create_user_proxy()
-
 # ==== 代码捕获功能 ====
 class CodeCapture:
-    def __init__(self):
+    """保存各Agent输出的代码版本
+
+    每个版本的完整代码存入产物库，versions 中只保留 (版本号, Agent, 时间, 摘要) 引用；
+    deltas=True（补丁模式）时只有第一个版本存完整代码，之后的版本只存与上一版本的差异（make_patch），
+    由 code_at 从基线依次应用重建。digest 始终是完整代码的摘要。
+    Agent输出的diff补丁先应用到最新版本上并校验，失败的补丁记入 rejected，不产生新版本。
+    """
+
+    def __init__(self, store, run_id, directory="output/code_versions", save_all=False, deltas=False):
+        self.store = store
+        self.run_id = run_id
+        self.directory = directory
+        self.deltas = deltas
         self.versions = []
         self.current_version = 0
-        os.makedirs("output/code_versions", exist_ok=True)
+        self.rejected = []
+        self.skipped = {"duplicate": 0, "not_runnable": 0}  # 未保存的代码块：与最新版本相同 / 无法编译
+        self.save_all = save_all
+        self.on_version = None  # 可选回调 on_version(版本号, agent_name, 完整代码)，每产生一个新版本调用一次
+        self._latest = None
+        self._streams = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def extract_blocks(self, content):
+        """返回 [(语言, 代码), ...]：能编译的Python代码块与diff补丁块，其余语言与无法运行的片段跳过"""
+        return [(language, code) for language, code in map(self._accept, parse_blocks(content)) if language]
+
+    def _accept(self, block):
+        """返回 (语言, 代码)，跳过的块返回 (None, None)；无法编译的Python块返回 (None, 'not_runnable')
+        Python块去除首尾空白后须能编译；diff块只去掉首尾空行，以免破坏上下文行的行首空格"""
+        if block.language in DIFF_LANGUAGES:
+            code = block.code.strip("\n")
+            return (block.language, code) if code else (None, None)
+        code = block.code.strip()
+        if not code or block.language not in PYTHON_LANGUAGES:
+            return None, None
+        if not is_runnable(block, code):
+            return None, "not_runnable"
+        return "python", code
 
     def extract_code(self, content):
-        pattern = r'```(?:python)?\s*(.*?)```'
-        blocks = re.findall(pattern, content, re.DOTALL)
-        return [b.strip() for b in blocks if b.strip()]
+        return [b for language, b in self.extract_blocks(content) if language == "python"]
 
-    def save_code_version(self, agent_name, content):
-        code_blocks = self.extract_code(content)
-        if not code_blocks:
-            return None
-        files = []
-        for block in code_blocks:
+    def latest_code(self):
+        return self._latest
+
+    def code_at(self, version):
+        """从产物库重建指定版本的完整代码：从其之前最近的完整版本开始依次应用差异"""
+        code = None
+        for entry in self.versions:
+            if "delta" in entry:
+                code = apply_patch(code, self.store.get(entry["delta"]), check_syntax=False)
+            else:
+                code = self.store.get(entry["digest"])
+            if entry["version"] == version:
+                return code
+        raise KeyError(version)
+
+    def state(self):
+        """检查点中保存的版本状态：版本引用、计数与跳过/拒绝记录（完整代码已在产物库中）"""
+        return {"versions": self.versions, "current_version": self.current_version,
+                "rejected": self.rejected, "skipped": self.skipped}
+
+    def restore(self, state):
+        self.versions = state["versions"]
+        self.current_version = state["current_version"]
+        self.rejected = state["rejected"]
+        self.skipped = state["skipped"]
+        self._latest = self.code_at(self.versions[-1]["version"]) if self.versions else None
+
+    def add_version(self, agent_name, block, patch=False):
+        """登记一个新版本，返回 (版本号, 完整代码)
+
+        补丁无法应用时仍占用一个版本号（保留补丁文件以便排查），完整代码为None；
+        结果与最新版本逐字节相同时不产生新版本，返回 (None, None)。
+        """
+        try:
+            if patch and self._latest is None:
+                raise PatchError("还没有可以打补丁的基线代码")
+            code = apply_patch(self._latest, block) if patch else block
+        except PatchError as e:
             self.current_version += 1
-            filename = f"output/code_versions/ver_{self.current_version}_{agent_name}.py"
+            self.rejected.append({"version": self.current_version, "agent": agent_name, "error": str(e)})
+            print(f"⚠️ {agent_name} 的补丁未能应用: {e}")
+            return self.current_version, None
+        if code == self._latest:
+            self.skipped["duplicate"] += 1
+            return None, None
+        self.current_version += 1
+        version = self.current_version
+        entry = {"version": version, "agent": agent_name, "patch": patch,
+                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        delta = make_patch(self._latest, code) if self.deltas and self.versions else None
+        if delta is not None and apply_patch(self._latest, delta, check_syntax=False) == code:
+            entry["delta"] = self.store.add(self.run_id, "delta", delta, agent=agent_name, version=version)
+            entry["digest"] = digest_of(code.encode("utf-8"))
+        else:
+            # 基线版本，或差异无法逐字节还原（如含\r的行）时存完整代码
+            entry["digest"] = self.store.add(self.run_id, "code", code, agent=agent_name, version=version)
+        self.versions.append(entry)
+        self._latest = code
+        if self.on_version is not None:
+            self.on_version(version, agent_name, code)
+        return version, code
+
+    def _version_file(self, agent_name, version, patch):
+        return os.path.join(self.directory, f"ver_{version}_{agent_name}.{'diff' if patch else 'py'}")
+
+    def _save_block(self, agent_name, language, block):
+        """登记代码块并写出版本文件，返回写入的文件列表"""
+        patch = language in DIFF_LANGUAGES
+        version, code = self.add_version(agent_name, block, patch)
+        if version is None:
+            return []
+        filename = self._version_file(agent_name, version, patch)
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(block)
+        files = [filename]
+        if patch and code is not None and self.save_all:
+            # --save-all 时，补丁版本额外保存重建后的完整代码
+            filename = self._version_file(agent_name, version, patch=False)
             with open(filename, "w", encoding="utf-8") as f:
-                f.write(block)
-            self.versions.append({
-                "version": self.current_version,
-                "agent": agent_name,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "code": block
-            })
+                f.write(code)
             files.append(filename)
         return files
 
-code_capture = CodeCapture()
+    def save_code_version(self, agent_name, content):
+        files = []
+        for block in parse_blocks(content):
+            files += self._save_accepted(agent_name, *self._accept(block))
+        return files or None
 
-# ==== 增强进度回调 ====
-def track_progress(recipient, messages, sender, config):
-    print(f"📬 [{datetime.now().strftime('%H:%M:%S')}] {sender.name} → {recipient.name}")
-    if sender.name in ["Coder", "Fixer", "Verifier"] and messages:
-        last = messages[-1]
-        if "content" in last:
-            files = code_capture.save_code_version(sender.name, last["content"])
-            if files:
-                print(f"💾 {sender.name} 代码已保存: {', '.join(files)}")
-    if sender.name == "Writer" and "请Writer撰写论文" not in manager.groupchat.messages[-2]["content"]:
-        return True, None
-    return False, None
+    def _save_accepted(self, agent_name, language, code):
+        if language is None:
+            if code == "not_runnable":
+                self.skipped["not_runnable"] += 1
+                print(f"⚠️ {agent_name} 的代码块无法编译，未保存为新版本")
+            return []
+        return self._save_block(agent_name, language, code)
 
-# ==== 组聊天管理器 ====
-@time_tracker
-def setup_group_chat():
-    groupchat = GroupChat(
-        agents=[user, researcher, questioner, coder, bug_finder, fixer, verifier, writer],
-        messages=[],
-        max_round=15,
-        speaker_selection_method="round_robin"
-    )
-    return GroupChatManager(
-        groupchat=groupchat,
-        name="Manager",
-        llm_config=get_llm_config(args.chat_model),
-        is_termination_msg=lambda m: "TERMINATE" in m["content"]
-    )
+    # ---- 流式捕获：增量解析代码围栏，代码块边生成边写入临时文件，闭合后再登记为版本 ----
+    def stream_begin(self, agent_name):
+        self._streams[agent_name] = {"parser": FenceParser(), "file": None, "files": []}
 
-manager = setup_group_chat()
-for agent in [researcher, questioner, coder, bug_finder, fixer, verifier, writer]:
-    agent.register_reply([AssistantAgent, UserProxyAgent, GroupChatManager], reply_func=track_progress)
+    def stream_feed(self, agent_name, chunk):
+        state = self._streams.get(agent_name)
+        if state is None:
+            return
+        for event in state["parser"].feed(chunk):
+            self._stream_event(agent_name, state, *event)
 
-# ==== 主流程 ====
-if __name__ == '__main__':
-    os.makedirs("output", exist_ok=True)
-    print("\n🚀 欢迎使用多智能体科研助手")
-    theme = input("请输入研究主题：")
-    text  = input("请输入更具体的文本描述（可选）：")
-    prompt = (
+    def stream_end(self, agent_name):
+        """结束流式捕获，未闭合的代码块按已收到的部分保存；返回本次写入的文件"""
+        state = self._streams.pop(agent_name, None)
+        if state is None:
+            return []
+        for event in state["parser"].close():
+            self._stream_event(agent_name, state, *event)
+        return state["files"]
+
+    def _stream_event(self, agent_name, state, kind, block, text):
+        if kind == "open":
+            if block.language in PYTHON_LANGUAGES + DIFF_LANGUAGES:
+                suffix = "diff" if block.language in DIFF_LANGUAGES else "py"
+                state["partial"] = os.path.join(self.directory, f"streaming_{agent_name}.{suffix}")
+                state["file"] = open(state["partial"], "w", encoding="utf-8")
+        elif state["file"] is None:
+            return
+        elif kind == "text":
+            state["file"].write(text)
+            state["file"].flush()
+        else:
+            # 闭合后按与非流式相同的规则取舍，临时文件换成正式的版本文件
+            state["file"].close()
+            state["file"] = None
+            os.remove(state["partial"])
+            state["files"] += self._save_accepted(agent_name, *self._accept(block))
+
+# ==== 流式输出 ====
+class StreamRouter:
+    """把各Agent的流式token实时打印到终端，并增量写入论文与代码版本文件"""
+
+    def __init__(self, code_capture, summary_path="output/research_summary.md"):
+        self.code_capture = code_capture
+        self.summary_path = summary_path
+        self._lock = threading.Lock()
+        self._active = None
+        self._streamed = set()
+
+    def begin(self, agent_name):
+        with self._lock:
+            if agent_name == "Writer":
+                open(self.summary_path, "w", encoding="utf-8").close()
+            if agent_name in ["Coder", "Fixer", "Verifier"]:
+                self.code_capture.stream_begin(agent_name)
+
+    def feed(self, agent_name, text):
+        with self._lock:
+            if self._active != agent_name:
+                print(f"\n🔴 [{agent_name}] ", end="")
+                self._active = agent_name
+            print(text, end="", flush=True)
+            if agent_name == "Writer":
+                with open(self.summary_path, "a", encoding="utf-8") as f:
+                    f.write(text)
+            self.code_capture.stream_feed(agent_name, text)
+
+    def end(self, agent_name):
+        with self._lock:
+            print()
+            self._active = None
+            files = self.code_capture.stream_end(agent_name)
+            if files:
+                print(f"💾 {agent_name} 代码已保存: {', '.join(files)}")
+            self._streamed.add(agent_name)
+
+    def consume(self, agent_name):
+        """该Agent最近一次回复是否已经以流式方式捕获过（命中缓存时不会产生流）"""
+        with self._lock:
+            streamed = agent_name in self._streamed
+            self._streamed.discard(agent_name)
+            return streamed
+
+# ==== 提示词 ====
+def build_prompt(theme, text):
+    if args.code_patches:
+        fix_steps = "5.Fixer以diff补丁修复\n6.Verifier验证，如需修改同样只给出diff补丁\n"
+    else:
+        fix_steps = "5.Fixer修复\n6.Verifier验证并输出完整代码，必须一字不差把完整代码输出\n"
+    return (
         f"我们要开展一个科研项目，主题：{theme}\n"
         "1.Researcher分析背景\n"
         "2.Questioner提出问题\n"
         "3.Coder编写代码\n"
         "4.BugFinder检查\n"
-        "5.Fixer修复\n"
-        "6.Verifier验证并输出完整代码，必须一字不差把完整代码输出\n"
+        f"{fix_steps}"
         "7.Writer撰写论文\n"
         f"更具体的文本：{text}\n"
     )
+
+ROLE_ORDER = ["Researcher", "Questioner", "Coder", "BugFinder", "Fixer", "Verifier", "Writer"]
+
+# 决定智能体提示词与发言规则的参数写入检查点，续跑时沿用原值
+RESUME_ARGS = ["model", "coder_model", "chat_model", "orchestration", "speaker_selection", "max_fix_loops",
+               "code_patches", "save_all", "prune_context", "context_budget", "execute"]
+
+# ==== 一次科研协作 ====
+class ResearchRun:
+    """一次完整的协作：独立的智能体、群聊、代码捕获与调用指标，所有结果写入 output_dir
+
+    rate_limiter: 可选，多个任务共享的 RateLimiter
+    interactive: 是否允许向终端请求输入；批量模式下为False
+    label: 批量模式下打印在进度信息前的任务名
+    run_id: 本次运行在产物库中的编号，续跑时传入原编号；代码版本、最终产物与每轮的检查点都按它登记。
+    """
+
+    def __init__(self, output_dir="output", rate_limiter=None, interactive=True, label=None, run_id=None):
+        self.output_dir = output_dir
+        self.label = label
+        os.makedirs(output_dir, exist_ok=True)
+        self.run_id = run_id or f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.store = ArtifactStore(args.artifact_root)
+        self.agents = create_team()
+        self.user = create_user_proxy(interactive)
+        self.code_capture = CodeCapture(self.store, self.run_id, self.path("code_versions"), save_all=args.save_all,
+                                        deltas=args.code_patches)
+        self.stream_router = StreamRouter(self.code_capture, self.path("research_summary.md")) if args.stream else None
+        self.manager = self.setup_group_chat()
+        self._captured = 0  # 群聊记录中已处理过的消息数
+
+        for agent in self.agents:
+            agent.register_reply([AssistantAgent, UserProxyAgent, GroupChatManager], reply_func=self.track_progress)
+            # 最先注册：在下一位发言者请求LLM之前保存上一位的代码，使本地执行结果能赶上本轮请求
+            agent.register_hook("process_all_messages_before_reply", self.capture_history)
+
+        # ---- 调用指标 ----
+        self.call_metrics = CallMetrics(round_of=self.current_round)
+        for agent in self.agents + ([] if self.selector else [self.manager]):
+            agent.register_model_client(DeepSeekClient, agent_name=agent.name, on_chunk=self.stream_router,
+                                        metrics=self.call_metrics, rate_limiter=rate_limiter)
+
+        # ---- 发言日志：每轮一条JSON记录，由后台线程批量写入 ----
+        self.turn_logger = get_logger(args.log_path, max_bytes=int(args.log_max_mb * 1024 * 1024))
+        self._logged = 0  # 群聊记录中已写入日志的消息数
+        self._call_cursor = {}  # Agent -> 已计入日志的调用记录位置
+
+        # ---- 上下文裁剪 ----
+        self.context_log = []
+        if args.prune_context:
+            for agent in self.agents:
+                agent.register_hook("process_all_messages_before_reply",
+                                    ContextPruner(agent.name, budget=args.context_budget, log=self.context_log,
+                                                  round_of=self.current_round))
+
+        # ---- LLM响应缓存：各任务共用同一个数据库文件，命中率分别统计 ----
+        self.response_cache = None
+        if args.cache:
+            self.response_cache = ResponseCache(args.cache_path, ttl=args.cache_ttl * 3600,
+                                                max_bytes=int(args.cache_max_mb * 1024 * 1024))
+            for agent in self.agents:
+                agent.client_cache = self.response_cache.for_agent(agent.name)
+            print(f"🗄️ 已启用LLM响应缓存: {args.cache_path}")
+
+        # ---- 本地执行：每个新代码版本立即提交到沙箱运行，BugFinder/Fixer/Verifier回复前等待最新结果 ----
+        self.sandbox = None
+        if args.execute:
+            self.sandbox = ExecutionSandbox(self.path("executions"), workers=args.exec_workers,
+                                            timeout=args.exec_timeout, cpu_seconds=int(args.exec_timeout),
+                                            memory_mb=args.exec_memory_mb)
+            self.code_capture.on_version = self.sandbox.submit
+            for agent in self.agents:
+                if agent.name in ["BugFinder", "Fixer", "Verifier"]:
+                    agent.register_hook("process_all_messages_before_reply", ExecutionFeedback(self.sandbox))
+
+    def path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def agent(self, name):
+        return next(agent for agent in self.agents if agent.name == name)
+
+    def log(self, text):
+        print(f"[{self.label}] {text}" if self.label else text)
+
+    # ---- 组聊天管理器 ----
+    @time_tracker
+    def setup_group_chat(self):
+        # fsm模式按交接语句选择下一位发言者，Manager不需要LLM
+        self.selector = None
+        if args.speaker_selection == 'fsm':
+            self.selector = HandoffSelector(code_check=self.check_latest_code,
+                                            before_select=lambda: self.capture_history(None),
+                                            max_fix_loops=args.max_fix_loops)
+        groupchat = GroupChat(
+            agents=[self.user] + self.agents,
+            messages=[],
+            max_round=15,
+            speaker_selection_method=self.selector or "round_robin"
+        )
+        return GroupChatManager(
+            groupchat=groupchat,
+            name="Manager",
+            llm_config=False if self.selector else get_llm_config(args.chat_model),
+            is_termination_msg=lambda m: "TERMINATE" in m["content"]
+        )
+
+    # ---- 增强进度回调 ----
+    def track_progress(self, recipient, messages, sender, config):
+        self.log(f"📬 [{datetime.now().strftime('%H:%M:%S')}] {sender.name} → {recipient.name}")
+        self.log_turns()
+        # 轮流发言时Writer可能被提前轮到：检查上一条消息是否交接给了它。
+        # 原先的条件 sender.name == "Writer" 与 messages[-2] 从未生效：GroupChat中sender总是Manager，
+        # 轮到Writer回复时它自己就是recipient，上一位发言者（通常是Verifier）的消息是群聊记录的最后一条
+        history = self.manager.groupchat.messages
+        if (self.selector is None and recipient.name == "Writer" and history
+                and "请Writer撰写论文" not in (history[-1].get("content") or "")):
+            return True, None
+        return False, None
+
+    def log_turn(self, agent_name, content, round_id):
+        """写入一轮发言：token与耗时取该Agent上次记录之后的调用（命中缓存时为0）"""
+        calls = self.call_metrics.calls
+        start = self._call_cursor.get(agent_name, 0)
+        self._call_cursor[agent_name] = len(calls)
+        calls = [c for c in calls[start:] if c["agent"] == agent_name]
+        self.turn_logger.log(
+            run=self.label or self.output_dir, round=round_id, agent=agent_name,
+            model=calls[-1]["model"] if calls else None, calls=len(calls),
+            prompt_tokens=sum(c["prompt_tokens"] for c in calls),
+            completion_tokens=sum(c["completion_tokens"] for c in calls),
+            latency=round(sum(c["latency"] for c in calls), 4),
+            ttft=calls[0]["ttft"] if calls else None, content=content)
+
+    def log_turns(self):
+        """把群聊中尚未写入日志的发言写入日志（下一位发言者开始回复时，上一位的调用指标已记录完毕）"""
+        history = self.manager.groupchat.messages
+        for index in range(self._logged, len(history)):
+            message = history[index]
+            self.log_turn(message.get("name") or message.get("role"), message.get("content") or "", index)
+        self._logged = len(history)
+
+    def check_latest_code(self):
+        """Verifier放行前的代码检查：启用本地执行时，最新版本必须运行成功"""
+        if self.sandbox is None:
+            return True, None
+        version, future = self.sandbox.latest()
+        if future is None:
+            return True, None
+        result = future.result()
+        return result["status"] == "ok", f"版本{version}本地执行{result['status']}"
+
+    # ---- 代码捕获 ----
+    def capture_reply(self, agent_name, content):
+        """保存回复中的代码块；流式模式下已增量保存过的回复不再重复保存"""
+        if agent_name not in ["Coder", "Fixer", "Verifier"]:
+            return
+        if self.stream_router is not None and self.stream_router.consume(agent_name):
+            return
+        files = self.code_capture.save_code_version(agent_name, content)
+        if files:
+            self.log(f"💾 {agent_name} 代码已保存: {', '.join(files)}")
+
+    def capture_history(self, messages):
+        """process_all_messages_before_reply钩子：保存群聊中尚未处理过的回复里的代码，然后写入检查点。
+        GroupChat中sender总是Manager，发言者从消息的name字段读取。"""
+        history = self.manager.groupchat.messages
+        if len(history) == self._captured:
+            return messages
+        for message in history[self._captured:]:
+            if message.get("content"):
+                self.capture_reply(message.get("name"), message["content"])
+        self._captured = len(history)
+        self.log_turns()  # 检查点中的发言须已写入日志，续跑时不再重复记录
+        self.checkpoint()
+        return messages
+
+    # ---- 检查点 ----
+    def checkpoint(self):
+        """每轮发言完成后覆盖写入检查点：群聊记录、代码版本状态、发言顺序状态、调用指标与运行信息。
+        fsm模式下在选择下一位发言者之前写入，此时状态机尚未处理最后一条消息，续跑时由它重新选择。"""
+        self.store.save_checkpoint(self.run_id, {
+            "run_id": self.run_id, "theme": self.theme, "text": self.text, "label": self.label,
+            "output_dir": self.output_dir, "updated": datetime.now().isoformat(timespec="seconds"),
+            "elapsed": round(time.time() - self._start_time, 2),
+            "args": {key: getattr(args, key) for key in RESUME_ARGS},
+            "messages": self.manager.groupchat.messages,
+            "code": self.code_capture.state(),
+            "selector": self.selector.state() if self.selector is not None else None,
+            "calls": list(self.call_metrics.calls),
+            "context_log": self.context_log,
+        })
+
+    def restore(self, checkpoint):
+        """恢复检查点中的状态；群聊记录由 continue_chat 载入"""
+        self._start_time -= checkpoint["elapsed"]
+        self.code_capture.restore(checkpoint["code"])
+        if self.selector is not None and checkpoint["selector"] is not None:
+            self.selector.restore(checkpoint["selector"])
+        self.call_metrics.calls = list(checkpoint["calls"])
+        self.context_log = checkpoint["context_log"]
+        self._captured = self._logged = len(checkpoint["messages"])
+        self._call_cursor = {agent.name: len(self.call_metrics.calls) for agent in self.agents}
+        if self.sandbox is not None and self.code_capture.versions:
+            # 沙箱中的执行结果不在检查点里，重新运行最新版本供后续反馈与验证使用
+            entry = self.code_capture.versions[-1]
+            self.sandbox.submit(entry["version"], entry["agent"], self.code_capture.latest_code())
+
+    def continue_chat(self, messages):
+        """把已完成的发言载入各Agent与群聊（不请求LLM），由最后一位发言者重新发出其消息，从下一位继续"""
+        groupchat = self.manager.groupchat
+        groupchat.max_round = max(1, groupchat.max_round - (len(messages) - 1))  # 已完成的轮次计入原有上限
+        last_agent, last_message = self.manager.resume(messages, silent=True)
+        self.log(f"♻️ 从检查点续跑 {self.run_id}：已完成{len(messages)}条发言，从 {last_agent.name} 之后继续")
+        last_agent.initiate_chat(self.manager, message=last_message, clear_history=False)
+
+    def current_round(self, agent_name):
+        """groupchat模式下为已有消息数；dag模式下为该角色所在阶段的序号"""
+        if args.orchestration == 'dag':
+            return ROLE_ORDER.index(agent_name) + 1 if agent_name in ROLE_ORDER else 0
+        return len(self.manager.groupchat.messages)
+
+    # ---- 异步DAG编排 ----
+    def review_chunks(self, outputs):
+        """把Coder的代码按顶层语句切段，每段交给一次独立的BugFinder请求"""
+        blocks = self.code_capture.extract_code(outputs["Coder"])
+        if not blocks:
+            return None
+        code = max(blocks, key=len)
+        chunks = split_code_chunks(code, args.review_chunk_lines)
+        if len(chunks) == 1:
+            return None
+        return [(f"第{start}-{end}行",
+                 f"请只检查以下代码片段（完整文件的第{start}-{end}行），行号按完整文件计：\n```python\n{chunk}\n```")
+                for start, end, chunk in chunks]
+
+    def on_stage_reply(self, name, content):
+        self.log(f"📬 [{datetime.now().strftime('%H:%M:%S')}] {name} 完成")
+        self.log_turn(name, content, self.current_round(name))
+        self.capture_reply(name, content)
+
+    async def run_dag(self, theme, text=None):
+        """Researcher只依赖主题，在用户输入补充描述的同时即开始；BugFinder按代码片段并发审查"""
+        loop = asyncio.get_running_loop()
+        if text is None:
+            text_future = loop.run_in_executor(None, input, "请输入更具体的文本描述（可选）：")
+        else:
+            text_future = loop.create_future()
+            text_future.set_result(text)
+
+        async def student_message():
+            return {"role": "user", "name": self.user.name, "content": build_prompt(theme, await text_future)}
+
+        stages = [
+            Stage("Researcher", self.agent("Researcher"), ["Theme"]),
+            Stage("Questioner", self.agent("Questioner"), ["Student", "Researcher"]),
+            Stage("Coder", self.agent("Coder"), ["Questioner"]),
+            Stage("BugFinder", self.agent("BugFinder"), ["Coder"], fan_out=self.review_chunks,
+                  footer="问题已标记，请Fixer修复。"),
+            Stage("Fixer", self.agent("Fixer"), ["BugFinder"]),
+            Stage("Verifier", self.agent("Verifier"), ["Fixer"]),
+            Stage("Writer", self.agent("Writer"), ["Verifier"]),
+        ]
+        orchestrator = DagOrchestrator(stages, max_concurrency=args.max_concurrency, on_reply=self.on_stage_reply)
+        return await orchestrator.run({
+            "Theme": {"role": "user", "name": self.user.name, "content": f"研究主题：{theme}"},
+            "Student": student_message(),
+        })
+
+    def run(self, theme, text=None, checkpoint=None):
+        """运行整个协作流程并保存结果，返回 (消息列表, 耗时秒数)；text为None时从终端读取。
+        checkpoint 为中断的运行留下的检查点时，恢复状态后从最后一位完成发言的Agent之后继续"""
+        self.theme, self.text = theme, text
+        self._start_time = time.time()
+        if checkpoint is None:
+            self.store.begin_run(self.run_id, theme, label=self.label, output_dir=self.output_dir)
+            self.log(f"🗃️ 产物库运行编号: {self.run_id}")
+        else:
+            self.store.reopen_run(self.run_id)
+            self.restore(checkpoint)
+        status = "done"
+        try:
+            if args.orchestration == 'dag':
+                messages = asyncio.run(self.run_dag(theme, text))
+            elif checkpoint is not None:
+                self.continue_chat(checkpoint["messages"])
+                messages = self.manager.groupchat.messages
+            else:
+                if text is None:
+                    self.text = text = input("请输入更具体的文本描述（可选）：")
+                    self._start_time = time.time()
+                self.user.initiate_chat(self.manager, message=build_prompt(theme, text))
+                messages = self.manager.groupchat.messages
+        except KeyboardInterrupt:
+            # 流式模式下已生成的论文与代码片段已经落盘，中断后保留
+            self.log(f"\n⛔ 已中断，已生成的部分结果保留在 {self.output_dir}/ 中")
+            status = "interrupted"
+            messages = self.manager.groupchat.messages
+            if messages and args.orchestration != 'dag':
+                self.log(f"💾 可用 --resume {self.run_id} 从最后一位完成发言的Agent之后续跑")
+            if not messages:
+                self.store.finish_run(self.run_id, status)
+                raise SystemExit(1)
+        except Exception:
+            self.store.finish_run(self.run_id, "failed")
+            if self.manager.groupchat.messages and args.orchestration != 'dag':
+                self.log(f"💾 已完成的发言保存在检查点中，可用 --resume {self.run_id} 续跑")
+            raise
+        collaboration_time = time.time() - self._start_time
+        self.log(f"✅ 协作流程完成！总耗时: {collaboration_time:.2f}秒")
+        self.save_artifacts(messages, collaboration_time)
+        self.store.finish_run(self.run_id, status)
+        return messages, collaboration_time
+
+    def is_verified(self, messages):
+        """最终代码是否通过验证：流程走到了Writer、没有因回退次数用尽而放行，启用执行时最新版本运行成功"""
+        if not any(m.get("name") == "Writer" for m in messages):
+            return False
+        if self.selector is not None and self.selector.exhausted:
+            return False
+        return self.check_latest_code()[0]
+
+    # ---- 结果保存 ----
+    def save_artifacts(self, messages, collaboration_time):
+        self.capture_history(messages)  # 最后一位发言者之后没有新的请求，其代码在此补存
+        if args.orchestration != 'dag':
+            self.log_turns()
+        code_capture = self.code_capture
+        # 保存 Verifier 最终代码；补丁模式下为依次应用各补丁后重建的完整代码
+        final_path = self.path("final_model_code.py")
+        ver_msgs = [m for m in messages if m.get("name") == "Verifier"]
+        if args.code_patches and code_capture.latest_code() is not None:
+            with open(final_path,"w",encoding="utf-8") as f:
+                f.write(code_capture.latest_code())
+            self.log(f"💾 最终代码已保存: {final_path}")
+        elif ver_msgs:
+            code = ver_msgs[-1]["content"]
+            with open(final_path,"w",encoding="utf-8") as f:
+                f.write(code)
+            self.log(f"💾 最终代码已保存: {final_path}")
+        # 产物库中登记最新完整代码版本，通过验证时标记以便按主题查询
+        verified = False
+        if code_capture.latest_code() is not None:
+            verified = self.is_verified(messages)
+            digest = self.store.add(self.run_id, "final_code", code_capture.latest_code(), agent="Verifier",
+                                    version=code_capture.current_version, verified=verified)
+            if verified:
+                self.store.mark_verified(self.run_id, digest)
+
+        # 保存 Writer 论文
+        summary_path = self.path("research_summary.md")
+        last = messages[-1]["content"]
+        with open(summary_path,"w",encoding="utf-8") as f:
+            f.write(last)
+        self.store.add(self.run_id, "summary", last, agent=messages[-1].get("name"))
+        self.log(f"📄 研究论文已保存: {summary_path}")
+
+        # 等待尚未结束的代码执行
+        executions = self.sandbox.wait() if self.sandbox is not None else []
+
+        # 保存用时和模型报告
+        report_path = self.path("run_report.txt")
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(f"协作流程耗时: {collaboration_time:.2f}秒\n")
+            f.write(f"编排方式: {args.orchestration}\n")
+            f.write("模型使用报告:\n")
+            for agent in self.agents:
+                model = agent.llm_config["config_list"][0]["model"]
+                f.write(f"  - {agent.name}: {model}\n")
+            f.write("调用指标报告:\n")
+            for name, stats in self.call_metrics.summarize("agent").items():
+                f.write(f"  - {name}: {stats['calls']}次 | 输入{stats['prompt_tokens']} / 输出{stats['completion_tokens']} tokens"
+                        f" | 首token {stats['ttft']:.2f}秒 | 总耗时 {stats['latency']:.2f}秒"
+                        f" | 重试{stats['retries']}次" + (f" | 对冲{stats['hedged']}次" if stats["hedged"] else "")
+                        + f" | ${stats['cost']:.4f}\n")
+            if self.selector is not None and self.selector.transitions:
+                f.write("发言顺序:\n")
+                for speaker, target, reason in self.selector.transitions:
+                    f.write(f"  - {speaker} → {target}（{reason}）\n")
+            if self.context_log:
+                f.write("上下文裁剪报告（估算token）:\n")
+                for entry in self.context_log:
+                    f.write(f"  - 第{entry['round']}轮 {entry['agent']}: {entry['tokens_before']} → {entry['tokens_after']}"
+                            f" ({entry['messages_before']} → {entry['messages_after']}条消息)\n")
+            if args.code_patches:
+                patched = sum(1 for v in code_capture.versions if v["patch"])
+                f.write(f"代码补丁报告: 共{len(code_capture.versions)}个版本，{patched}个由补丁生成，"
+                        f"{len(code_capture.rejected)}个补丁未能应用\n")
+                for item in code_capture.rejected:
+                    f.write(f"  - 版本{item['version']} {item['agent']}: {item['error']}\n")
+            if self.sandbox is not None:
+                f.write("代码执行报告:\n")
+                for result in executions:
+                    f.write(f"  - 版本{result['version']} {result['agent']}: {result['status']} | 耗时 {result['runtime']}秒"
+                            f" | 峰值内存 {result['peak_rss_mb']}MB | 图片{len(result['figures'])}张"
+                            + (f" | {result['exception']}" if result["exception"] else "") + "\n")
+            if self.response_cache is not None:
+                f.write("缓存命中报告:\n")
+                total_hits = total_calls = 0
+                for name, (hits, calls) in self.response_cache.hit_rates().items():
+                    f.write(f"  - {name}: {hits}/{calls} ({hits / calls:.0%})\n")
+                    total_hits, total_calls = total_hits + hits, total_calls + calls
+                if total_calls:
+                    f.write(f"  - 总计: {total_hits}/{total_calls} ({total_hits / total_calls:.0%})\n")
+            distinct = len({v["digest"] for v in code_capture.versions})
+            f.write(f"产物库: {args.artifact_root} | 运行编号 {self.run_id} | 代码版本{len(code_capture.versions)}个"
+                    f"（不同内容{distinct}个）| 最终代码{'已' if verified else '未'}验证\n")
+            skipped = code_capture.skipped
+            if any(skipped.values()):
+                f.write(f"未保存的代码块: 与最新版本相同{skipped['duplicate']}个，无法编译{skipped['not_runnable']}个\n")
+        with open(report_path, encoding="utf-8") as f:
+            self.store.add(self.run_id, "report", f.read())
+        self.log(f"📝 用时和模型报告已保存: {report_path}")
+
+        # 保存机器可读的逐次调用指标
+        extra = {"collaboration_time": round(collaboration_time, 2), "orchestration": args.orchestration,
+                 "artifacts": {"root": args.artifact_root, "run_id": self.run_id, "verified": verified,
+                               "versions": [{k: v for k, v in entry.items() if k != "timestamp"}
+                                            for entry in code_capture.versions],
+                               "skipped": code_capture.skipped}}
+        if self.selector is not None:
+            extra["speakers"] = [{"from": a, "to": b, "reason": r} for a, b, r in self.selector.transitions]
+        if self.context_log:
+            extra["context"] = self.context_log
+        if args.code_patches:
+            extra["patches"] = {"versions": len(code_capture.versions), "rejected": code_capture.rejected}
+        if self.sandbox is not None:
+            extra["executions"] = [{k: v for k, v in r.items() if k not in ("stdout", "traceback")}
+                                   for r in executions]
+        if self.response_cache is not None:
+            extra["cache"] = {name: {"hits": hits, "calls": calls}
+                              for name, (hits, calls) in self.response_cache.hit_rates().items()}
+        json_path, csv_path = self.path("run_metrics.json"), self.path("run_metrics.csv")
+        report = self.call_metrics.write(json_path, csv_path, extra=extra)
+        with open(json_path, encoding="utf-8") as f:
+            self.store.add(self.run_id, "metrics", f.read())
+        self.log(f"📊 调用指标已保存: {json_path}, {csv_path}")
+        return report
+
+    def close(self):
+        self.turn_logger.flush()
+        self.store.close()
+        if self.sandbox is not None:
+            self.sandbox.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
+
+# ==== 断点续跑 ====
+def load_checkpoint(run_id):
+    """返回 (运行记录, 检查点)，不存在时对应项为None"""
+    store = ArtifactStore(args.artifact_root)
+    try:
+        return store.run(run_id), store.load_checkpoint(run_id)
+    finally:
+        store.close()
+
+def resume_run(run_id):
+    """按检查点重建智能体并续跑；已完成的运行不再重复"""
+    info, checkpoint = load_checkpoint(run_id)
+    if checkpoint is None:
+        raise SystemExit(f"❌ 产物库 {args.artifact_root} 中没有运行 {run_id} 的检查点")
+    if info is not None and info["status"] == "done":
+        print(f"✅ 运行 {run_id} 已经完成，结果在 {checkpoint['output_dir']}/")
+        return
+    if checkpoint["args"].get("orchestration", "groupchat") == "dag":
+        raise SystemExit(f"❌ 运行 {run_id} 使用dag编排，不支持从检查点续跑，请重新运行")
+    for key, value in checkpoint["args"].items():
+        setattr(args, key, value)
+    run = ResearchRun(checkpoint["output_dir"], rate_limiter=RateLimiter(args.rate_limit) if args.rate_limit else None,
+                      label=checkpoint["label"], run_id=run_id)
+    try:
+        run.run(checkpoint["theme"], checkpoint["text"], checkpoint=checkpoint)
+    finally:
+        run.close()
+
+# ==== 批量模式 ====
+def load_jobs(path):
+    """读取JSONL任务队列；主题取 theme 或 title，补充描述取 text 或 body，任务id取 id 或 request_id"""
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            job_id = str(job.get("id") or job.get("request_id") or f"job_{n}")
+            jobs.append({
+                "id": re.sub(r"[^\w.-]+", "_", job_id),
+                "theme": job.get("theme") or job.get("title") or "",
+                "text": job.get("text") or job.get("body") or "",
+            })
+    return jobs
+
+def previous_checkpoint(status_path):
+    """上次失败或中断的任务留下的检查点，没有则返回None"""
+    if not os.path.exists(status_path):
+        return None
+    with open(status_path, encoding="utf-8") as f:
+        run_id = json.load(f).get("run_id")
+    return load_checkpoint(run_id)[1] if run_id else None
+
+def run_job(job, batch_dir, rate_limiter):
+    """在独立的智能体与群聊中运行一个任务；完成后写入 status.json，续跑时据此跳过，
+    失败的任务有检查点时从中断处继续"""
+    job_dir = os.path.join(batch_dir, job["id"])
+    status_path = os.path.join(job_dir, "status.json")
+    status = {"id": job["id"], "theme": job["theme"], "started_at": datetime.now().isoformat(timespec="seconds")}
+    run = None
+    try:
+        # 建立运行（产物库、日志、智能体）时出错也只记为该任务失败，不影响其余任务
+        checkpoint = previous_checkpoint(status_path)
+        run = ResearchRun(job_dir, rate_limiter=rate_limiter, interactive=False, label=job["id"],
+                          run_id=checkpoint["run_id"] if checkpoint else None)
+        status["run_id"] = run.run_id
+        _, collaboration_time = run.run(job["theme"], job["text"], checkpoint=checkpoint)
+        calls = run.call_metrics.calls
+        status.update(status="done", collaboration_time=round(collaboration_time, 2),
+                      calls=len(calls), cost=round(sum(c["cost"] for c in calls), 6))
+    except Exception as e:
+        status.update(status="failed", error=f"{type(e).__name__}: {e}")
+        print(f"❌ [{job['id']}] 任务失败: {status['error']}")
+    finally:
+        if run is not None:
+            run.close()
+    status["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    os.makedirs(job_dir, exist_ok=True)
+    with open(status_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False, indent=2)
+    return status
+
+def job_done(batch_dir, job):
+    status_path = os.path.join(batch_dir, job["id"], "status.json")
+    if not os.path.exists(status_path):
+        return False
+    with open(status_path, encoding="utf-8") as f:
+        return json.load(f).get("status") == "done"
+
+def run_batch(path):
+    """并发处理任务队列；已完成的任务在重新运行同一命令时跳过，失败或中断的任务从检查点续跑（没有检查点时重跑）"""
+    batch_dir = os.path.join("output", "batch", os.path.splitext(os.path.basename(path))[0])
+    os.makedirs(batch_dir, exist_ok=True)
+    jobs = load_jobs(path)
+    pending = [job for job in jobs if not job_done(batch_dir, job)]
+    print(f"\n📦 批量模式: 共{len(jobs)}个任务，已完成{len(jobs) - len(pending)}个，"
+          f"本次运行{len(pending)}个（并发{args.batch_workers}，"
+          f"限速{f'{args.rate_limit:g}次/分钟' if args.rate_limit else '不限'}）")
+    rate_limiter = RateLimiter(args.rate_limit) if args.rate_limit else None
     start_time = time.time()
-    user.initiate_chat(manager, message=prompt)
-    collaboration_time = time.time() - start_time
-    print(f"✅ 协作流程完成！总耗时: {collaboration_time:.2f}秒")
-
-    # 保存 Verifier 最终代码
-    ver_msgs = [m for m in manager.groupchat.messages if m.get("sender", {}).get("name")=="Verifier"]
-    if ver_msgs:
-        code = ver_msgs[-1]["content"]
-        with open("output/final_model_code.py","w",encoding="utf-8") as f:
-            f.write(code)
-        print("💾 最终代码已保存: output/final_model_code.py")
-
-    # 保存 Writer 论文
-    last = manager.groupchat.messages[-1]["content"]
-    with open("output/research_summary.md","w",encoding="utf-8") as f:
-        f.write(last)
-    print("📄 研究论文已保存: output/research_summary.md")
-
-    # 保存用时和模型报告
-    report_path = "output/run_report.txt"
-    with open(report_path, "w", encoding="utf-8") as f:
-        f.write(f"协作流程耗时: {collaboration_time:.2f}秒\n")
-        f.write("模型使用报告:\n")
-        for agent in [researcher, questioner, coder, bug_finder, fixer, verifier, writer]:
-            model = agent.llm_config["config_list"][0]["model"]
-            f.write(f"  - {agent.name}: {model}\n")
-    print(f"📝 用时和模型报告已保存: {report_path}")
\ No newline at end of file
+    pool = ThreadPoolExecutor(max_workers=args.batch_workers, thread_name_prefix="job")
+    futures = [pool.submit(run_job, job, batch_dir, rate_limiter) for job in pending]
+    try:
+        statuses = [future.result() for future in futures]
+    except KeyboardInterrupt:
+        # 未开始的任务取消，进行中的任务结束后退出；再次运行同一命令即可续跑
+        print("\n⛔ 已中断，等待进行中的任务结束；重新运行同一命令可继续剩余任务")
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise SystemExit(130)
+    pool.shutdown()
+
+    summary = []
+    for job in jobs:
+        status_path = os.path.join(batch_dir, job["id"], "status.json")
+        if os.path.exists(status_path):
+            with open(status_path, encoding="utf-8") as f:
+                summary.append(json.load(f))
+    with open(os.path.join(batch_dir, "batch_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    failed = [s["id"] for s in statuses if s["status"] != "done"]
+    print(f"✅ 批量任务结束：本次完成{len(statuses) - len(failed)}个，失败{len(failed)}个，"
+          f"耗时{time.time() - start_time:.2f}秒；汇总见 {batch_dir}/batch_summary.json")
+    if failed:
+        print(f"❌ 失败任务: {', '.join(failed)}（重新运行同一命令将从检查点续跑）")
+
+# ==== 主流程 ====
+if __name__ == '__main__':
+    if args.batch:
+        run_batch(args.batch)
+        raise SystemExit(0)
+    if args.resume:
+        resume_run(args.resume)
+        raise SystemExit(0)
+    os.makedirs("output", exist_ok=True)
+    print("\n🚀 欢迎使用多智能体科研助手")
+    run = ResearchRun("output", rate_limiter=RateLimiter(args.rate_limit) if args.rate_limit else None)
+    theme = input("请输入研究主题：")
+    run.run(theme)
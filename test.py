@@ -1,13 +1,292 @@
+import os
+import json
+import heapq
+import weakref
 import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
 from scipy.integrate import odeint
-import matplotlib.pyplot as plt
 import networkx as nx
 from matplotlib.colors import ListedColormap
-from typing import Tuple, List, Union
+from collections import deque
+from typing import Tuple, List, Union, Optional, Dict, Sequence
+from utils.plotting import FigureSink
+
+VALID_GRAPH_TYPES = ['watts_strogatz', 'barabasi_albert', 'random']
+VALID_ENGINES = ['sparse', 'python', 'event']
+VALID_RECORDS = ['dense', 'events', 'counts']
+ENSEMBLE_BATCH_ELEMENTS = 2 ** 24  # 单批 (副本 × 节点) 状态矩阵的元素上限
+SWEEP_PARALLEL_THRESHOLD = 20000  # 参数点数超过该值时默认启用多进程
+EDGE_CHUNK_ROWS = 5_000_000  # 解析边列表时每块读取的行数
+COMPARTMENTS = {'SIR': ('S', 'I', 'R'), 'SEIR': ('S', 'E', 'I', 'R')}
+COMPARTMENT_LABELS = {'S': 'Susceptible', 'E': 'Exposed', 'I': 'Infected', 'R': 'Recovered'}
+
+
+def _draw_results(fig, t: np.ndarray, solutions: np.ndarray, model_type: str) -> None:
+    ax = fig.add_subplot()
+    for name, values in zip(COMPARTMENTS[model_type], solutions.T):
+        ax.plot(t, values, label=COMPARTMENT_LABELS[name])
+
+    ax.set_xlabel('Days')
+    ax.set_ylabel('Population')
+    ax.set_title(f'{model_type} Model Simulation')
+    ax.legend()
+    ax.grid()
+
+
+def _draw_network(fig, G: nx.Graph, pos: Dict, node_color: np.ndarray, step: int) -> None:
+    ax = fig.add_subplot()
+    colors = ListedColormap(['green', 'red', 'blue'])  # 易感, 感染, 康复
+    nx.draw(G, pos, ax=ax, node_color=node_color, cmap=colors, vmin=0, vmax=2,
+            node_size=50, with_labels=False)
+    ax.set_title(f'Network Spread at Step {step}')
+
+
+class NetworkTrace:
+    """网络传播的紧凑轨迹
+
+    events模式保存每个节点的感染步与康复步（int32，从未发生记为 NEVER），可按需重建任意一步的状态；
+    counts模式只保存每步S/I/R人数。两种模式都可像历史矩阵一样用 len() 和 trace[step] 访问。
+    """
+
+    NEVER = np.iinfo(np.int32).max
+
+    def __init__(self, counts: np.ndarray, infection_step: Optional[np.ndarray] = None,
+                 recovery_step: Optional[np.ndarray] = None):
+        self.counts = counts                  # (steps, 3) 每步S/I/R人数
+        self.infection_step = infection_step  # (nodes,) 首次处于感染状态的步
+        self.recovery_step = recovery_step    # (nodes,) 进入康复状态的步
+
+    @classmethod
+    def from_events(cls, n: int, steps: int, infection_step: np.ndarray, recovery_step: np.ndarray) -> 'NetworkTrace':
+        """由节点事件步构造轨迹，每步人数由事件步的累计直方图得到"""
+        infected = np.bincount(infection_step[infection_step < steps], minlength=steps).cumsum()
+        recovered = np.bincount(recovery_step[recovery_step < steps], minlength=steps).cumsum()
+        counts = np.stack([n - infected, infected - recovered, recovered], axis=1)
+        return cls(counts, infection_step, recovery_step)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __getitem__(self, step: int) -> np.ndarray:
+        return self.state_at(step)
+
+    @property
+    def has_events(self) -> bool:
+        return self.infection_step is not None
+
+    def state_at(self, step: int) -> np.ndarray:
+        """重建第step步之后的节点状态 (0=易感, 1=感染, 2=康复)，dtype为uint8"""
+        if not self.has_events:
+            raise ValueError("Aggregate-only trace cannot rebuild node states")
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError("Step out of range")
+        return (self.infection_step <= step).astype(np.uint8) + (self.recovery_step <= step)
+
+    def to_dense(self) -> np.ndarray:
+        return np.stack([self.state_at(step) for step in range(len(self))])
+
+
+class _TraceRecorder:
+    """按record模式记录每一步的状态变化"""
+
+    def __init__(self, n: int, steps: int, record: str, patient_zero: int):
+        if record not in VALID_RECORDS:
+            raise ValueError(f"Invalid record mode. Must be one of {VALID_RECORDS}")
+        self.record = record
+        self.counts = np.empty((steps, 3), dtype=np.int64)
+        if record == 'dense':
+            self.history = np.empty((steps, n), dtype=np.uint8)
+        elif record == 'events':
+            self.infection_step = np.full(n, NetworkTrace.NEVER, dtype=np.int32)
+            self.recovery_step = np.full(n, NetworkTrace.NEVER, dtype=np.int32)
+            self.infection_step[patient_zero] = 0
+
+    def add(self, step: int, status: np.ndarray, new_infections: np.ndarray, recoveries: np.ndarray) -> None:
+        """status为第step步更新后的状态，new_infections/recoveries为本步发生转移的节点掩码"""
+        self.counts[step] = np.bincount(status, minlength=3)
+        if self.record == 'dense':
+            self.history[step] = status
+        elif self.record == 'events':
+            self.infection_step[new_infections] = step
+            self.recovery_step[recoveries] = step
+
+    def result(self) -> Union[np.ndarray, NetworkTrace]:
+        if self.record == 'dense':
+            return self.history
+        if self.record == 'events':
+            return NetworkTrace(self.counts, self.infection_step, self.recovery_step)
+        return NetworkTrace(self.counts)
+
+
+def write_contact_network(edge_path: str, path: str, delimiter: Optional[str] = None, comment: str = '#',
+                          chunk_rows: int = EDGE_CHUNK_ROWS) -> 'ContactNetwork':
+    """把边列表文本（每行 "u v"，整数节点编号，其余列忽略）一次性解析为CSR缓存目录
+
+    path 下写入 indptr.npy、indices.npy、data.npy（全为1.0，供稀疏矩阵乘法零拷贝使用）、
+    nodes.npy（每行对应的原始节点编号）与 meta.json。边视为无向，去掉自环与重复边；
+    只在边列表中出现过的节点计入网络。解析用pandas的C解析器分块读取，建缓存时内存约为 边数 × 32 字节。
+    """
+    parts = [chunk.to_numpy() for chunk in pd.read_csv(
+        edge_path, sep=delimiter or r'\s+', comment=comment, header=None, usecols=[0, 1],
+        dtype=np.int64, chunksize=chunk_rows, engine='c')]
+    pairs = np.concatenate(parts) if parts else np.empty((0, 2), dtype=np.int64)
+    del parts
+    rows_read = len(pairs)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    if len(pairs) == 0:
+        raise ValueError(f"No edges found in {edge_path}")
+    if pairs.min() < 0:
+        raise ValueError("Node ids must be non-negative integers")
+
+    # 原始编号重排为 0..n-1：编号较稠密时用存在标记数组，否则排序去重
+    top = int(pairs.max())
+    if top < 4 * pairs.size:
+        present = np.zeros(top + 1, dtype=bool)
+        present[pairs.ravel()] = True
+        nodes = np.flatnonzero(present)
+        pairs = (np.cumsum(present) - 1)[pairs]
+        del present
+    else:
+        nodes, pairs = np.unique(pairs, return_inverse=True)
+        pairs = pairs.reshape(-1, 2)
+    n = len(nodes)
+
+    # 两个方向的边编码为 行*n+列，排序后去重，即得按行排列的CSR
+    keys = np.concatenate([pairs[:, 0] * n + pairs[:, 1], pairs[:, 1] * n + pairs[:, 0]])
+    del pairs
+    keys.sort()
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    nnz = len(keys)
+    index_dtype = np.int32 if max(n, nnz) < np.iinfo(np.int32).max else np.int64
+
+    os.makedirs(path, exist_ok=True)
+    indptr = np.lib.format.open_memmap(os.path.join(path, 'indptr.npy'), mode='w+', dtype=index_dtype,
+                                       shape=(n + 1,))
+    indices = np.lib.format.open_memmap(os.path.join(path, 'indices.npy'), mode='w+', dtype=index_dtype,
+                                        shape=(nnz,))
+    data = np.lib.format.open_memmap(os.path.join(path, 'data.npy'), mode='w+', dtype=np.float64, shape=(nnz,))
+    indptr[:] = np.searchsorted(keys, np.arange(n + 1, dtype=np.int64) * n)
+    for start in range(0, nnz, chunk_rows):
+        indices[start:start + chunk_rows] = keys[start:start + chunk_rows] % n
+    data[:] = 1.0
+    for array in (indptr, indices, data):
+        array.flush()
+    np.save(os.path.join(path, 'nodes.npy'), nodes)
+
+    stat = os.stat(edge_path)
+    meta = {'source': os.path.abspath(edge_path), 'source_size': stat.st_size, 'source_mtime': stat.st_mtime_ns,
+            'delimiter': delimiter, 'comment': comment, 'nodes': n, 'edges': nnz // 2, 'rows_read': rows_read}
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return ContactNetwork(path)
+
+
+def load_contact_network(edge_path: str, cache_dir: Optional[str] = None, delimiter: Optional[str] = None,
+                         comment: str = '#') -> 'ContactNetwork':
+    """读取边列表对应的CSR缓存；缓存不存在或与源文件（大小、修改时间、解析选项）不一致时重新解析
+
+    cache_dir 默认为 output/networks/<文件名>。源文件已被删除时直接使用已有缓存。
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join('output', 'networks', os.path.splitext(os.path.basename(edge_path))[0])
+    if os.path.exists(os.path.join(cache_dir, 'meta.json')):
+        network = ContactNetwork(cache_dir)
+        meta = network.meta
+        if not os.path.exists(edge_path):
+            return network
+        stat = os.stat(edge_path)
+        if (meta['source_size'], meta['source_mtime'], meta['delimiter'], meta['comment']) == \
+                (stat.st_size, stat.st_mtime_ns, delimiter, comment):
+            return network
+    return write_contact_network(edge_path, cache_dir, delimiter=delimiter, comment=comment)
+
+
+class ContactNetwork:
+    """磁盘上的CSR接触网络，数组以内存映射方式读取，不构造networkx图
+
+    sparse / event 引擎与多副本模拟直接使用 adjacency；送入进程池时只传递目录路径，由子进程重新映射。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.indptr = np.load(os.path.join(path, 'indptr.npy'), mmap_mode='r')
+        self.indices = np.load(os.path.join(path, 'indices.npy'), mmap_mode='r')
+        self.data = np.load(os.path.join(path, 'data.npy'), mmap_mode='r')
+        self._adjacency = None
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __len__(self) -> int:
+        return self.meta['nodes']
+
+    def __repr__(self) -> str:
+        return f"ContactNetwork({self.path!r}, nodes={self.meta['nodes']}, edges={self.meta['edges']})"
+
+    @property
+    def adjacency(self) -> sp.csr_array:
+        """共享内存映射数组的CSR邻接矩阵（只读）"""
+        if self._adjacency is None:
+            n = len(self)
+            self._adjacency = sp.csr_array((self.data, self.indices, self.indptr), shape=(n, n), copy=False)
+        return self._adjacency
+
+    @property
+    def node_ids(self) -> np.ndarray:
+        """每一行对应的原始节点编号"""
+        return np.load(os.path.join(self.path, 'nodes.npy'), mmap_mode='r')
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def sample_subgraph(self, size: int = 500, start: Optional[int] = None,
+                        seed: Optional[int] = 0) -> Tuple[nx.Graph, np.ndarray]:
+        """从start（默认随机节点）开始广度优先取size个节点，返回诱导子图与所选节点（图中节点即行号）
+
+        所在连通分量不足size个节点时，从随机的未访问节点继续；用于作图，不需要构造整张图。
+        """
+        rng = np.random.default_rng(seed)
+        n = len(self)
+        size = min(size, n)
+        chosen = {}
+        queue = deque([int(rng.integers(n)) if start is None else int(start)])
+        while len(chosen) < size:
+            if not queue:
+                queue.append(int(rng.integers(n)))
+            node = queue.popleft()
+            if node in chosen:
+                continue
+            chosen[node] = None
+            queue.extend(int(v) for v in self.neighbors(node)[:size] if v not in chosen)  # 度很大的节点只取前size个邻居
+        nodes = np.fromiter(chosen, dtype=np.int64, count=len(chosen))
+
+        G = nx.Graph()
+        G.add_nodes_from(nodes.tolist())
+        members = np.sort(nodes)
+        for node in nodes:
+            neighbors = self.neighbors(node)
+            neighbors = neighbors[np.isin(neighbors, members, assume_unique=True)]
+            G.add_edges_from((int(node), int(v)) for v in neighbors if v > node)
+        return G, nodes
+
 
 class EpidemicModels:
     def __init__(self, beta: float = 0.3, gamma: float = 0.1, sigma: float = 0.2,
-                 N: int = 1000, days: int = 160, network_size: int = 200):
+                 N: int = 1000, days: int = 160, network_size: int = 200,
+                 render_mode: str = 'show', figure_dir: str = os.path.join('output', 'figures'),
+                 plot_sample: int = 500):
         # 基本参数默认值
         self.beta = beta    # 接触率
         self.gamma = gamma  # 恢复率
@@ -15,6 +294,19 @@ class EpidemicModels:
         self.N = N         # 总人口
         self.days = days   # 模拟天数
         self.network_size = network_size  # 网络节点数
+        self.plot_sample = plot_sample    # 接触网络作图时抽取的节点数
+        self.figures = FigureSink(render_mode, figure_dir)  # 'save' 模式下后台写盘，不阻塞计算
+        self._layouts = weakref.WeakKeyDictionary()  # 每张图缓存一次spring_layout
+
+    def __getstate__(self):
+        # 布局缓存只在当前进程有效，实例被送入进程池时不携带
+        state = self.__dict__.copy()
+        del state['_layouts']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._layouts = weakref.WeakKeyDictionary()
 
     def sir_model(self, y: List[float], t: np.ndarray, beta: float, gamma: float, N: int) -> List[float]:
         S, I, R = y
@@ -31,75 +323,378 @@ class EpidemicModels:
         dRdt = gamma * I
         return [dSdt, dEdt, dIdt, dRdt]
 
-    def network_simulation(self, graph_type: str = 'watts_strogatz', steps: int = 50) -> Tuple[nx.Graph, np.ndarray]:
-        """不同网络结构上的传播模拟"""
-        valid_graph_types = ['watts_strogatz', 'barabasi_albert', 'random']
-        if graph_type not in valid_graph_types:
-            raise ValueError(f"Invalid graph type. Must be one of {valid_graph_types}")
+    def sweep_rhs(self, y: np.ndarray, beta: np.ndarray, gamma: np.ndarray, sigma: np.ndarray,
+                  model_type: str = 'SIR') -> np.ndarray:
+        """sir_model/seir_model 的向量化版本，y 形状为 (参数点数, 仓室数)"""
+        N = self.N
+        if model_type == 'SIR':
+            S, I = y[:, 0], y[:, 1]
+            infection = beta * S * I / N
+            recovery = gamma * I
+            return np.stack([-infection, infection - recovery, recovery], axis=1)
+        S, E, I = y[:, 0], y[:, 1], y[:, 2]
+        infection = beta * S * I / N
+        onset = sigma * E
+        recovery = gamma * I
+        return np.stack([-infection, infection - onset, onset - recovery, recovery], axis=1)
+
+    def _integrate_sweep(self, params: np.ndarray, model_type: str, t: np.ndarray, substeps: int) -> np.ndarray:
+        """对一批参数点做定步长RK4积分，返回 (参数点数, len(t), 仓室数)"""
+        beta, gamma, sigma = params[:, 0], params[:, 1], params[:, 2]
+        n_comp = len(COMPARTMENTS[model_type])
+        y = np.zeros((len(params), n_comp))
+        y[:, 0] = self.N - 1
+        y[:, n_comp - 2] = 1  # 初始条件与 run_sir_simulation/run_seir_simulation 一致: 1个感染者
+
+        out = np.empty((len(params), len(t), n_comp))
+        out[:, 0] = y
+        for k in range(1, len(t)):
+            h = (t[k] - t[k - 1]) / substeps
+            for _ in range(substeps):
+                k1 = self.sweep_rhs(y, beta, gamma, sigma, model_type)
+                k2 = self.sweep_rhs(y + 0.5 * h * k1, beta, gamma, sigma, model_type)
+                k3 = self.sweep_rhs(y + 0.5 * h * k2, beta, gamma, sigma, model_type)
+                k4 = self.sweep_rhs(y + h * k3, beta, gamma, sigma, model_type)
+                y = y + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+            out[:, k] = y
+        return out
+
+    def parameter_sweep(self, model_type: str = 'SIR', beta: Union[float, Sequence[float]] = None,
+                        gamma: Union[float, Sequence[float]] = None, sigma: Union[float, Sequence[float]] = None,
+                        substeps: int = 4, workers: Optional[int] = None) -> Dict[str, object]:
+        """在 (beta, gamma, sigma) 网格上批量积分SIR/SEIR模型
+
+        所有网格点堆叠为数组后用同一个向量化右端函数做定步长RK4积分；
+        未给出的参数取实例默认值。网格点数超过 SWEEP_PARALLEL_THRESHOLD 时默认按进程数分块并行。
+
+        返回字典:
+            dims / coords: 结果立方体各维名称及坐标
+            solution: 形状 (len(beta), len(gamma), [len(sigma),] len(t), 仓室数)
+            peak_time / peak_infected / final_size: 形状为参数网格形状的派生指标
+        """
+        if model_type not in COMPARTMENTS:
+            raise ValueError(f"Invalid model type. Must be one of {list(COMPARTMENTS)}")
+
+        axes = {
+            'beta': np.atleast_1d(np.asarray(self.beta if beta is None else beta, dtype=np.float64)),
+            'gamma': np.atleast_1d(np.asarray(self.gamma if gamma is None else gamma, dtype=np.float64)),
+            'sigma': np.atleast_1d(np.asarray(self.sigma if sigma is None else sigma, dtype=np.float64)),
+        }
+        if model_type == 'SIR':
+            axes['sigma'] = axes['sigma'][:1]  # SIR与sigma无关，不展开该维
+        grid = np.meshgrid(axes['beta'], axes['gamma'], axes['sigma'], indexing='ij')
+        params = np.stack([g.ravel() for g in grid], axis=1)
+        t = np.linspace(0, self.days, self.days)
+
+        if workers is None:
+            workers = (os.cpu_count() or 1) if len(params) >= SWEEP_PARALLEL_THRESHOLD else 1
+        if workers > 1 and len(params) > 1:
+            chunks = np.array_split(params, min(workers, len(params)))
+            with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+                parts = list(executor.map(self._integrate_sweep, chunks, [model_type] * len(chunks),
+                                          [t] * len(chunks), [substeps] * len(chunks)))
+            solution = np.concatenate(parts, axis=0)
+        else:
+            solution = self._integrate_sweep(params, model_type, t, substeps)
+
+        param_dims = ['beta', 'gamma', 'sigma'] if model_type == 'SEIR' else ['beta', 'gamma']
+        grid_shape = tuple(len(axes[d]) for d in param_dims)
+        compartments = COMPARTMENTS[model_type]
+        infected = solution[:, :, compartments.index('I')]
+        peak_index = infected.argmax(axis=1)
+
+        coords = {d: axes[d] for d in param_dims}
+        coords['t'] = t
+        coords['compartment'] = np.array(compartments)
+        return {
+            'dims': tuple(param_dims) + ('t', 'compartment'),
+            'coords': coords,
+            'solution': solution.reshape(grid_shape + solution.shape[1:]),
+            'peak_time': t[peak_index].reshape(grid_shape),
+            'peak_infected': infected.max(axis=1).reshape(grid_shape),
+            'final_size': (self.N - solution[:, -1, 0]).reshape(grid_shape),
+        }
+
+    def build_graph(self, graph_type: str = 'watts_strogatz', seed: Optional[int] = None) -> nx.Graph:
+        """按类型生成接触网络"""
+        if graph_type not in VALID_GRAPH_TYPES:
+            raise ValueError(f"Invalid graph type. Must be one of {VALID_GRAPH_TYPES}")
 
         if graph_type == 'watts_strogatz':
-            G = nx.watts_strogatz_graph(self.network_size, 4, 0.3)
+            return nx.watts_strogatz_graph(self.network_size, 4, 0.3, seed=seed)
         elif graph_type == 'barabasi_albert':
-            G = nx.barabasi_albert_graph(self.network_size, 2)
+            return nx.barabasi_albert_graph(self.network_size, 2, seed=seed)
+        else:
+            return nx.erdos_renyi_graph(self.network_size, 0.05, seed=seed)
+
+    @staticmethod
+    def graph_to_csr(G: nx.Graph) -> sp.csr_array:
+        """将networkx图一次性转换为CSR邻接矩阵（行列顺序与G的节点顺序一致）"""
+        return nx.to_scipy_sparse_array(G, nodelist=list(G), weight=None, dtype=np.float64, format='csr')
+
+    def network_simulation(self, graph_type: Union[str, ContactNetwork] = 'watts_strogatz', steps: int = 50,
+                           engine: str = 'sparse', seed: Optional[int] = None,
+                           record: str = 'dense') -> Tuple[Union[nx.Graph, ContactNetwork],
+                                                           Union[np.ndarray, NetworkTrace]]:
+        """不同网络结构上的传播模拟
+
+        engine='sparse' 使用CSR邻接矩阵的向量化实现，engine='python' 为逐节点遍历的参考实现，
+        两者的S/I/R转移概率完全一致；engine='event' 为连续时间事件驱动实现，
+        开销只与传播/康复事件数相关（见 _simulate_event）。
+        record='dense' 返回 (steps, nodes) 的uint8历史矩阵；'events' 返回按节点记录事件步的
+        NetworkTrace；'counts' 返回只含每步S/I/R人数的NetworkTrace。
+        graph_type 也可以是 load_contact_network 得到的 ContactNetwork，此时直接在内存映射的CSR上模拟
+        （不支持 engine='python'），返回值中的图即该网络。
+        """
+        if engine not in VALID_ENGINES:
+            raise ValueError(f"Invalid engine. Must be one of {VALID_ENGINES}")
+
+        rng = np.random.default_rng(seed)
+        if isinstance(graph_type, ContactNetwork):
+            if engine == 'python':
+                raise ValueError("The python engine needs a networkx graph; use 'sparse' or 'event'")
+            G, adj = graph_type, graph_type.adjacency
+        else:
+            G = self.build_graph(graph_type, seed=seed)
+            adj = self.graph_to_csr(G) if engine != 'python' else None
+        if engine == 'sparse':
+            history = self._simulate_sparse(adj, steps, rng, record)
+        elif engine == 'event':
+            history = self._simulate_event(adj, steps, rng, record)
         else:
-            G = nx.erdos_renyi_graph(self.network_size, 0.05)
+            history = self._simulate_python(G, steps, rng, record)
+        return G, history
 
+    def _simulate_python(self, G: nx.Graph, steps: int, rng: np.random.Generator,
+                         record: str = 'dense') -> Union[np.ndarray, NetworkTrace]:
+        """逐节点、逐条边抽样的参考实现"""
+        n = G.number_of_nodes()
         # 初始化节点状态 (0=易感, 1=感染, 2=康复)
-        status = np.zeros(self.network_size)
-        patient_zero = np.random.randint(0, self.network_size)
+        status = np.zeros(n, dtype=np.uint8)
+        patient_zero = rng.integers(0, n)
         status[patient_zero] = 1
 
         # 模拟传播过程
-        history = []
-        for _ in range(steps):  # 模拟指定时间步
+        recorder = _TraceRecorder(n, steps, record, patient_zero)
+        for step in range(steps):  # 模拟指定时间步
             new_status = status.copy()
-            for node in range(self.network_size):
+            for node in range(n):
                 if status[node] == 1:  # 感染节点
                     neighbors = list(G.neighbors(node))
                     for neighbor in neighbors:
-                        if status[neighbor] == 0 and np.random.rand() < self.beta:
+                        if status[neighbor] == 0 and rng.random() < self.beta:
                             new_status[neighbor] = 1
-                    if np.random.rand() < self.gamma:
+                    if rng.random() < self.gamma:
                         new_status[node] = 2
+            recorder.add(step, new_status, (status == 0) & (new_status == 1), (status == 1) & (new_status == 2))
             status = new_status
-            history.append(status.copy())
 
-        return G, np.array(history)
+        return recorder.result()
 
-    def plot_results(self, t: np.ndarray, solutions: np.ndarray, model_type: str = 'SIR') -> None:
-        plt.figure(figsize=(12, 6))
-        if model_type == 'SIR':
-            S, I, R = solutions.T
-            plt.plot(t, S, label='Susceptible')
-            plt.plot(t, I, label='Infected')
-            plt.plot(t, R, label='Recovered')
+    def _simulate_sparse(self, adj: sp.csr_array, steps: int, rng: np.random.Generator,
+                         record: str = 'dense') -> Union[np.ndarray, NetworkTrace]:
+        """基于CSR邻接矩阵的向量化传播模拟
+
+        易感节点有k个感染邻居时，逐边独立以beta传染等价于以 1-(1-beta)^k 的概率被感染；
+        感染压力k由一次稀疏矩阵-向量乘得到。易感与感染节点互不相交，
+        因此每步只需一次长度为n的随机抽样，同时用于感染和康复判定。
+        """
+        n = adj.shape[0]
+        status = np.zeros(n, dtype=np.uint8)
+        patient_zero = rng.integers(0, n)
+        status[patient_zero] = 1
+        escape = 1.0 - self.beta
+
+        recorder = _TraceRecorder(n, steps, record, patient_zero)
+        for step in range(steps):
+            infected = status == 1
+            pressure = adj @ infected.astype(np.float64)  # 每个节点的感染邻居数
+            draws = rng.random(n)
+            new_infections = (status == 0) & (draws < 1.0 - np.power(escape, pressure))
+            recoveries = infected & (draws < self.gamma)
+            status[new_infections] = 1
+            status[recoveries] = 2
+            recorder.add(step, status, new_infections, recoveries)
+
+        return recorder.result()
+
+    def _simulate_event(self, adj: sp.csr_array, steps: int, rng: np.random.Generator,
+                        record: str = 'dense') -> Union[np.ndarray, NetworkTrace]:
+        """连续时间事件驱动（next-reaction）传播模拟
+
+        与离散时间引擎一样，在第k步内被感染的节点从下一步开始传染，感染期为服从参数gamma的几何分布的
+        整数步T（康复的那一步仍会传染），其间沿每条边以速率 -ln(1-beta) 传染，即每步传染概率恰为beta，
+        沿一条边的总传染概率为 beta/(1-(1-beta)(1-gamma))。因此逐步的S/I/R分布与离散引擎一致。
+        节点被感染时抽取其康复时刻，并为易感邻居抽取早于康复时刻的传染时刻放入优先队列；
+        队列只含感染事件，总开销与被感染节点的度数之和成正比，而不是 节点数 × 步数。
+        第k行历史对应时刻 k+1，与离散时间引擎的约定一致。
+        """
+        if record not in VALID_RECORDS:
+            raise ValueError(f"Invalid record mode. Must be one of {VALID_RECORDS}")
+
+        n = adj.shape[0]
+        indptr, indices = adj.indptr, adj.indices
+        horizon = float(steps)
+        transmit_scale = self._event_scale(self.beta)
+
+        infected = np.zeros(n, dtype=bool)
+        scheduled = np.full(n, np.inf)       # 当前最早的待发生感染时刻
+        recovery_time = np.full(n, np.inf)
+        patient_zero = int(rng.integers(0, n))
+        scheduled[patient_zero] = 0.0
+        queue = [(0.0, patient_zero)]
+
+        while queue:
+            t, node = heapq.heappop(queue)
+            if infected[node] or t > scheduled[node]:
+                continue  # 已被更早的事件感染，或该事件已被更早的传染时刻取代
+            infected[node] = True
+            start = np.ceil(t)  # 从下一个整数时刻（下一步）开始传染
+            recovery = start + (rng.geometric(self.gamma) if self.gamma > 0 else np.inf)
+            recovery_time[node] = recovery
+
+            neighbors = indices[indptr[node]:indptr[node + 1]]
+            neighbors = neighbors[~infected[neighbors]]
+            if len(neighbors) == 0:
+                continue
+            candidates = start + rng.exponential(transmit_scale, size=len(neighbors))
+            hit = (candidates < recovery) & (candidates < scheduled[neighbors]) & (candidates <= horizon)
+            for neighbor, when in zip(neighbors[hit], candidates[hit]):
+                scheduled[neighbor] = when
+                heapq.heappush(queue, (when, int(neighbor)))
+
+        infection_step = self._time_to_step(np.where(infected, scheduled, np.inf), horizon)
+        recovery_step = self._time_to_step(recovery_time, horizon)
+        trace = NetworkTrace.from_events(n, steps, infection_step, recovery_step)
+        if record == 'dense':
+            return trace.to_dense()
+        if record == 'counts':
+            return NetworkTrace(trace.counts)
+        return trace
+
+    @staticmethod
+    def _event_scale(p: float) -> float:
+        """每步概率p对应的指数分布等待时间尺度 1/(-ln(1-p))"""
+        if p >= 1:
+            return 0.0
+        if p <= 0:
+            return np.inf
+        return -1.0 / np.log1p(-p)
+
+    @staticmethod
+    def _time_to_step(times: np.ndarray, horizon: float) -> np.ndarray:
+        """时刻t落在 (k, k+1] 内记为第k步；超出模拟时长的记为 NetworkTrace.NEVER"""
+        steps = np.full(len(times), NetworkTrace.NEVER, dtype=np.int32)
+        within = times <= horizon
+        steps[within] = np.maximum(np.ceil(times[within]) - 1, 0)
+        return steps
+
+    def network_ensemble(self, graph_type: Union[str, ContactNetwork] = 'watts_strogatz', replicates: int = 100,
+                         steps: int = 50,
+                         quantiles: Sequence[float] = (0.05, 0.5, 0.95), workers: int = 1,
+                         batch_size: Optional[int] = None, seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """在同一张网络上运行多次独立的蒙特卡洛传播模拟
+
+        副本按批堆叠为 (副本 × 节点) 状态矩阵，每步一次稀疏矩阵乘完成整批推进；
+        workers>1 时各批分发到进程池，每批使用由 SeedSequence 派生的独立随机流。
+        只保留每步的S/I/R计数，不保存完整历史。graph_type 为 ContactNetwork 时各进程各自映射同一缓存。
+
+        返回字典:
+            mean: (steps, 3) 每步S/I/R平均人数
+            quantiles: (len(quantiles), steps, 3) 每步S/I/R分位数
+            quantile_levels: 分位点
+            final_size: (replicates,) 每个副本最终累计感染人数 (I+R)
+        """
+        if replicates < 1:
+            raise ValueError("replicates must be positive")
+
+        seed_seq = np.random.SeedSequence(seed)
+        graph_seed, dynamics_seed = seed_seq.spawn(2)
+        if isinstance(graph_type, ContactNetwork):
+            network, adj = graph_type, graph_type.adjacency
+        else:
+            adj = network = self.graph_to_csr(self.build_graph(graph_type, seed=int(graph_seed.generate_state(1)[0])))
+
+        n = adj.shape[0]
+        if batch_size is None:
+            batch_size = max(1, ENSEMBLE_BATCH_ELEMENTS // max(n, 1))
+        if workers > 1:
+            batch_size = min(batch_size, -(-replicates // workers))  # 保证每个进程都分到任务
+        sizes = [min(batch_size, replicates - start) for start in range(0, replicates, batch_size)]
+        batch_seeds = dynamics_seed.spawn(len(sizes))
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parts = list(executor.map(self._simulate_ensemble, [network] * len(sizes), [steps] * len(sizes),
+                                          sizes, batch_seeds))
         else:
-            S, E, I, R = solutions.T
-            plt.plot(t, S, label='Susceptible')
-            plt.plot(t, E, label='Exposed')
-            plt.plot(t, I, label='Infected')
-            plt.plot(t, R, label='Recovered')
-
-        plt.xlabel('Days')
-        plt.ylabel('Population')
-        plt.title(f'{model_type} Model Simulation')
-        plt.legend()
-        plt.grid()
-        plt.show()
-
-    def plot_network(self, G: nx.Graph, history: np.ndarray, step: int = -1) -> None:
-        """可视化网络传播过程"""
+            parts = [self._simulate_ensemble(adj, steps, size, batch_seed)
+                     for size, batch_seed in zip(sizes, batch_seeds)]
+        counts = np.concatenate(parts, axis=1)  # (steps, replicates, 3)
+
+        levels = np.asarray(quantiles, dtype=np.float64)
+        return {
+            'mean': counts.mean(axis=1),
+            'quantiles': np.quantile(counts, levels, axis=1),
+            'quantile_levels': levels,
+            'final_size': counts[-1, :, 1] + counts[-1, :, 2],
+        }
+
+    def _simulate_ensemble(self, adj: Union[sp.csr_array, ContactNetwork], steps: int, replicates: int,
+                           seed: np.random.SeedSequence) -> np.ndarray:
+        """批量推进一组副本，返回 (steps, replicates, 3) 的S/I/R计数"""
+        if isinstance(adj, ContactNetwork):
+            adj = adj.adjacency
+        rng = np.random.default_rng(seed)
+        n = adj.shape[0]
+        status = np.zeros((replicates, n), dtype=np.int8)
+        status[np.arange(replicates), rng.integers(0, n, size=replicates)] = 1
+        escape = 1.0 - self.beta
+
+        counts = np.empty((steps, replicates, 3), dtype=np.int64)
+        for step in range(steps):
+            infected = status == 1
+            pressure = (adj @ infected.T.astype(np.float64)).T  # 邻接矩阵对称，整批一次乘法
+            draws = rng.random((replicates, n))
+            new_infections = (status == 0) & (draws < 1.0 - np.power(escape, pressure))
+            recoveries = infected & (draws < self.gamma)
+            status[new_infections] = 1
+            status[recoveries] = 2
+            for state in range(3):
+                counts[step, :, state] = np.count_nonzero(status == state, axis=1)
+
+        return counts
+
+    def plot_results(self, t: np.ndarray, solutions: np.ndarray, model_type: str = 'SIR') -> None:
+        self.figures.render(f'{model_type.lower()}_results', _draw_results, t, solutions, model_type,
+                            figsize=(12, 6))
+
+    def graph_layout(self, G: nx.Graph) -> Dict:
+        """返回G的spring_layout，同一张图（节点与边数未变）只计算一次"""
+        cached = self._layouts.get(G)
+        if cached is not None and cached[0] == (G.number_of_nodes(), G.number_of_edges()):
+            return cached[1]
+        pos = nx.spring_layout(G)
+        self._layouts[G] = ((G.number_of_nodes(), G.number_of_edges()), pos)
+        return pos
+
+    def plot_network(self, G: Union[nx.Graph, ContactNetwork], history: Union[np.ndarray, NetworkTrace],
+                     step: int = -1) -> None:
+        """可视化网络传播过程（history可为历史矩阵或events模式的NetworkTrace）
+
+        G为ContactNetwork时只画从首批感染节点出发广度优先抽取的 plot_sample 个节点的子图。
+        """
         if len(history) == 0:
             raise ValueError("History data is empty")
 
         step = min(step, len(history)-1)  # 确保不越界
-        plt.figure(figsize=(10, 8))
-        colors = ListedColormap(['green', 'red', 'blue'])  # 易感, 感染, 康复
-        pos = nx.spring_layout(G)
-        nx.draw(G, pos, node_color=history[step], cmap=colors,
-                node_size=50, with_labels=False)
-        plt.title(f'Network Spread at Step {step}')
-        plt.show()
+        state = history[step]
+        if isinstance(G, ContactNetwork):
+            reached = np.flatnonzero(history[0])
+            G, nodes = G.sample_subgraph(self.plot_sample, start=reached[0] if len(reached) else None)
+            state = state[nodes]
+        self.figures.render('network', _draw_network, G, self.graph_layout(G), state, step,
+                            figsize=(10, 8))
 
     def run_sir_simulation(self) -> None:
         # 初始条件: 1个感染者, 其余易感
@@ -134,26 +729,66 @@ class EpidemicModels:
         # 计算潜伏期影响
         print(f"Latent period = {1/self.sigma:.1f} days")
 
-    def run_network_simulation(self, graph_type: str = 'watts_strogatz') -> None:
+    def run_parameter_sweep(self, model_type: str = 'SIR', beta: Sequence[float] = None,
+                            gamma: Sequence[float] = None, sigma: Sequence[float] = None) -> None:
+        result = self.parameter_sweep(model_type, beta=beta, gamma=gamma, sigma=sigma)
+        peak = result['peak_infected']
+        print(f"Grid points: {peak.size} ({' x '.join(map(str, peak.shape))})")
+        print(f"Peak infected: {peak.min():.0f} - {peak.max():.0f}")
+        print(f"Peak time: {result['peak_time'].min():.1f} - {result['peak_time'].max():.1f} days")
+        print(f"Final size: {result['final_size'].min():.0f} - {result['final_size'].max():.0f}")
+
+    def run_network_simulation(self, graph_type: Union[str, ContactNetwork] = 'watts_strogatz',
+                               engine: str = 'sparse') -> None:
         try:
-            G, history = self.network_simulation(graph_type)
-            self.plot_network(G, history)
+            G, trace = self.network_simulation(graph_type, engine=engine, record='events')
+            self.plot_network(G, trace)
 
-            if len(history) == 0:
+            if len(trace) == 0:
                 print("No simulation results to display")
                 return
 
             # 计算传播范围
-            final_infected = np.sum(history[-1] == 1)
-            final_recovered = np.sum(history[-1] == 2)
-            print(f"Final infected: {final_infected} ({final_infected/self.network_size:.1%})")
-            print(f"Final recovered: {final_recovered} ({final_recovered/self.network_size:.1%})")
+            n = trace.counts[-1].sum()
+            _, final_infected, final_recovered = trace.counts[-1]
+            print(f"Final infected: {final_infected} ({final_infected/n:.1%})")
+            print(f"Final recovered: {final_recovered} ({final_recovered/n:.1%})")
         except Exception as e:
             print(f"Network simulation failed: {str(e)}")
 
+    def run_network_ensemble(self, graph_type: Union[str, ContactNetwork] = 'watts_strogatz', replicates: int = 100,
+                             workers: int = 1) -> None:
+        result = self.network_ensemble(graph_type, replicates=replicates, workers=workers)
+        final_size = result['final_size']
+        low, high = np.quantile(final_size, [0.05, 0.95])
+        peak = result['mean'][:, 1].max()
+        n = result['mean'][-1].sum()
+        print(f"Replicates: {replicates}")
+        print(f"Mean final size: {final_size.mean():.1f} ({final_size.mean()/n:.1%})")
+        print(f"90% interval of final size: [{low:.0f}, {high:.0f}]")
+        print(f"Mean peak infected: {peak:.1f}")
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='传染病模型模拟')
+    parser.add_argument('--headless', action='store_true',
+                        help="不弹出窗口，图像由后台进程通过Agg后端写入 --figure-dir")
+    parser.add_argument('--figure-dir', type=str, default=os.path.join('output', 'figures'),
+                        help="headless模式下的图像输出目录")
+    parser.add_argument('--edge-list', type=str, default=None,
+                        help="真实接触网络的边列表（每行 \"u v\"）；首次运行解析为CSR缓存，之后直接内存映射")
+    parser.add_argument('--network-cache', type=str, default=None,
+                        help="CSR缓存目录，默认 output/networks/<边列表文件名>")
+    parser.add_argument('--delimiter', type=str, default=None, help="边列表的分隔符，默认任意空白")
+    parser.add_argument('--comment', type=str, default='#', help="边列表的注释行前缀")
+    parser.add_argument('--network-engine', type=str, default='sparse', choices=['sparse', 'event'],
+                        help="在接触网络上使用的传播引擎")
+    cli_args = parser.parse_args()
+
     try:
-        model = EpidemicModels()
+        model = EpidemicModels(render_mode='save' if cli_args.headless else 'show',
+                               figure_dir=cli_args.figure_dir)
 
         print("=== SIR Model Simulation ===")
         model.run_sir_simulation()
@@ -161,6 +796,10 @@ if __name__ == "__main__":
         print("\n=== SEIR Model Simulation ===")
         model.run_seir_simulation()
 
+        print("\n=== SEIR Parameter Sweep ===")
+        model.run_parameter_sweep('SEIR', beta=np.linspace(0.1, 0.6, 20),
+                                  gamma=np.linspace(0.05, 0.3, 20), sigma=np.linspace(0.1, 0.5, 10))
+
         print("\n=== Network Spread Simulation (Watts-Strogatz) ===")
         model.run_network_simulation('watts_strogatz')
 
@@ -169,5 +808,18 @@ if __name__ == "__main__":
 
         print("\n=== Network Spread Simulation (Random) ===")
         model.run_network_simulation('random')
+
+        print("\n=== Network Ensemble (Watts-Strogatz, 100 replicates) ===")
+        model.run_network_ensemble('watts_strogatz', replicates=100)
+
+        if cli_args.edge_list:
+            network = load_contact_network(cli_args.edge_list, cli_args.network_cache,
+                                           delimiter=cli_args.delimiter, comment=cli_args.comment)
+            print(f"\n=== Network Spread Simulation (contact network: {network.meta['nodes']} nodes, "
+                  f"{network.meta['edges']} edges) ===")
+            model.run_network_simulation(network, engine=cli_args.network_engine)
+
+        for path in model.figures.close():
+            print(f"Figure saved: {path}")
     except Exception as e:
         print(f"Simulation error: {str(e)}")
\ No newline at end of file
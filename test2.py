@@ -1,185 +1,466 @@
+import os
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from scipy import stats
-from sklearn.linear_model import LinearRegression
 import seaborn as sns
+from utils.plotting import FigureSink
+
+PHASE_ORDER = ['pre_4weeks', 'pre_1week', 'pre_24h', 'during', 'post']
+PHASE_LABELS = ['4 Weeks Before', '1 Week Before', '24 Hours Before', 'During Exam', 'After Exam']
+
+# 各阶段焦虑 = 基线 × 均匀分布因子 + 噪声
+PHASE_FACTORS = {
+    'pre_4weeks': (0.7, 0.9),
+    'pre_1week': (0.8, 1.1),
+    'pre_24h': (1.1, 1.4),
+    'during': (0.8, 1.2),
+    'post': (0.6, 0.95),
+}
+# 分类变量: (类别, 概率)；按int8编码存储
+CATEGORIES = {
+    'gender': (['Male', 'Female'], [0.45, 0.55]),
+    'major': (['STEM', 'Humanities'], [0.6, 0.4]),
+    'intervention': (['Mindfulness', 'Control'], [0.5, 0.5]),
+}
+COLUMN_ORDER = ['student_id', 'gender', 'major', 'baseline_anxiety'] + PHASE_ORDER + \
+               ['hrv', 'eda', 'intervention', 'cortisol_change', 'gpa_change']
+MEASURES = ['baseline_anxiety'] + PHASE_ORDER + ['hrv', 'eda', 'cortisol_change', 'gpa_change']
+# 报告中的对比方向 (分组列, 类别a, 类别b)：差值与t统计量均为 a - b
+CONTRASTS = [('major', 'STEM', 'Humanities'), ('gender', 'Female', 'Male'), ('intervention', 'Mindfulness', 'Control')]
+CORRELATION_PAIRS = [('eda', 'during'), ('hrv', 'during'), ('baseline_anxiety', 'gpa_change')]
+# 磁盘上的存储类型：分类列存int8编码，其余数值列为float32
+COLUMN_DTYPES = {c: ('int32' if c == 'student_id' else 'int8' if c in CATEGORIES else 'float32')
+                 for c in COLUMN_ORDER}
+
+
+def _draw_anxiety_timeline(fig, phase_data):
+    ax = fig.add_subplot()
+    sns.lineplot(data=phase_data,
+                 estimator='mean',
+                 errorbar=('ci', 95),
+                 linewidth=2.5,
+                 ax=ax)
+
+    ax.set_title('Exam Anxiety Timeline (Mean ± 95% CI)', fontsize=14)
+    ax.set_xlabel('Exam Phase', fontsize=12)
+    ax.set_ylabel('Anxiety Score (0-100)', fontsize=12)
+    ax.set_xticks(range(5), PHASE_LABELS, rotation=15)
+    ax.set_ylim(20, 100)
+    ax.grid(alpha=0.3)
+    fig.tight_layout()
+
+
+def _draw_physio_correlations(fig, physio_data):
+    ax1, ax2 = fig.subplots(1, 2)
+
+    sns.regplot(x='eda', y='during', data=physio_data, ax=ax1)
+    ax1.set_title('EDA vs Exam Anxiety')
+    ax1.set_xlabel('Electrodermal Activity (μS)')
+    ax1.set_ylabel('Anxiety Score')
+
+    sns.regplot(x='hrv', y='during', data=physio_data, ax=ax2)
+    ax2.set_title('HRV vs Exam Anxiety')
+    ax2.set_xlabel('Heart Rate Variability (ms)')
+    ax2.set_ylabel('Anxiety Score')
+
+    fig.tight_layout()
+
+
+def _draw_intervention(fig, intervention_data):
+    ax = fig.add_subplot()
+    sns.boxplot(x='intervention', y='cortisol_change', data=intervention_data, ax=ax)
+    ax.set_title('Cortisol Change by Intervention Group')
+    ax.set_xlabel('Intervention Group')
+    ax.set_ylabel('Cortisol Change (nmol/L)')
+
+
+def _draw_long_term(fig, long_term_data):
+    ax = fig.add_subplot()
+    sns.regplot(x='baseline_anxiety', y='gpa_change', data=long_term_data, ax=ax)
+    ax.set_title('Baseline Anxiety vs GPA Change')
+    ax.set_xlabel('Baseline Anxiety Score')
+    ax.set_ylabel('GPA Change')
+
+
+def _cohens_d(mean_a, std_a, mean_b, std_b):
+    """两组标准差的平方平均作为合并标准差"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (mean_a - mean_b) / np.sqrt((std_a ** 2 + std_b ** 2) / 2)
+
+
+def _chunk_rng(seed, index):
+    """第index块的独立随机流：与块数和生成顺序无关，可单独重算或并行生成任意一块"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+def _boot_rng(seed, index):
+    """第index块自助法权重的随机流，与生成数据的 _chunk_rng 分开，即使两者seed相同也不共用随机数"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(1, index)))
+
+
+def _generate_chunk(rng, start, size):
+    """生成学号从 start+1 开始的 size 名学生；浮点列为float32，分类列为category"""
+    data = {'student_id': np.arange(start + 1, start + size + 1, dtype=np.int32)}
+    codes = {name: rng.choice(len(levels), size=size, p=p).astype(np.int8)
+             for name, (levels, p) in CATEGORIES.items()}
+    for name in ['gender', 'major']:
+        data[name] = pd.Categorical.from_codes(codes[name], CATEGORIES[name][0])
+    baseline = rng.normal(50, 10, size).clip(20, 80)
+    data['baseline_anxiety'] = baseline
+
+    # 生成各阶段焦虑数据
+    for phase, (low, high) in PHASE_FACTORS.items():
+        values = baseline * rng.uniform(low, high, size)
+        values += rng.normal(0, 3, size)  # 添加随机噪声
+        data[phase] = values.clip(20, 100)
+
+    # 生成生理指标
+    data['hrv'] = rng.normal(60, 15, size).clip(30, 100)
+    data['eda'] = rng.exponential(5, size).clip(1, 20)
+
+    # 添加干预和长期追踪数据
+    data['intervention'] = pd.Categorical.from_codes(codes['intervention'], CATEGORIES['intervention'][0])
+    mindful = codes['intervention'] == CATEGORIES['intervention'][0].index('Mindfulness')
+    data['cortisol_change'] = rng.normal(-5, 10, size) * mindful + rng.normal(0, 5, size)
+    data['gpa_change'] = rng.normal(0, 0.3, size) - 0.01 * baseline
+
+    frame = pd.DataFrame(data)[COLUMN_ORDER]
+    return frame.astype({c: dtype for c, dtype in COLUMN_DTYPES.items() if dtype == 'float32'})
+
+
+def generate_chunks(n_students, chunk_size=100_000, seed=42):
+    """逐块生成学生数据，每块最多 chunk_size 行；相同的 seed 与 chunk_size 得到相同的数据"""
+    for index, start in enumerate(range(0, n_students, chunk_size)):
+        yield _generate_chunk(_chunk_rng(seed, index), start, min(chunk_size, n_students - start))
+
+
+def write_student_data(path, n_students, chunk_size=100_000, seed=42):
+    """把生成的数据逐块写入 path/<列名>.npy（内存映射）与 path/meta.json，内存占用只与 chunk_size 有关"""
+    os.makedirs(path, exist_ok=True)
+    columns = {c: np.lib.format.open_memmap(os.path.join(path, f"{c}.npy"), mode='w+', dtype=dtype,
+                                            shape=(n_students,))
+               for c, dtype in COLUMN_DTYPES.items()}
+    start = 0
+    for chunk in generate_chunks(n_students, chunk_size, seed):
+        stop = start + len(chunk)
+        for c, column in columns.items():
+            column[start:stop] = chunk[c].cat.codes.to_numpy() if c in CATEGORIES else chunk[c].to_numpy()
+        start = stop
+    for column in columns.values():
+        column.flush()
+    meta = {'n_rows': n_students, 'chunk_size': chunk_size, 'seed': seed, 'dtypes': COLUMN_DTYPES,
+            'categories': {c: levels for c, (levels, _) in CATEGORIES.items()}}
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return StudentDataset(path)
+
+
+class StudentDataset:
+    """磁盘上按列存储的学生数据，只在读取时映射需要的列与行"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.categories = self.meta['categories']
+
+    def __len__(self):
+        return self.meta['n_rows']
+
+    def column(self, name):
+        """列的内存映射数组；分类列为int8编码，类别见 categories"""
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+
+    def _frame(self, arrays, rows):
+        return pd.DataFrame({name: (pd.Categorical.from_codes(array[rows], self.categories[name])
+                                    if name in self.categories else np.asarray(array[rows]))
+                             for name, array in arrays.items()})
+
+    def iter_chunks(self, columns=None, chunk_size=1_000_000):
+        """按行分块读取指定列，每块为一个DataFrame"""
+        arrays = {name: self.column(name) for name in (columns or COLUMN_ORDER)}
+        for start in range(0, len(self), chunk_size):
+            yield self._frame(arrays, slice(start, start + chunk_size))
+
+    def sample(self, n, columns=None, seed=0):
+        """随机抽取n行（按行号排序读取），用于作图"""
+        rows = np.sort(np.random.default_rng(seed).choice(len(self), size=min(n, len(self)), replace=False))
+        return self._frame({name: self.column(name) for name in (columns or COLUMN_ORDER)}, rows)
+
+
+class StreamingMoments:
+    """逐块累加各分组的 n、Σx、Σx² 与变量对的交叉和，一遍读完数据后批量给出所有 分组×指标 的检验结果
+
+    categories: {分组列: 类别列表}；columns: 参与比较的数值列；pairs: 需要相关/回归的 (x, y) 列对
+    统计量按所有分组列的组合单元（如 性别×专业×干预 共8格）累加，任一分组的各类别由单元相加得到。
+    n_boot: 泊松自助法的重复次数（0表示不做）。每 boot_block 行为一个重抽样单位，在每次重复中的
+            权重服从Poisson(1)；boot_block=1 即逐行自助，数据很大时取更大的块以减少随机数与计算量。
+            每块数据使用独立的随机流，并行累加的结果与线程数、块的处理顺序无关。
+    """
+
+    def __init__(self, categories, columns, pairs=(), n_boot=0, seed=0, boot_block=1):
+        self.categories = categories
+        self.columns = list(columns)
+        self.pairs = list(pairs)
+        self.n_boot = n_boot
+        self.seed = seed
+        self.boot_block = boot_block
+        shape = [len(cats) for cats in categories.values()]
+        width = 1 + 2 * len(self.columns)  # 每个单元: Σ1, Σx..., Σx²...
+        # 单元 -> 各分组类别的 one-hot 映射，单元编号按分组列的混合进制排列
+        n_cells = int(np.prod(shape))
+        self._levels = {g: np.eye(len(cats))[levels]
+                        for (g, cats), levels in zip(categories.items(), np.unravel_index(np.arange(n_cells), shape))}
+        self.cells = np.zeros((n_cells, width))
+        self.boot_cells = np.zeros((n_boot, n_cells, width))
+        self.cross = {pair: np.zeros(6) for pair in self.pairs}  # n, Σx, Σy, Σx², Σy², Σxy
+
+    # ---- 累加 ----
+    def _partial(self, chunk, index):
+        """只读地计算一个块的统计量，可在工作线程中调用"""
+        values = chunk[self.columns].to_numpy(np.float64)
+        stacked = np.hstack([np.ones((len(values), 1)), values, values * values])
+        n_cells = len(self.cells)
+        cell = np.zeros(len(values), dtype=np.int64)
+        for g, cats in self.categories.items():
+            cell = cell * len(cats) + chunk[g].cat.codes.to_numpy()
+        blocks = -(-len(values) // self.boot_block) if self.n_boot else 1
+        key = cell + (np.arange(len(values)) // self.boot_block) * n_cells if self.n_boot else cell
+        sums = np.stack([np.bincount(key, weights=column, minlength=blocks * n_cells) for column in stacked.T],
+                        axis=-1).reshape(blocks, n_cells, -1)  # 块 × 单元 × 统计量
+        boot = None
+        if self.n_boot:
+            weights = _boot_rng(self.seed, index).poisson(1.0, (self.n_boot, blocks)).astype(np.float64)
+            boot = np.tensordot(weights, sums, axes=1)
+        cross = {}
+        for a, b in self.pairs:
+            x, y = chunk[a].to_numpy(np.float64), chunk[b].to_numpy(np.float64)
+            cross[(a, b)] = np.array([len(x), x.sum(), y.sum(), x @ x, y @ y, x @ y])
+        return sums.sum(axis=0), boot, cross
+
+    def _merge(self, partial):
+        cells, boot, cross = partial
+        self.cells += cells
+        if self.n_boot:
+            self.boot_cells += boot
+        for pair in cross:
+            self.cross[pair] += cross[pair]
+
+    def update(self, chunk, index=0):
+        """累加一个块；index 决定该块自助法的随机流，不同块须使用不同的 index"""
+        self._merge(self._partial(chunk, index))
+        return self
+
+    def accumulate(self, chunks, workers=1):
+        """按顺序给各块编号并累加；workers>1 时在线程池中并行计算，同时最多持有 2×workers 个块"""
+        if workers <= 1:
+            for index, chunk in enumerate(chunks):
+                self.update(chunk, index)
+            return self
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for index, chunk in enumerate(chunks):
+                pending.append(pool.submit(self._partial, chunk, index))
+                if len(pending) >= 2 * workers:
+                    self._merge(pending.popleft().result())
+            while pending:
+                self._merge(pending.popleft().result())
+        return self
+
+    # ---- 结果 ----
+    def _moments(self, grouping, boot=False):
+        """某一分组各类别的 (n, 均值, 样本标准差)，最后两维为 类别 × 列；boot=True 时前面多一维自助重复"""
+        acc = np.einsum('...cw,ck->...kw', self.boot_cells if boot else self.cells, self._levels[grouping])
+        p = len(self.columns)
+        total, squares = acc[..., 1:p + 1], acc[..., p + 1:]
+        n = np.broadcast_to(acc[..., :1], total.shape)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / n
+            std = np.sqrt(np.maximum(squares - n * mean ** 2, 0.0) / (n - 1))
+        return n, mean, std
+
+    def describe(self, grouping, level, column):
+        """(n, 均值, 样本标准差)"""
+        n, mean, std = self._moments(grouping)
+        i, j = self.categories[grouping].index(level), self.columns.index(column)
+        return int(n[i, j]), mean[i, j], std[i, j]
+
+    def comparisons(self, contrasts=None, confidence=0.95):
+        """所有 对比×指标 的两组独立样本t检验（方差齐性，与 stats.ttest_ind 默认一致）与Cohen's d，返回整洁表
+
+        contrasts: [(分组列, 类别a, 类别b), ...]，默认为每个分组中类别两两比较；
+        有自助法结果时附带均值差与 d 的百分位置信区间。
+        """
+        if contrasts is None:
+            contrasts = [(g, cats[i], cats[j]) for g, cats in self.categories.items()
+                         for i in range(len(cats)) for j in range(i + 1, len(cats))]
+        tables = []
+        alpha = (1 - confidence) / 2
+        for grouping, a, b in contrasts:
+            i, j = self.categories[grouping].index(a), self.categories[grouping].index(b)
+            n, mean, std = self._moments(grouping)
+            table = pd.DataFrame({'grouping': grouping, 'level_a': a, 'level_b': b, 'measure': self.columns,
+                                  'n_a': n[i].astype(np.int64), 'mean_a': mean[i], 'sd_a': std[i],
+                                  'n_b': n[j].astype(np.int64), 'mean_b': mean[j], 'sd_b': std[j]})
+            table['diff'] = mean[i] - mean[j]
+            dof = n[i] + n[j] - 2
+            pooled = np.sqrt(((n[i] - 1) * std[i] ** 2 + (n[j] - 1) * std[j] ** 2) / dof)
+            table['t'] = table['diff'] / (pooled * np.sqrt(1 / n[i] + 1 / n[j]))
+            table['df'] = dof
+            table['p'] = 2 * stats.t.sf(np.abs(table['t']), dof)
+            table['cohens_d'] = _cohens_d(mean[i], std[i], mean[j], std[j])
+            if self.n_boot:
+                _, bmean, bstd = self._moments(grouping, boot=True)
+                diffs = bmean[:, i] - bmean[:, j]
+                effects = _cohens_d(bmean[:, i], bstd[:, i], bmean[:, j], bstd[:, j])
+                table['diff_ci_low'], table['diff_ci_high'] = np.nanquantile(diffs, [alpha, 1 - alpha], axis=0)
+                table['d_ci_low'], table['d_ci_high'] = np.nanquantile(effects, [alpha, 1 - alpha], axis=0)
+            tables.append(table)
+        return pd.concat(tables, ignore_index=True)
+
+    def pearson(self, a, b):
+        n, sx, sy, sxx, syy, sxy = self.cross[(a, b)]
+        r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+        t_stat = r * np.sqrt((n - 2) / max(1 - r ** 2, 1e-300))
+        return r, 2 * stats.t.sf(abs(t_stat), n - 2)
+
+    def regression(self, x, y):
+        """一元线性回归 y = βx + 截距，返回 (β, 截距)"""
+        n, sx, sy, sxx, _, sxy = self.cross[(x, y)]
+        slope = (n * sxy - sx * sy) / (n * sxx - sx ** 2)
+        return slope, (sy - slope * sx) / n
 
-# 设置随机种子保证可重复性
-np.random.seed(42)
 
 class ExamAnxietySimulator:
-    def __init__(self, n_students=100):
-        self.n_students = n_students
-        self.student_data = self._generate_data()
+    """n_students 名学生的考试焦虑模拟
+
+    data_path: 可选，write_student_data 写出的数据目录；给出时数据留在磁盘上逐块读取统计，
+               作图只使用 plot_sample 行的随机样本
+    所有分组比较、相关与回归都由一次 StreamingMoments 累加得到（见 statistics / hypothesis_tests），
+    n_boot 为自助法置信区间的重复次数，workers 为并行累加的线程数。
+    """
+
+    def __init__(self, n_students=100, render_mode='show', figure_dir=os.path.join('output', 'figures'),
+                 seed=42, data_path=None, plot_sample=5000, n_boot=1000, workers=4, chunk_size=1_000_000):
+        self.seed = seed
+        self.n_boot = n_boot
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.dataset = StudentDataset(data_path) if data_path else None
+        if self.dataset is not None:
+            self.n_students = len(self.dataset)
+            self.student_data = self.dataset.sample(plot_sample, seed=seed)
+        else:
+            self.n_students = n_students
+            self.student_data = self._generate_data()
+        self.figures = FigureSink(render_mode, figure_dir)  # 'save' 模式下后台写盘，不阻塞分析
+        self._moments = None
 
     def _generate_data(self):
         """生成模拟学生数据"""
-        data = {
-            'student_id': range(1, self.n_students+1),
-            'gender': np.random.choice(['Male', 'Female'], size=self.n_students, p=[0.45, 0.55]),
-            'major': np.random.choice(['STEM', 'Humanities'], size=self.n_students, p=[0.6, 0.4]),
-            'baseline_anxiety': np.random.normal(50, 10, self.n_students).clip(20, 80)
-        }
-
-        # 生成各阶段焦虑数据
-        phases = ['pre_4weeks', 'pre_1week', 'pre_24h', 'during', 'post']
-        for phase in phases:
-            if phase == 'pre_4weeks':
-                data[phase] = data['baseline_anxiety'] * np.random.uniform(0.7, 0.9, self.n_students)
-            elif phase == 'pre_1week':
-                data[phase] = data['baseline_anxiety'] * np.random.uniform(0.8, 1.1, self.n_students)
-            elif phase == 'pre_24h':
-                data[phase] = data['baseline_anxiety'] * np.random.uniform(1.1, 1.4, self.n_students)
-            elif phase == 'during':
-                data[phase] = data['baseline_anxiety'] * np.random.uniform(0.8, 1.2, self.n_students)
-            else:  # post
-                data[phase] = data['baseline_anxiety'] * np.random.uniform(0.6, 0.95, self.n_students)
-
-            # 添加随机噪声
-            data[phase] += np.random.normal(0, 3, self.n_students)
-            data[phase] = data[phase].clip(20, 100)
-
-        # 生成生理指标
-        data['hrv'] = np.random.normal(60, 15, self.n_students).clip(30, 100)
-        data['eda'] = np.random.exponential(5, self.n_students).clip(1, 20)
-
-        # 添加干预和长期追踪数据
-        data['intervention'] = np.random.choice(['Mindfulness', 'Control'], size=self.n_students, p=[0.5, 0.5])
-        data['cortisol_change'] = np.random.normal(-5, 10, self.n_students) * (data['intervention'] == 'Mindfulness') + np.random.normal(0, 5, self.n_students)
-        data['gpa_change'] = np.random.normal(0, 0.3, self.n_students) - 0.01 * data['baseline_anxiety']
-
-        return pd.DataFrame(data)
+        return pd.concat(generate_chunks(self.n_students, seed=self.seed), ignore_index=True)
+
+    def _chunks(self):
+        if self.dataset is not None:
+            return self.dataset.iter_chunks(chunk_size=self.chunk_size)
+        return (self.student_data.iloc[start:start + self.chunk_size]
+                for start in range(0, len(self.student_data), self.chunk_size))
+
+    def statistics(self):
+        """一遍读取全部数据得到的充分统计量（首次调用时计算）"""
+        if self._moments is None:
+            categories = {name: levels for name, (levels, _) in CATEGORIES.items()}
+            # 自助法约以2万个重抽样单位覆盖全部数据：小样本逐行重抽，大样本按行块重抽
+            self._moments = StreamingMoments(categories, MEASURES, CORRELATION_PAIRS, n_boot=self.n_boot,
+                                             seed=self.seed, boot_block=max(1, self.n_students // 20_000))
+            self._moments.accumulate(self._chunks(), self.workers)
+        return self._moments
+
+    def hypothesis_tests(self):
+        """所有 CONTRASTS × MEASURES 的t检验、Cohen's d 与自助法置信区间，每行一个比较"""
+        return self.statistics().comparisons(CONTRASTS)
+
+    def _report(self, title, grouping, measures, effect_size=False):
+        tests = self.hypothesis_tests()
+        rows = tests[(tests['grouping'] == grouping) & tests['measure'].isin(measures)]
+        print(f"\n{title}:")
+        for row in rows.itertuples():
+            print(f"{row.measure.replace('_', ' ').title()}:")
+            print(f"  {row.level_a} Mean: {row.mean_a:.1f} ± {row.sd_a:.1f}")
+            print(f"  {row.level_b} Mean: {row.mean_b:.1f} ± {row.sd_b:.1f}")
+            print(f"  t-test: t = {row.t:.2f}, p = {row.p:.4f}")
+            if effect_size:
+                print(f"  Effect Size: Cohen's d = {row.cohens_d:.2f}")
+            if self.n_boot:
+                print(f"  Bootstrap 95% CI: diff [{row.diff_ci_low:.2f}, {row.diff_ci_high:.2f}], "
+                      f"d [{row.d_ci_low:.2f}, {row.d_ci_high:.2f}]")
+            print()
+        return rows.reset_index(drop=True)
 
     def plot_anxiety_timeline(self):
         """绘制焦虑时间曲线"""
-        phase_order = ['pre_4weeks', 'pre_1week', 'pre_24h', 'during', 'post']
-        phase_labels = ['4 Weeks Before', '1 Week Before', '24 Hours Before', 'During Exam', 'After Exam']
-
-        plt.figure(figsize=(12, 6))
-        sns.lineplot(data=self.student_data[phase_order],
-                    estimator='mean',
-                    errorbar=('ci', 95),
-                    linewidth=2.5)
-
-        plt.title('Exam Anxiety Timeline (Mean ± 95% CI)', fontsize=14)
-        plt.xlabel('Exam Phase', fontsize=12)
-        plt.ylabel('Anxiety Score (0-100)', fontsize=12)
-        plt.xticks(range(5), phase_labels, rotation=15)
-        plt.ylim(20, 100)
-        plt.grid(alpha=0.3)
-        plt.tight_layout()
-        plt.show()
+        self.figures.render('anxiety_timeline', _draw_anxiety_timeline, self.student_data[PHASE_ORDER],
+                            figsize=(12, 6))
 
     def compare_majors(self):
         """比较不同专业的焦虑差异"""
-        stem_data = self.student_data[self.student_data['major'] == 'STEM']
-        hum_data = self.student_data[self.student_data['major'] == 'Humanities']
-
-        print("\nMajor Comparison Results:")
-        for phase in ['pre_24h', 'during']:
-            t_stat, p_val = stats.ttest_ind(stem_data[phase], hum_data[phase])
-            cohens_d = (stem_data[phase].mean() - hum_data[phase].mean()) / np.sqrt(
-                (stem_data[phase].std()**2 + hum_data[phase].std()**2) / 2
-            )
-            print(f"{phase.replace('_', ' ').title()}:")
-            print(f"  STEM Mean: {stem_data[phase].mean():.1f} ± {stem_data[phase].std():.1f}")
-            print(f"  Humanities Mean: {hum_data[phase].mean():.1f} ± {hum_data[phase].std():.1f}")
-            print(f"  t-test: t = {t_stat:.2f}, p = {p_val:.4f}")
-            print(f"  Effect Size: Cohen's d = {cohens_d:.2f}\n")
+        return self._report("Major Comparison Results", 'major', ['pre_24h', 'during'], effect_size=True)
 
     def analyze_physio_correlations(self):
         """分析生理心理相关性"""
         print("\nPhysiological-Psychological Correlations:")
+        moments = self.statistics()
 
         # 皮肤电反应与焦虑相关性
-        corr_eda, p_eda = stats.pearsonr(
-            self.student_data['eda'],
-            self.student_data['during']
-        )
+        corr_eda, p_eda = moments.pearson('eda', 'during')
         print(f"EDA vs During-Exam Anxiety: r = {corr_eda:.2f}, p = {p_eda:.4f}")
 
         # 心率变异性与焦虑相关性
-        corr_hrv, p_hrv = stats.pearsonr(
-            self.student_data['hrv'],
-            self.student_data['during']
-        )
+        corr_hrv, p_hrv = moments.pearson('hrv', 'during')
         print(f"HRV vs During-Exam Anxiety: r = {corr_hrv:.2f}, p = {p_hrv:.4f}")
 
         # 绘制散点图
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-
-        sns.regplot(x='eda', y='during', data=self.student_data, ax=ax1)
-        ax1.set_title('EDA vs Exam Anxiety')
-        ax1.set_xlabel('Electrodermal Activity (μS)')
-        ax1.set_ylabel('Anxiety Score')
-
-        sns.regplot(x='hrv', y='during', data=self.student_data, ax=ax2)
-        ax2.set_title('HRV vs Exam Anxiety')
-        ax2.set_xlabel('Heart Rate Variability (ms)')
-        ax2.set_ylabel('Anxiety Score')
-
-        plt.tight_layout()
-        plt.show()
+        self.figures.render('physio_correlations', _draw_physio_correlations,
+                            self.student_data[['eda', 'hrv', 'during']], figsize=(12, 5))
 
     def gender_differences(self):
         """分析性别差异"""
-        male_data = self.student_data[self.student_data['gender'] == 'Male']
-        female_data = self.student_data[self.student_data['gender'] == 'Female']
-
-        print("\nGender Comparison Results:")
-        for phase in ['pre_24h', 'during', 'post']:
-            t_stat, p_val = stats.ttest_ind(female_data[phase], male_data[phase])
-            print(f"{phase.replace('_', ' ').title()}:")
-            print(f"  Female Mean: {female_data[phase].mean():.1f} ± {female_data[phase].std():.1f}")
-            print(f"  Male Mean: {male_data[phase].mean():.1f} ± {male_data[phase].std():.1f}")
-            print(f"  t-test: t = {t_stat:.2f}, p = {p_val:.4f}\n")
+        return self._report("Gender Comparison Results", 'gender', ['pre_24h', 'during', 'post'])
 
     def intervention_analysis(self):
         """分析干预效果"""
-        print("\nIntervention Analysis:")
-        mind_data = self.student_data[self.student_data['intervention'] == 'Mindfulness']
-        control_data = self.student_data[self.student_data['intervention'] == 'Control']
-
-        t_stat, p_val = stats.ttest_ind(mind_data['cortisol_change'], control_data['cortisol_change'])
-        print(f"Cortisol Change:")
-        print(f"  Mindfulness: {mind_data['cortisol_change'].mean():.1f} ± {mind_data['cortisol_change'].std():.1f}")
-        print(f"  Control: {control_data['cortisol_change'].mean():.1f} ± {control_data['cortisol_change'].std():.1f}")
-        print(f"  t-test: t = {t_stat:.2f}, p = {p_val:.4f}")
+        rows = self._report("Intervention Analysis", 'intervention', ['cortisol_change'])
 
         # 绘制箱线图
-        plt.figure(figsize=(8, 5))
-        sns.boxplot(x='intervention', y='cortisol_change', data=self.student_data)
-        plt.title('Cortisol Change by Intervention Group')
-        plt.xlabel('Intervention Group')
-        plt.ylabel('Cortisol Change (nmol/L)')
-        plt.show()
+        self.figures.render('intervention', _draw_intervention,
+                            self.student_data[['intervention', 'cortisol_change']], figsize=(8, 5))
+        return rows
 
     def long_term_analysis(self):
         """分析长期影响"""
         print("\nLong-term Impact Analysis:")
-        model = LinearRegression()
-        X = self.student_data[['baseline_anxiety']]
-        y = self.student_data['gpa_change']
-        model.fit(X, y)
+        slope, intercept = self.statistics().regression('baseline_anxiety', 'gpa_change')
 
-        print(f"Regression Coefficient (β): {model.coef_[0]:.4f}")
-        print(f"Intercept: {model.intercept_:.2f}")
+        print(f"Regression Coefficient (β): {slope:.4f}")
+        print(f"Intercept: {intercept:.2f}")
 
         # 绘制回归图
-        plt.figure(figsize=(8, 5))
-        sns.regplot(x='baseline_anxiety', y='gpa_change', data=self.student_data)
-        plt.title('Baseline Anxiety vs GPA Change')
-        plt.xlabel('Baseline Anxiety Score')
-        plt.ylabel('GPA Change')
-        plt.show()
+        self.figures.render('long_term', _draw_long_term,
+                            self.student_data[['baseline_anxiety', 'gpa_change']], figsize=(8, 5))
 
     def run_full_analysis(self):
-        """执行完整分析流程"""
+        """执行完整分析流程，返回全部分组比较的整洁表"""
+        moments = self.statistics()
         print(f"\n{' Exam Anxiety Analysis ':=^80}")
-        print(f"Sample Size: {self.n_students} students")
-        print(f"Gender Distribution:\n{self.student_data['gender'].value_counts()}")
-        print(f"Major Distribution:\n{self.student_data['major'].value_counts()}")
+        print(f"Sample Size: {self.n_students} students"
+              + (f" (plots use {len(self.student_data)} sampled rows)" if self.dataset is not None else ""))
+        for grouping in ['gender', 'major']:
+            counts = {level: moments.describe(grouping, level, MEASURES[0])[0]
+                      for level in moments.categories[grouping]}
+            print(f"{grouping.title()} Distribution: {counts}")
 
         self.plot_anxiety_timeline()
         self.compare_majors()
@@ -187,8 +468,44 @@ class ExamAnxietySimulator:
         self.gender_differences()
         self.intervention_analysis()
         self.long_term_analysis()
+        return self.hypothesis_tests()
 
 # 实例化并运行分析
 if __name__ == "__main__":
-    simulator = ExamAnxietySimulator(n_students=150)
-    simulator.run_full_analysis()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description='考试焦虑模拟分析')
+    parser.add_argument('--headless', action='store_true',
+                        help="不弹出窗口，图像由后台进程通过Agg后端写入 --figure-dir")
+    parser.add_argument('--figure-dir', type=str, default=os.path.join('output', 'figures'),
+                        help="headless模式下的图像输出目录")
+    parser.add_argument('--students', type=int, default=150, help="模拟的学生人数")
+    parser.add_argument('--data-dir', type=str, default=None,
+                        help="把数据分块写入该目录（按列内存映射），再分块读取做统计，适合数百万名学生")
+    parser.add_argument('--chunk-size', type=int, default=100_000, help="分块生成与读取的行数")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--n-boot', type=int, default=1000, help="自助法置信区间的重复次数，0表示不计算")
+    parser.add_argument('--workers', type=int, default=4, help="并行累加统计量的线程数")
+    parser.add_argument('--results-csv', type=str, default=None, help="把全部分组比较结果写入该CSV文件")
+    cli_args = parser.parse_args()
+
+    render_mode = 'save' if cli_args.headless else 'show'
+    options = dict(render_mode=render_mode, figure_dir=cli_args.figure_dir, seed=cli_args.seed,
+                   n_boot=cli_args.n_boot, workers=cli_args.workers, chunk_size=cli_args.chunk_size)
+    if cli_args.data_dir:
+        # 目录中已有相同参数生成的数据时直接复用
+        meta = {}
+        if os.path.exists(os.path.join(cli_args.data_dir, 'meta.json')):
+            meta = StudentDataset(cli_args.data_dir).meta
+        if (meta.get('n_rows'), meta.get('chunk_size'), meta.get('seed')) != \
+                (cli_args.students, cli_args.chunk_size, cli_args.seed):
+            write_student_data(cli_args.data_dir, cli_args.students, cli_args.chunk_size, cli_args.seed)
+        simulator = ExamAnxietySimulator(data_path=cli_args.data_dir, **options)
+    else:
+        simulator = ExamAnxietySimulator(n_students=cli_args.students, **options)
+    results = simulator.run_full_analysis()
+    if cli_args.results_csv:
+        results.to_csv(cli_args.results_csv, index=False)
+        print(f"Results saved: {cli_args.results_csv}")
+    for path in simulator.figures.close():
+        print(f"Figure saved: {path}")
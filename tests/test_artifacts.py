@@ -0,0 +1,57 @@
+# 📁 文件：tests/test_artifacts.py
+# 产物库：相同内容按摘要只存一份，按运行/主题/验证状态查询，检查点可覆盖写入
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.artifacts import ArtifactStore, digest_of  # noqa: E402
+
+CODE = "import numpy as np\nprint(np.arange(3))\n"
+
+
+def test_identical_content_stored_once(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    try:
+        store.begin_run("r1", "传染病模型")
+        store.begin_run("r2", "传染病模型")
+        first = store.add("r1", "code", CODE, agent="Coder", version=1)
+        second = store.add("r2", "code", CODE, agent="Fixer", version=1)
+        assert first == second == digest_of(CODE.encode("utf-8"))
+        stats = store.stats()
+        assert (stats["artifacts"], stats["blobs"], stats["bytes"]) == (2, 1, len(CODE.encode("utf-8")))
+        blobs = [name for _, _, names in os.walk(os.path.join(str(tmp_path), "blobs")) for name in names]
+        assert len(blobs) == 1
+        assert store.get(first) == CODE
+    finally:
+        store.close()
+
+
+def test_latest_filters_by_theme_and_verified(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    try:
+        store.begin_run("r1", "传染病模型")
+        store.begin_run("r2", "考试焦虑")
+        verified = store.add("r1", "code", CODE, version=1)
+        store.add("r1", "code", CODE + "# v2\n", version=2)
+        store.add("r2", "code", "print('焦虑')\n", version=1)
+        store.mark_verified("r1", verified)
+        meta, text = store.latest("传染病模型")
+        assert (meta["version"], text) == (2, CODE + "# v2\n")
+        meta, text = store.latest("传染病模型", verified=True)
+        assert (meta["version"], text) == (1, CODE)
+        assert store.latest("考试焦虑", verified=True) is None
+        assert [a["version"] for a in store.artifacts("r1", kind="code")] == [1, 2]
+    finally:
+        store.close()
+
+
+def test_checkpoint_round_trip(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    try:
+        assert store.load_checkpoint("r1") is None
+        store.save_checkpoint("r1", {"round": 1})
+        store.save_checkpoint("r1", {"round": 2, "roles": ["Coder"]})
+        assert store.load_checkpoint("r1") == {"round": 2, "roles": ["Coder"]}
+    finally:
+        store.close()
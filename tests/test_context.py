@@ -0,0 +1,48 @@
+# 📁 文件：tests/test_context.py
+# 上下文裁剪：按角色丢弃或摘要历史发言，只保留最新一份完整代码（diff补丁保留），超出预算时继续压缩
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.context import ContextPruner, has_full_code, messages_tokens, strip_code  # noqa: E402
+
+TASK = {"role": "user", "name": "Student", "content": "研究SIR模型"}
+BACKGROUND = "\n".join(["# 背景"] + [f"- 要点{n}：传染病动力学的相关研究" for n in range(60)] + ["正文" * 300])
+OLD_CODE = "第一版：\n```python\nprint('v1')\n```"
+NEW_CODE = "修复版：\n```python\nprint('v2')\n```"
+PATCH = "补丁：\n```diff\n@@ -1 +1 @@\n-print('v1')\n+print('v2')\n```"
+
+
+def _message(name, content):
+    return {"role": "user", "name": name, "content": content}
+
+
+def test_strip_code_keeps_patches():
+    assert has_full_code(OLD_CODE) and not has_full_code(PATCH)
+    assert "print('v1')" not in strip_code(OLD_CODE)
+    assert strip_code(PATCH) == PATCH
+
+
+def test_role_needs_and_latest_code():
+    messages = [TASK, _message("Researcher", BACKGROUND), _message("Questioner", "问题1"),
+                _message("Coder", OLD_CODE), _message("BugFinder", "第3行有误"),
+                _message("Fixer", NEW_CODE), _message("Coder", PATCH), _message("BugFinder", "请Verifier验证")]
+    log = []
+    pruned = ContextPruner("Verifier", budget=0, log=log)(messages)
+    names = [m.get("name") for m in pruned]
+    assert "Researcher" not in names  # Verifier 不需要背景调研
+    by_content = {m["content"] for m in pruned}
+    assert NEW_CODE in by_content and PATCH in by_content
+    assert all("print('v1')\n```" not in m["content"] for m in pruned)
+    assert pruned[0] == TASK and pruned[-1] == messages[-1]
+    assert log[0]["messages_before"] == 8 and log[0]["tokens_after"] < log[0]["tokens_before"]
+
+
+def test_budget_compresses_middle_messages():
+    messages = [TASK, _message("Researcher", BACKGROUND), _message("Questioner", "请Coder编写模型代码")]
+    full = ContextPruner("Writer", budget=0).prune(messages)
+    assert full[1]["content"] == BACKGROUND
+    limited = ContextPruner("Writer", budget=200).prune(messages)
+    assert messages_tokens(limited) < messages_tokens(full)
+    assert limited[-1] == messages[-1]
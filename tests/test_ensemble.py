@@ -0,0 +1,46 @@
+# 📁 文件：tests/test_ensemble.py
+# 批量蒙特卡洛：结果由seed决定且与进程数无关，每个副本的人数守恒，最终规模与单次模拟的分布一致
+
+import os
+import sys
+
+import numpy as np
+from scipy import stats
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from test import EpidemicModels  # noqa: E402
+
+
+def test_shapes_and_conservation():
+    model = EpidemicModels(network_size=80, render_mode='off')
+    result = model.network_ensemble(replicates=40, steps=20, seed=1, batch_size=16)
+    assert result['mean'].shape == (20, 3) and np.allclose(result['mean'].sum(axis=1), 80)
+    assert result['quantiles'].shape == (3, 20, 3) and result['final_size'].shape == (40,)
+    low, median, high = result['quantiles']
+    assert np.all(low <= median) and np.all(median <= high)
+
+
+def test_seeded_and_independent_of_workers():
+    model = EpidemicModels(network_size=80, render_mode='off')
+    serial = model.network_ensemble(replicates=40, steps=20, seed=1, batch_size=10)
+    again = model.network_ensemble(replicates=40, steps=20, seed=1, batch_size=10)
+    parallel = model.network_ensemble(replicates=40, steps=20, seed=1, batch_size=10, workers=2)
+    for result in (again, parallel):
+        assert np.array_equal(result['final_size'], serial['final_size'])
+        assert np.array_equal(result['mean'], serial['mean'])
+    other = model.network_ensemble(replicates=40, steps=20, seed=2, batch_size=10)
+    assert not np.array_equal(other['final_size'], serial['final_size'])
+
+
+def test_final_size_matches_single_runs():
+    model = EpidemicModels(network_size=100, render_mode='off')
+    G = model.build_graph(seed=1)
+    adj = model.graph_to_csr(G)
+    counts = model._simulate_ensemble(adj, 30, 300, np.random.SeedSequence(7))
+    ensemble = counts[-1, :, 1] + counts[-1, :, 2]
+    rng = np.random.default_rng(7)
+    single = []
+    for _ in range(300):
+        _, infected, recovered = model._simulate_sparse(adj, 30, rng, 'counts').counts[-1]
+        single.append(infected + recovered)
+    assert stats.ks_2samp(ensemble, single).pvalue > 0.01
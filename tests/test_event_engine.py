@@ -0,0 +1,57 @@
+# 📁 文件：tests/test_event_engine.py
+# 事件驱动引擎：固定种子下逐步的S/I/R分布与离散时间引擎一致，三种记录格式给出同一条轨迹
+
+import os
+import sys
+
+import numpy as np
+from scipy import stats
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from test import EpidemicModels, NetworkTrace  # noqa: E402
+
+
+def _runs(simulate, graph, runs, seed, steps=30):
+    rng = np.random.default_rng(seed)
+    return np.array([simulate(graph, steps, rng, 'counts').counts for _ in range(runs)])
+
+
+def test_event_scale_gives_per_step_probability():
+    for p in (0.05, 0.3, 0.9):
+        # 速率 1/scale 的指数等待时间在一步内发生的概率恰为p
+        assert np.isclose(1 - np.exp(-1 / EpidemicModels._event_scale(p)), p)
+    assert EpidemicModels._event_scale(0) == np.inf and EpidemicModels._event_scale(1) == 0.0
+
+
+def test_time_to_step():
+    steps = EpidemicModels._time_to_step(np.array([0.0, 0.5, 1.0, 1.2, 10.0, 10.5, np.inf]), horizon=10.0)
+    assert steps.tolist() == [0, 0, 0, 1, 9] + [NetworkTrace.NEVER] * 2
+
+
+def test_event_matches_discrete_engines_in_distribution():
+    model = EpidemicModels(network_size=100, render_mode='off')
+    G = model.build_graph(seed=1)
+    adj = model.graph_to_csr(G)
+    python = _runs(model._simulate_python, G, 300, seed=7)
+    sparse = _runs(model._simulate_sparse, adj, 300, seed=7)
+    event = _runs(model._simulate_event, adj, 300, seed=7)
+    final = [runs[:, -1, 1] + runs[:, -1, 2] for runs in (python, sparse, event)]
+    assert stats.ks_2samp(final[2], final[0]).pvalue > 0.01
+    assert stats.ks_2samp(final[2], final[1]).pvalue > 0.01
+    for reference in (python, sparse):
+        assert np.abs(event.mean(axis=0) - reference.mean(axis=0)).max() < 5
+    # 感染人数的峰值出现在相近的步
+    peaks = [runs[:, :, 1].mean(axis=0).argmax() for runs in (python, sparse, event)]
+    assert max(peaks) - min(peaks) <= 2
+
+
+def test_record_formats_agree():
+    model = EpidemicModels(network_size=150, render_mode='off')
+    adj = model.graph_to_csr(model.build_graph(seed=2))
+    dense = model._simulate_event(adj, 25, np.random.default_rng(3), 'dense')
+    events = model._simulate_event(adj, 25, np.random.default_rng(3), 'events')
+    counts = model._simulate_event(adj, 25, np.random.default_rng(3), 'counts')
+    assert np.array_equal(events.to_dense(), dense)
+    expected = np.stack([np.count_nonzero(dense == state, axis=1) for state in range(3)], axis=1)
+    assert np.array_equal(counts.counts, expected)
+    assert np.all(counts.counts.sum(axis=1) == 150)
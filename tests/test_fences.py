@@ -0,0 +1,65 @@
+# 📁 文件：tests/test_fences.py
+# 增量围栏解析：任意切分的流式文本与一次性解析结果一致，嵌套示例与未闭合代码块按规则处理
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.fences import FenceParser, is_runnable, parse_blocks  # noqa: E402
+
+TEXT = """分析如下：
+```python
+import numpy as np
+x = np.arange(3)
+```
+运行结果：
+```
+>>> x
+array([0, 1, 2])
+```
+````markdown
+```python
+print("示例")
+```
+````
+"""
+
+
+def _summary(blocks):
+    return [(b.language, b.start_line, b.end_line, b.closed, b.code) for b in blocks]
+
+
+def test_parse_blocks_lines_and_languages():
+    blocks = parse_blocks(TEXT)
+    assert _summary(blocks) == [
+        ("python", 2, 5, True, "import numpy as np\nx = np.arange(3)"),
+        ("", 7, 10, True, ">>> x\narray([0, 1, 2])"),
+        ("markdown", 11, 15, True, '```python\nprint("示例")\n```'),
+    ]
+    assert [is_runnable(b) for b in blocks] == [True, False, False]
+
+
+def test_fence_split_across_chunks():
+    expected = _summary(parse_blocks(TEXT))
+    for size in (1, 2, 3, 5, 7, 16):
+        parser = FenceParser()
+        events = []
+        for i in range(0, len(TEXT), size):
+            events.extend(parser.feed(TEXT[i:i + size]))
+        events.extend(parser.close())
+        assert _summary(parser.blocks) == expected
+        assert [kind for kind, _, _ in events if kind != "text"] == ["open", "close"] * 3
+        first = parser.blocks[0]
+        assert "".join(text for kind, block, text in events if kind == "text" and block is first) \
+            == first.code + "\n"
+
+
+def test_unclosed_block_closed_on_close():
+    parser = FenceParser()
+    events = parser.feed("```py\nprint(1)\nprint(")
+    assert [kind for kind, _, _ in events] == ["open", "text"]
+    events = parser.close()
+    assert events[-1][0] == "close"
+    block = parser.blocks[0]
+    assert (block.closed, block.start_line, block.end_line, block.code) == (False, 1, 3, "print(1)\nprint(")
+    assert not is_runnable(block)
@@ -0,0 +1,78 @@
+# 📁 文件：tests/test_llm_cache.py
+# 响应缓存：命中与否取决于请求哈希（模型、系统提示、消息前缀与参数），过期条目与超出容量的条目被淘汰
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.llm_cache import ResponseCache, cache_key  # noqa: E402
+
+
+def _params(user="建立SIR模型", system="你是Coder", model="deepseek-coder", **extra):
+    return {"model": model, "messages": [{"role": "system", "content": system},
+                                         {"role": "user", "content": user}], **extra}
+
+
+def test_cache_key_follows_request():
+    key, model = cache_key(_params())
+    assert model == "deepseek-coder"
+    assert cache_key(_params()) == (key, model)
+    for changed in (_params(user="建立SEIR模型"), _params(system="你是Fixer"), _params(model="deepseek-chat"),
+                    _params(temperature=0.2)):
+        assert cache_key(changed)[0] != key
+
+
+def test_hit_and_miss_follow_request_hash(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    try:
+        view = cache.for_agent("Coder")
+        assert view.get(_params()) is None
+        view.set(_params(), {"choices": ["SIR"]})
+        assert view.get(_params()) == {"choices": ["SIR"]}
+        assert view.get(_params(user="建立SEIR模型"), "default") == "default"
+        # 另一个角色发出同样的请求同样命中，命中率按角色统计
+        assert cache.for_agent("Fixer").get(_params()) == {"choices": ["SIR"]}
+        assert cache.hit_rates() == {"Coder": (1, 3), "Fixer": (1, 1)}
+    finally:
+        cache.close()
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    cache.for_agent("Coder").set(_params(), "SIR")
+    cache.close()
+    cache = ResponseCache(path)
+    try:
+        assert cache.for_agent("Coder").get(_params()) == "SIR"
+    finally:
+        cache.close()
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=0.05)
+    try:
+        key, model = cache_key(_params())
+        cache.store(key, model, "Coder", "SIR")
+        assert cache.lookup(key, "Coder") == "SIR"
+        time.sleep(0.1)
+        assert cache.lookup(key, "Coder") is None
+    finally:
+        cache.close()
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=2500)
+    try:
+        for name in ("a", "b"):
+            cache.store(name, "", "Coder", "x" * 1000)
+        time.sleep(0.01)
+        assert cache.lookup("a", "Coder") is not None  # a 最近被访问过，淘汰时保留
+        time.sleep(0.01)
+        cache.store("c", "", "Coder", "x" * 1000)
+        assert cache.lookup("b", "Coder") is None
+        assert cache.lookup("a", "Coder") is not None
+        assert cache.lookup("c", "Coder") is not None
+    finally:
+        cache.close()
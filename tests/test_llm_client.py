@@ -0,0 +1,72 @@
+# 📁 文件：tests/test_llm_client.py
+# 流式客户端（对本地模拟服务器）：复用同一连接，首token前出错时退避重试、用尽后改用备用模型，主模型过慢时对冲
+
+import os
+import sys
+
+import openai
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.llm_client import DeepSeekClient, RateLimiter, RetryPolicy  # noqa: E402
+from utils.metrics import CallMetrics  # noqa: E402
+from utils.mock_server import MockLLMServer  # noqa: E402
+
+MESSAGES = [{"role": "system", "content": "你是Coder"}, {"role": "user", "content": "建立SIR模型"}]
+
+
+def _client(server, metrics, **config):
+    config = {"model": "deepseek-coder", "base_url": server.base_url, "api_key": "test", "timeout": 10, **config}
+    return DeepSeekClient(config, agent_name="Coder", metrics=metrics)
+
+
+def test_stream_reuses_one_connection():
+    metrics = CallMetrics()
+    with MockLLMServer(reply="SIR模型的代码如下。", chunk_chars=3) as server:
+        client = _client(server, metrics)
+        for _ in range(3):
+            response = client.create({"model": "deepseek-coder", "messages": MESSAGES})
+            assert client.message_retrieval(response) == ["SIR模型的代码如下。"]
+        assert server.stats["connections"] == 1
+    assert [call["status"] for call in metrics.calls] == ["ok"] * 3
+    assert all(call["ttft"] is not None and call["completion_tokens"] > 0 for call in metrics.calls)
+
+
+def test_retry_then_fallback_model():
+    metrics = CallMetrics()
+    profiles = {"deepseek-coder": {"fail_first": 10, "retry_after": 0}, "deepseek-chat": {"fail_first": 1,
+                                                                                        "retry_after": 0}}
+    with MockLLMServer(profiles=profiles) as server:
+        client = _client(server, metrics, max_retries=2, fallback_model="deepseek-chat")
+        response = client.create({"model": "deepseek-coder", "messages": MESSAGES})
+        assert response.model == "deepseek-chat"
+        assert server.stats["requests"] == {"deepseek-coder": 3, "deepseek-chat": 2}
+    assert metrics.calls[-1]["retries"] == 4 and metrics.calls[-1]["status"] == "ok"
+
+
+def test_non_retryable_error_raises_immediately():
+    metrics = CallMetrics()
+    with MockLLMServer(profiles={"*": {"fail_first": 5, "status": 400}}) as server:
+        client = _client(server, metrics, max_retries=3)
+        with pytest.raises(openai.BadRequestError):
+            client.create({"model": "deepseek-coder", "messages": MESSAGES})
+        assert server.stats["requests"] == {"deepseek-coder": 1}
+    assert metrics.calls[-1]["status"] == "BadRequestError"
+
+
+def test_slow_primary_is_hedged():
+    metrics = CallMetrics()
+    profiles = {"deepseek-coder": {"ttft": 3}, "deepseek-chat": {"ttft": 0}}
+    with MockLLMServer(profiles=profiles) as server:
+        client = _client(server, metrics, fallback_model="deepseek-chat", hedge_after=0.2)
+        response = client.create({"model": "deepseek-coder", "messages": MESSAGES})
+        assert response.model == "deepseek-chat"
+    assert metrics.calls[-1]["hedged"] and metrics.calls[-1]["latency"] < 2
+
+
+def test_retry_policy_and_rate_limiter():
+    policy = RetryPolicy(base=0.5, cap=4.0)
+    assert all(0 <= policy.delay(n) <= min(4.0, 0.5 * 2 ** n) for n in range(8) for _ in range(20))
+    limiter = RateLimiter(per_minute=600, burst=2)
+    assert limiter.acquire() == 0 and limiter.acquire() == 0
+    assert 0.05 <= limiter.acquire() <= 0.2  # 令牌用尽后按每秒10个的速率补充
@@ -0,0 +1,61 @@
+# 📁 文件：tests/test_logger.py
+# 队列式JSON-lines日志：多线程写入的记录完整保留，超过大小后滚动，关闭后的记录计入 dropped
+
+import os
+import sys
+import json
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.logger import AsyncJsonLogger  # noqa: E402
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_concurrent_records_all_written(tmp_path):
+    path = str(tmp_path / "turns.jsonl")
+    logger = AsyncJsonLogger(path, max_bytes=0, batch_size=16)
+
+    def work(agent):
+        for n in range(200):
+            logger.log(agent=agent, round=n, content="模型")
+
+    threads = [threading.Thread(target=work, args=(f"A{k}",)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    logger.flush()
+    records = _read(path)
+    assert len(records) == 800
+    for k in range(4):
+        assert [r["round"] for r in records if r["agent"] == f"A{k}"] == list(range(200))
+    assert all(r["pid"] == os.getpid() and "ts" in r for r in records)
+    logger.close()
+
+
+def test_rotation_keeps_backups(tmp_path):
+    path = str(tmp_path / "turns.jsonl")
+    logger = AsyncJsonLogger(path, max_bytes=2000, backups=2, batch_size=1)
+    for n in range(100):
+        logger.log(round=n, content="x" * 50)
+    logger.close()
+    assert not os.path.exists(path + ".3")
+    for name in (path, path + ".1", path + ".2"):
+        assert os.path.getsize(name) <= 2000
+    # 最新的记录在当前文件末尾，滚动出的文件按编号依次更旧
+    assert _read(path)[-1]["round"] == 99
+    assert _read(path + ".2")[-1]["round"] < _read(path + ".1")[0]["round"]
+
+
+def test_log_after_close_is_dropped(tmp_path):
+    path = str(tmp_path / "turns.jsonl")
+    logger = AsyncJsonLogger(path)
+    logger.log(round=1)
+    logger.close()
+    logger.log(round=2)
+    assert logger.dropped == 1
+    assert [r["round"] for r in _read(path)] == [1]
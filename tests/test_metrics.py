@@ -0,0 +1,38 @@
+# 📁 文件：tests/test_metrics.py
+# 调用级指标：费用按模型价格估算，按Agent/轮次汇总，写出的JSON与CSV与记录一致
+
+import os
+import sys
+import csv
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metrics import CallMetrics, estimate_cost  # noqa: E402
+
+
+def test_estimate_cost():
+    assert estimate_cost("deepseek-chat", 1_000_000, 1_000_000) == 0.27 + 1.10
+    assert estimate_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_summaries_and_files(tmp_path):
+    rounds = {"Coder": 1, "Fixer": 2}
+    metrics = CallMetrics(round_of=rounds.get)
+    metrics.record("Coder", "deepseek-coder", 1000, 500, ttft=0.2, latency=1.5)
+    metrics.record("Coder", "deepseek-coder", 2000, 100, latency=0.5, retries=2, hedged=True)
+    metrics.record("Fixer", "deepseek-chat", 300, 300, ttft=0.1, latency=1.0, status="error")
+    by_agent = metrics.summarize("agent")
+    assert by_agent["Coder"]["calls"] == 2 and by_agent["Coder"]["prompt_tokens"] == 3000
+    assert (by_agent["Coder"]["retries"], by_agent["Coder"]["hedged"], by_agent["Coder"]["ttft"]) == (2, 1, 0.2)
+    assert set(metrics.summarize("round")) == {1, 2}
+
+    report = metrics.write(str(tmp_path / "m.json"), str(tmp_path / "m.csv"), extra={"run_id": "r1"})
+    assert report["totals"]["calls"] == 3 and report["totals"]["latency"] == 3.0
+    assert report["totals"]["cost"] == round(sum(c["cost"] for c in metrics.calls), 6)
+    with open(tmp_path / "m.json", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["run_id"] == "r1" and set(saved["by_round"]) == {"1", "2"}
+    with open(tmp_path / "m.csv", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["agent"] for row in rows] == ["Coder", "Coder", "Fixer"]
+    assert rows[2]["status"] == "error"
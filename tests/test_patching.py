@@ -0,0 +1,61 @@
+# 📁 文件：tests/test_patching.py
+# 统一diff补丁：make_patch 生成的增量能还原新版本，上下文不符或结果无法编译时抛出 PatchError
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.patching import PatchError, apply_patch, make_patch, parse_hunks  # noqa: E402
+
+BASE = """import numpy as np
+
+
+def simulate(beta, gamma, steps=100):
+    s, i, r = 0.99, 0.01, 0.0
+    for _ in range(steps):
+        new_inf = beta * s * i
+        new_rec = gamma * i
+        s, i, r = s - new_inf, i + new_inf - new_rec, r + new_rec
+    return s, i, r
+
+
+if __name__ == '__main__':
+    print(simulate(0.3, 0.1))
+"""
+
+
+def test_make_patch_round_trip():
+    new = BASE.replace("steps=100", "steps=200").replace("print(simulate(0.3, 0.1))",
+                                                         "print(simulate(0.3, 0.1, steps=50))")
+    new += "\n\ndef r0(beta, gamma):\n    return beta / gamma\n"
+    patch = make_patch(BASE, new)
+    assert len(parse_hunks(patch)) >= 2
+    assert apply_patch(BASE, patch) == new.rstrip("\n")
+
+
+def test_hunk_header_line_numbers_are_only_a_hint():
+    # LLM给出的 @@ 行号偏差较大时仍按上下文定位
+    patch = "@@ -40,3 +40,3 @@\n         new_inf = beta * s * i\n-        new_rec = gamma * i\n+        new_rec = 2 * gamma * i\n"
+    assert "new_rec = 2 * gamma * i" in apply_patch(BASE, patch)
+
+
+def test_mismatched_context_raises():
+    patch = "@@ -5,2 +5,2 @@\n-    s, i, r = 0.5, 0.5, 0.0\n+    s, i, r = 0.9, 0.1, 0.0\n"
+    with pytest.raises(PatchError, match="不匹配"):
+        apply_patch(BASE, patch)
+
+
+def test_patch_breaking_syntax_raises():
+    patch = make_patch(BASE, BASE.replace("return s, i, r", "return s, i, r)"))
+    with pytest.raises(PatchError, match="无法编译"):
+        apply_patch(BASE, patch)
+    assert "return s, i, r)" in apply_patch(BASE, patch, check_syntax=False)
+
+
+def test_empty_or_malformed_patch_raises():
+    with pytest.raises(PatchError):
+        apply_patch(BASE, "")
+    with pytest.raises(PatchError):
+        apply_patch(BASE, "这里不是补丁\n")
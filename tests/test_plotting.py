@@ -0,0 +1,51 @@
+# 📁 文件：tests/test_plotting.py
+# 绘图出口：save模式在后台进程中写出图片，off模式不作图；同一张图的布局只计算一次
+
+import os
+import sys
+import pickle
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from test import EpidemicModels, _draw_results  # noqa: E402
+from utils.plotting import FigureSink  # noqa: E402
+
+
+def test_save_mode_writes_numbered_files(tmp_path):
+    sink = FigureSink('save', str(tmp_path), workers=1)
+    t = np.linspace(0, 10, 11)
+    solutions = np.tile([[990.0, 10.0, 0.0]], (11, 1))
+    sink.render('sir_results', _draw_results, t, solutions, 'SIR')
+    sink.render('sir_results', _draw_results, t, solutions, 'SIR')
+    paths = sink.close()
+    assert [os.path.basename(p) for p in paths] == ['01_sir_results.png', '02_sir_results.png']
+    assert all(os.path.getsize(p) > 0 for p in paths)
+
+
+def test_off_mode_and_invalid_mode(tmp_path):
+    sink = FigureSink('off', str(tmp_path / 'figures'))
+    assert sink.render('sir_results', _draw_results) is None
+    assert sink.close() == [] and not os.path.exists(tmp_path / 'figures')
+    with pytest.raises(ValueError):
+        FigureSink('print')
+
+
+def test_layout_cached_per_graph():
+    model = EpidemicModels(network_size=40, render_mode='off')
+    G = model.build_graph(seed=1)
+    pos = model.graph_layout(G)
+    assert model.graph_layout(G) is pos
+    assert model.graph_layout(model.build_graph(seed=1)) is not pos  # 另一张图单独缓存
+    G.add_edge(0, 20)
+    G.add_edge(1, 21)
+    assert model.graph_layout(G) is not pos  # 边数变化后重新计算
+
+
+def test_pickled_model_drops_layouts(tmp_path):
+    model = EpidemicModels(network_size=40, render_mode='save', figure_dir=str(tmp_path))
+    G = model.build_graph(seed=1)
+    model.graph_layout(G)
+    copy = pickle.loads(pickle.dumps(model))
+    assert len(copy._layouts) == 0 and copy.figures.mode == 'save'
@@ -0,0 +1,64 @@
+# 📁 文件：tests/test_sandbox.py
+# 沙箱执行：区分成功、异常、超时与超出CPU时间，保存输出与图片，执行反馈附加到消息末尾
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.sandbox import ExecutionFeedback, ExecutionSandbox, format_feedback  # noqa: E402
+
+
+@pytest.fixture
+def sandbox(tmp_path):
+    box = ExecutionSandbox(root=str(tmp_path), workers=2, timeout=10, cpu_seconds=2, memory_mb=1024)
+    yield box
+    box.close()
+
+
+def test_ok_run_saves_output_and_figures(sandbox, tmp_path):
+    code = ("import matplotlib.pyplot as plt\n"
+            "plt.plot([0, 1], [1, 0])\n"
+            "print('R0 = 3.0')\n")
+    result = sandbox.run(1, "Coder", code)
+    assert result["status"] == "ok" and result["exception"] is None
+    assert "R0 = 3.0" in result["stdout"]
+    assert [os.path.basename(p) for p in result["figures"]] == ["figure_1.png"]
+    assert os.path.exists(os.path.join(str(tmp_path), "ver_1", "result.json"))
+
+
+def test_exception_traceback_points_at_model_code(sandbox):
+    result = sandbox.run(2, "Fixer", "x = 1\ny = x / 0\n")
+    assert result["status"] == "error"
+    assert result["exception"].startswith("ZeroDivisionError")
+    assert "model.py" in result["traceback"] and "runpy" not in result["traceback"]
+    text = format_feedback(result)
+    assert "版本2（Fixer）：error" in text and "ZeroDivisionError" in text
+
+
+def test_timeout_and_cpu_limit(tmp_path):
+    box = ExecutionSandbox(root=str(tmp_path), workers=2, timeout=1, cpu_seconds=None)
+    try:
+        assert box.run(1, "Coder", "import time\ntime.sleep(30)\n")["status"] == "timeout"
+    finally:
+        box.close()
+    if sys.platform == "win32":
+        return
+    box = ExecutionSandbox(root=str(tmp_path), workers=1, timeout=20, cpu_seconds=1)
+    try:
+        assert box.run(2, "Coder", "while True:\n    pass\n")["status"] == "cpu_limit"
+    finally:
+        box.close()
+
+
+def test_feedback_uses_latest_version(sandbox):
+    feedback = ExecutionFeedback(sandbox)
+    messages = [{"role": "user", "content": "请BugFinder检查"}]
+    assert feedback(messages) == messages
+    sandbox.submit(1, "Coder", "raise ValueError('旧版本')\n")
+    sandbox.submit(2, "Fixer", "print('ok')\n")
+    assert [r["status"] for r in sandbox.wait()] == ["error", "ok"]
+    extended = feedback(messages)
+    assert extended[:-1] == messages
+    assert extended[-1]["name"] == "Executor" and "版本2（Fixer）：ok" in extended[-1]["content"]
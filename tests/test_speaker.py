@@ -0,0 +1,66 @@
+# 📁 文件：tests/test_speaker.py
+# 规则式发言人选择：按交接语句转移，验证未通过时 Verifier → Fixer，回退次数达到 max_fix_loops 后交给Writer
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.speaker import HandoffSelector, find_handoff  # noqa: E402
+
+
+class _Chat:
+    """只提供 HandoffSelector 用到的 messages 与 agent_by_name"""
+
+    def __init__(self, *contents):
+        self.messages = [{"content": content} for content in contents]
+
+    def agent_by_name(self, name):
+        return SimpleNamespace(name=name)
+
+
+def test_handoff_phrase_and_default_order():
+    assert find_handoff("代码已完成。请BugFinder检查，若无问题请Verifier验证") == "Verifier"
+    assert find_handoff("没有交接语句") is None
+    selector = HandoffSelector()
+    assert selector.next_role("Coder", "代码如下……请BugFinder检查") == ("BugFinder", "交接语句")
+    assert selector.next_role("Coder", "代码如下") == ("BugFinder", "默认顺序")
+    # 指向自己的交接语句按默认顺序处理
+    assert selector.next_role("Fixer", "请Fixer修复") == ("Verifier", "默认顺序")
+
+
+def test_verifier_routes_to_fixer_until_max_fix_loops():
+    selector = HandoffSelector(max_fix_loops=2)
+    for loop in (1, 2):
+        target, reason = selector.next_role("Verifier", "结果不对，请Fixer修复")
+        assert target == "Fixer" and f"第{loop}次回退" in reason
+    assert selector.next_role("Verifier", "仍然不对，请Fixer修复")[0] == "Writer"
+    assert selector.exhausted and selector.fix_loops == 2
+
+
+def test_failed_code_check_overrides_verifier_approval():
+    results = iter([(False, "执行失败：ZeroDivisionError"), (True, "执行成功")])
+    selector = HandoffSelector(code_check=lambda: next(results), max_fix_loops=2)
+    target, reason = selector.next_role("Verifier", "验证通过，请Writer撰写论文")
+    assert target == "Fixer" and "ZeroDivisionError" in reason
+    assert selector.next_role("Verifier", "验证通过，请Writer撰写论文") == ("Writer", "交接语句")
+    assert not selector.exhausted
+
+
+def test_call_records_transitions_and_stops_on_terminate():
+    saved = []
+    selector = HandoffSelector(before_select=lambda: saved.append(True))
+    speaker = selector(SimpleNamespace(name="Coder"), _Chat("代码如下……请BugFinder检查"))
+    assert speaker.name == "BugFinder"
+    assert selector.transitions == [("Coder", "BugFinder", "交接语句")]
+    assert selector(SimpleNamespace(name="Writer"), _Chat("论文完成。TERMINATE")) is None
+    assert saved == [True, True]
+
+
+def test_state_round_trip():
+    selector = HandoffSelector(max_fix_loops=1)
+    selector(SimpleNamespace(name="Verifier"), _Chat("请Fixer修复"))
+    restored = HandoffSelector(max_fix_loops=1)
+    restored.restore(selector.state())
+    assert (restored.fix_loops, restored.transitions) == (1, selector.transitions)
+    assert restored.next_role("Verifier", "请Fixer修复")[0] == "Writer"
@@ -0,0 +1,49 @@
+# 📁 文件：tests/test_streaming_moments.py
+# 自助法权重的随机流与生成数据的随机流相互独立
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from test2 import StreamingMoments, generate_chunks, _boot_rng, _chunk_rng  # noqa: E402
+
+
+def _single_cell_chunk(n):
+    """只有一个分组单元、数值列全为1的块：自助法累加的 Σ1 即每次重复的权重之和"""
+    return pd.DataFrame({'group': pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), ['all']),
+                         'x': np.ones(n)})
+
+
+def test_boot_stream_differs_from_data_stream():
+    for seed in (0, 42):
+        for index in range(4):
+            assert not np.array_equal(_boot_rng(seed, index).bit_generator.random_raw(16),
+                                      _chunk_rng(seed, index).bit_generator.random_raw(16))
+
+
+def test_bootstrap_weights_use_boot_stream():
+    n, n_boot, seed = 200, 50, 42
+    moments = StreamingMoments({'group': ['all']}, ['x'], n_boot=n_boot, seed=seed)
+    moments.update(_single_cell_chunk(n), index=3)
+    totals = moments.boot_cells[:, 0, 0]
+    assert np.array_equal(totals, _boot_rng(seed, 3).poisson(1.0, (n_boot, n)).sum(axis=1))
+    assert not np.array_equal(totals, _chunk_rng(seed, 3).poisson(1.0, (n_boot, n)).sum(axis=1))
+
+
+def test_bootstrap_ci_not_tied_to_data_seed():
+    # 数据与自助法使用同一个seed时，置信区间与换用其他自助法seed时同样围绕样本均值分布
+    chunk = next(generate_chunks(2000, chunk_size=2000, seed=42))
+    categories = {'gender': list(chunk['gender'].cat.categories)}
+    mean = chunk['baseline_anxiety'].to_numpy(np.float64).mean()
+    boot_means = {}
+    for seed in (42, 7):
+        moments = StreamingMoments(categories, ['baseline_anxiety'], n_boot=400, seed=seed)
+        moments.update(chunk, index=0)
+        boot = moments.boot_cells.sum(axis=1)
+        boot_means[seed] = boot[:, 1] / boot[:, 0]
+        low, high = np.quantile(boot_means[seed], [0.025, 0.975])
+        assert low < mean < high
+    assert not np.array_equal(boot_means[42], boot_means[7])
@@ -0,0 +1,46 @@
+# 📁 文件：tests/test_student_data.py
+# 分块生成学生数据：结果只取决于seed与chunk_size，写到磁盘后按列读取与生成的数据一致
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from test2 import (COLUMN_ORDER, CATEGORIES, StudentDataset, _chunk_rng, _generate_chunk,  # noqa: E402
+                   generate_chunks, write_student_data)
+
+
+def test_chunks_are_seeded_and_contiguous():
+    first = pd.concat(generate_chunks(2500, chunk_size=1000, seed=3), ignore_index=True)
+    again = pd.concat(generate_chunks(2500, chunk_size=1000, seed=3), ignore_index=True)
+    pd.testing.assert_frame_equal(first, again)
+    assert list(first.columns) == COLUMN_ORDER
+    assert np.array_equal(first['student_id'], np.arange(1, 2501))
+    assert first['baseline_anxiety'].dtype == np.float32
+    other = pd.concat(generate_chunks(2500, chunk_size=1000, seed=4), ignore_index=True)
+    assert not first['baseline_anxiety'].equals(other['baseline_anxiety'])
+
+
+def test_single_chunk_can_be_regenerated():
+    # 第k块只取决于 (seed, k)，与前面的块是否生成无关
+    chunks = list(generate_chunks(3000, chunk_size=1000, seed=3))
+    pd.testing.assert_frame_equal(_generate_chunk(_chunk_rng(3, 2), 2000, 1000), chunks[2])
+    assert not np.array_equal(chunks[1]['during'], chunks[2]['during'])
+
+
+def test_dataset_round_trip(tmp_path):
+    path = str(tmp_path / 'students')
+    dataset = write_student_data(path, 2500, chunk_size=1000, seed=3)
+    expected = pd.concat(generate_chunks(2500, chunk_size=1000, seed=3), ignore_index=True)
+    assert len(StudentDataset(path)) == len(dataset) == 2500
+    read = pd.concat(dataset.iter_chunks(chunk_size=700), ignore_index=True)
+    for column in COLUMN_ORDER:
+        if column in CATEGORIES:
+            assert list(read[column].astype(str)) == list(expected[column].astype(str))
+        else:
+            assert np.array_equal(read[column].to_numpy(), expected[column].to_numpy())
+    sample = dataset.sample(100, columns=['student_id', 'gender'], seed=1)
+    assert len(sample) == 100 and sample['student_id'].is_monotonic_increasing
+    assert set(sample['gender'].cat.categories) == set(CATEGORIES['gender'][0])
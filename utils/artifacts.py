@@ -0,0 +1,216 @@
+# 📁 文件：utils/artifacts.py
+# 内容寻址的产物库：代码版本、论文、报告按SHA-256去重压缩存放，SQLite索引按运行/主题/Agent/时间查询；每次运行的检查点也存放在这里
+
+import os
+import json
+import zlib
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+DEFAULT_ARTIFACT_ROOT = ".artifacts"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY, size INTEGER, stored_size INTEGER, created REAL);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY, theme TEXT, label TEXT, output_dir TEXT,
+    started REAL, finished REAL, status TEXT);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT, theme TEXT, agent TEXT, kind TEXT,
+    version INTEGER, name TEXT, digest TEXT, verified INTEGER DEFAULT 0, created REAL);
+CREATE INDEX IF NOT EXISTS idx_artifacts_theme ON artifacts (theme, kind, verified, created);
+CREATE INDEX IF NOT EXISTS idx_artifacts_run ON artifacts (run_id, kind, version);
+CREATE INDEX IF NOT EXISTS idx_artifacts_digest ON artifacts (digest);
+"""
+
+
+def digest_of(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ArtifactStore:
+    """root/blobs/<前两位>/<摘要> 保存zlib压缩的内容，root/index.sqlite 保存索引
+
+    相同内容只存一份；同一进程内的多个任务可以共用一个实例，多个进程可以共用同一个目录。
+    """
+
+    def __init__(self, root=DEFAULT_ARTIFACT_ROOT):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest[2:])
+
+    # ---- 内容 ----
+    def put(self, text):
+        """保存内容并返回摘要；已存在的内容不重复写入"""
+        data = text.encode("utf-8")
+        digest = digest_of(data)
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            packed = zlib.compress(data, 6)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(packed)
+            os.replace(tmp, path)  # 原子替换：并发写入同一内容时结果相同
+            with self._lock:
+                self._conn.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)",
+                                   (digest, len(data), len(packed), time.time()))
+                self._conn.commit()
+        return digest
+
+    def get(self, digest):
+        with open(self._blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    # ---- 索引 ----
+    def begin_run(self, run_id, theme, label=None, output_dir=None):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, NULL, 'running')",
+                               (run_id, theme, label, output_dir, time.time()))
+            self._conn.commit()
+
+    def reopen_run(self, run_id):
+        """从检查点续跑时把运行重新标记为进行中"""
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished = NULL, status = 'running' WHERE run_id = ?", (run_id,))
+            self._conn.commit()
+
+    def finish_run(self, run_id, status="done"):
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished = ?, status = ? WHERE run_id = ?",
+                               (time.time(), status, run_id))
+            self._conn.commit()
+
+    def add(self, run_id, kind, text, agent=None, version=None, name=None, verified=False):
+        """保存内容并登记一条产物记录，返回摘要；主题取自该运行的 begin_run"""
+        digest = self.put(text)
+        with self._lock:
+            row = self._conn.execute("SELECT theme FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            self._conn.execute(
+                "INSERT INTO artifacts (run_id, theme, agent, kind, version, name, digest, verified, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, row[0] if row else None, agent, kind, version, name, digest, int(verified), time.time()))
+            self._conn.commit()
+        return digest
+
+    def mark_verified(self, run_id, digest):
+        """把某次运行中内容为 digest 的代码版本标记为已验证"""
+        with self._lock:
+            self._conn.execute("UPDATE artifacts SET verified = 1 WHERE run_id = ? AND digest = ? AND kind = 'code'",
+                               (run_id, digest))
+            self._conn.commit()
+
+    def latest(self, theme=None, kind="code", verified=False, run_id=None):
+        """最新的一条产物 (元信息字典, 内容)，没有则返回None；例如 latest(theme, verified=True)"""
+        query, params = "SELECT * FROM artifacts WHERE kind = ?", [kind]
+        for column, value in (("theme", theme), ("run_id", run_id)):
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        if verified:
+            query += " AND verified = 1"
+        with self._lock:
+            cursor = self._conn.execute(query + " ORDER BY created DESC, id DESC LIMIT 1", params)
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        if row is None:
+            return None
+        meta = dict(zip(columns, row))
+        return meta, self.get(meta["digest"])
+
+    def artifacts(self, run_id, kind=None):
+        query, params = "SELECT * FROM artifacts WHERE run_id = ?", [run_id]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            cursor = self._conn.execute(query + " ORDER BY id", params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def runs(self, theme=None, limit=20):
+        query, params = "SELECT * FROM runs", []
+        if theme is not None:
+            query += " WHERE theme = ?"
+            params.append(theme)
+        with self._lock:
+            cursor = self._conn.execute(query + " ORDER BY started DESC LIMIT ?", params + [limit])
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def run(self, run_id):
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,))
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        return None if row is None else dict(zip(columns, row))
+
+    # ---- 检查点 ----
+    def _checkpoint_path(self, run_id):
+        return os.path.join(self.root, "checkpoints", f"{run_id}.json")
+
+    def save_checkpoint(self, run_id, state):
+        """覆盖写入一次运行的检查点；先写临时文件再原子替换，写到一半中断时保留上一份"""
+        path = self._checkpoint_path(run_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+
+    def load_checkpoint(self, run_id):
+        path = self._checkpoint_path(run_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def stats(self):
+        """产物记录数、不同内容数、原始与压缩后字节数"""
+        with self._lock:
+            records = self._conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+            blobs, size, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+        return {"artifacts": records, "blobs": blobs, "bytes": size, "stored_bytes": stored}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# 命令行查询：python -m utils.artifacts latest "主题" --verified
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='查询产物库')
+    parser.add_argument('command', choices=['latest', 'runs', 'stats'])
+    parser.add_argument('theme', nargs='?', default=None)
+    parser.add_argument('--kind', default=None,
+                        help="code / delta / final_code / summary / report / metrics，默认code，--verified 时默认final_code")
+    parser.add_argument('--verified', action='store_true', help="只查已验证的代码")
+    parser.add_argument('--root', default=DEFAULT_ARTIFACT_ROOT)
+    cli = parser.parse_args()
+    store = ArtifactStore(cli.root)
+    if cli.command == 'latest':
+        kind = cli.kind or ('final_code' if cli.verified else 'code')  # 补丁模式下中间版本以差异保存，完整的已验证代码见 final_code
+        found = store.latest(cli.theme, kind=kind, verified=cli.verified)
+        if found is None:
+            raise SystemExit("没有符合条件的产物")
+        meta, text = found
+        print(f"# run={meta['run_id']} agent={meta['agent']} version={meta['version']} digest={meta['digest'][:12]}")
+        print(text)
+    elif cli.command == 'runs':
+        for run in store.runs(cli.theme):
+            resumable = run['status'] != 'done' and os.path.exists(store._checkpoint_path(run['run_id']))
+            print(f"{run['run_id']}  {run['status']:<11} {run['theme']}" + ("  (可续跑: --resume)" if resumable else ""))
+    else:
+        print(store.stats())
+    store.close()
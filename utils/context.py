@@ -0,0 +1,133 @@
+# 📁 文件：utils/context.py
+# 上下文裁剪：按角色只保留所需的历史消息，旧代码版本折叠，背景类长文本换成摘要，并控制总token预算
+
+import re
+import threading
+
+from utils.patching import DIFF_LANGUAGES
+
+CODE_AGENTS = ["Coder", "Fixer", "Verifier"]
+CODE_BLOCK = re.compile(r"```([^\n]*)\n.*?(?:```|$)", re.DOTALL)
+
+# 各角色对历史发言者的需求：full-原文，summary-摘要，code-保留文字与diff补丁但只有最新一份完整代码保留代码块，未列出的发言者丢弃。
+# 任务提示（第一条消息）与当前待回复的最后一条消息始终保留原文。
+ROLE_NEEDS = {
+    "Researcher": {},
+    "Questioner": {"Researcher": "full"},
+    "Coder": {"Researcher": "summary", "Questioner": "full"},
+    "BugFinder": {"Questioner": "summary", "Coder": "code"},
+    "Fixer": {"Questioner": "summary", "Coder": "code", "BugFinder": "full"},
+    "Verifier": {"Questioner": "summary", "BugFinder": "summary", "Coder": "code", "Fixer": "code"},
+    "Writer": {"Researcher": "full", "Questioner": "full", "Coder": "code", "BugFinder": "summary",
+               "Fixer": "code", "Verifier": "code"},
+}
+
+
+def estimate_tokens(text):
+    """粗略估算token数：中日韩字符约0.6个token，其余约4个字符1个token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if "\u3000" <= ch <= "\u9fff" or "\uff00" <= ch <= "\uffef")
+    return int(cjk * 0.6 + (len(text) - cjk) / 4) + 1
+
+
+def messages_tokens(messages):
+    return sum(estimate_tokens(m.get("content") or "") + 4 for m in messages)
+
+
+def summarize(text, max_chars=600):
+    """抽取式摘要：优先保留标题、列表与编号条目，去掉代码块，截断到max_chars"""
+    text = CODE_BLOCK.sub("", text or "")
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    key_lines = [line for line in lines if re.match(r"^(#+|[-*•]|\d+[.、)]|[（(]?\d+[)）])", line)]
+    summary = "\n".join(key_lines or lines)
+    if len(summary) > max_chars:
+        summary = summary[:max_chars].rstrip() + "……"
+    return summary
+
+
+def is_patch(match):
+    return match.group(1).strip().lower() in DIFF_LANGUAGES
+
+
+def has_full_code(text):
+    return any(not is_patch(m) for m in CODE_BLOCK.finditer(text or ""))
+
+
+def strip_code(text, note="[代码已省略，见最新版本]"):
+    """省略完整代码块；diff补丁体积小且是重建最新代码所必需的，予以保留"""
+    return CODE_BLOCK.sub(lambda m: m.group(0) if is_patch(m) else note, text or "")
+
+
+class ContextPruner:
+    """注册为 process_all_messages_before_reply 钩子，为某个角色裁剪发给LLM的历史消息
+
+    budget: 估算token上限；按角色裁剪后仍超出时，从最旧的可压缩消息开始依次摘要、再截断。
+    log: 共享列表，记录每次裁剪前后的估算token数，供运行报告使用。
+    """
+
+    def __init__(self, role, budget=8000, log=None, round_of=None):
+        self.role = role
+        self.budget = budget
+        self.needs = ROLE_NEEDS.get(role, {})
+        self.log = log if log is not None else []
+        self.round_of = round_of
+        self._lock = threading.Lock()
+
+    def __call__(self, messages):
+        if not messages:
+            return messages
+        before = messages_tokens(messages)
+        pruned = self.prune(messages)
+        entry = {"agent": self.role, "round": self.round_of(self.role) if self.round_of else None,
+                 "messages_before": len(messages), "messages_after": len(pruned),
+                 "tokens_before": before, "tokens_after": messages_tokens(pruned)}
+        with self._lock:
+            self.log.append(entry)
+        return pruned
+
+    def prune(self, messages):
+        first, last = messages[0], messages[-1]
+        middle = messages[1:-1] if len(messages) > 1 else []
+
+        # 最新一份完整代码出现在哪条消息里（当前待回复的消息之外）
+        latest_code = None
+        for i in range(len(middle) - 1, -1, -1):
+            if middle[i].get("name") in CODE_AGENTS and has_full_code(middle[i].get("content")):
+                latest_code = i
+                break
+        if last.get("name") in CODE_AGENTS and has_full_code(last.get("content")):
+            latest_code = None  # 最后一条已包含最新代码
+
+        kept = []
+        for i, message in enumerate(middle):
+            name = message.get("name")
+            if message.get("role") == "assistant" or name == self.role:
+                name, mode = self.role, "summary"  # 本角色自己的旧发言只保留摘要
+            else:
+                mode = self.needs.get(name)
+            content = message.get("content") or ""
+            if mode is None:
+                continue
+            if mode == "code":
+                content = content if i == latest_code else strip_code(content)
+            elif mode == "summary":
+                summary = summarize(content)
+                if len(summary) < len(content):
+                    content = f"【{name}摘要】\n{summary}"
+            kept.append({**message, "content": content, "_compressible": i != latest_code})
+
+        pruned = [first] + kept + ([last] if len(messages) > 1 else [])
+        self._fit_budget(pruned)
+        return [{k: v for k, v in m.items() if k != "_compressible"} for m in pruned]
+
+    def _fit_budget(self, messages):
+        """超出预算时依次压缩中间消息：先摘要，仍超出再截断"""
+        if not self.budget:
+            return
+        for shrink in (lambda text: summarize(text), lambda text: summarize(text, max_chars=200)):
+            for message in messages[1:-1]:
+                if messages_tokens(messages) <= self.budget:
+                    return
+                if message.get("_compressible"):
+                    message["content"] = shrink(message["content"])
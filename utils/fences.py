@@ -0,0 +1,114 @@
+# 📁 文件：utils/fences.py
+# 增量代码围栏解析：单遍扫描（可逐段喂入流式文本），标记每个代码块的语言与起止行，并判断Python代码块能否运行
+
+import re
+
+PYTHON_LANGUAGES = ("", "python", "py", "python3", "py3")
+
+# 围栏行：行首可缩进，``` 或 ~~~ 至少三个，后接可选的信息串（反引号围栏的信息串中不能再有反引号）
+FENCE_LINE = re.compile(r"^[ \t]*(`{3,}|~{3,})([^\n`]*)$", re.MULTILINE)
+
+
+class Block:
+    """一个代码块
+
+    language: 信息串的第一个词（小写），没有标注时为空字符串
+    start_line / end_line: 开、闭围栏所在行号（从1开始）；未闭合时 end_line 为最后一行，closed 为False
+    """
+
+    def __init__(self, language, fence, start_line):
+        self.language = language
+        self.fence = fence
+        self.start_line = start_line
+        self.end_line = None
+        self.closed = False
+        self._parts = []
+
+    @property
+    def code(self):
+        return "".join(self._parts).rstrip("\n")
+
+    def __repr__(self):
+        return f"Block({self.language!r}, lines {self.start_line}-{self.end_line}, closed={self.closed})"
+
+
+class FenceParser:
+    """逐段喂入文本，返回事件列表 [(类型, 代码块, 文本), ...]
+
+    类型为 'open'（遇到开围栏）、'text'（块内新到的完整行）、'close'（闭围栏或 close() 时仍未闭合）。
+    只缓存最后一个不完整的行，每段文本只扫描一次；闭围栏须与开围栏字符相同、长度不短于开围栏且没有信息串，
+    因此块内的 ```python 等行、以及四个反引号包裹的三反引号示例都按块内文本处理。
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self._block = None
+        self._tail = ""
+        self._line = 1  # 下一段文本第一行的行号
+
+    def feed(self, chunk):
+        data = self._tail + chunk
+        cut = data.rfind("\n") + 1
+        self._tail = data[cut:]
+        return self._scan(data[:cut]) if cut else []
+
+    def close(self):
+        """处理剩余的不完整行；未闭合的代码块以 closed=False 结束"""
+        events = self._scan(self._tail + "\n") if self._tail else []
+        self._tail = ""
+        block = self._block
+        if block is not None:
+            block.end_line = self._line - 1
+            self._block = None
+            events.append(("close", block, None))
+        return events
+
+    def _scan(self, text):
+        events = []
+        pos = counted = 0  # counted: 已计入 self._line 的位置，行号随扫描推进，避免每次从头数换行
+        for match in FENCE_LINE.finditer(text):
+            fence, info = match.group(1), match.group(2).strip()
+            self._line += text.count("\n", counted, match.start())
+            counted = match.start()
+            block = self._block
+            if block is None:
+                line = self._line
+                words = info.split()
+                block = Block(words[0].strip("{}.").lower() if words else "", fence, line)
+                self._block = block
+                self.blocks.append(block)
+                events.append(("open", block, None))
+                pos = match.end() + 1
+            elif not info and fence[0] == block.fence[0] and len(fence) >= len(block.fence):
+                if match.start() > pos:
+                    block._parts.append(text[pos:match.start()])
+                    events.append(("text", block, text[pos:match.start()]))
+                block.end_line = self._line
+                block.closed = True
+                self._block = None
+                events.append(("close", block, None))
+                pos = match.end() + 1
+        if self._block is not None and pos < len(text):
+            self._block._parts.append(text[pos:])
+            events.append(("text", self._block, text[pos:]))
+        self._line += text.count("\n", counted)
+        return events
+
+
+def parse_blocks(text):
+    """一次性解析整段文本，返回全部代码块（包括未闭合的最后一块）"""
+    parser = FenceParser()
+    parser.feed(text)
+    parser.close()
+    return parser.blocks
+
+
+def is_runnable(block, code=None):
+    """标注为Python或未标注语言、且能通过编译的代码块；REPL记录、命令行与输出样例会被排除"""
+    if block.language not in PYTHON_LANGUAGES:
+        return False
+    try:
+        compile(block.code if code is None else code, "<block>", "exec")
+    except (SyntaxError, ValueError):
+        return False
+    return True
@@ -0,0 +1,136 @@
+# 📁 文件：utils/llm_cache.py
+# LLM响应缓存：以 模型名 + 系统提示 + 消息前缀哈希 为键的SQLite持久化缓存，支持TTL与按容量的LRU淘汰
+
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite")
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(params):
+    """由autogen的请求参数计算缓存键，返回 (键, 模型名)
+
+    系统提示与其余消息分别哈希：同一角色的不同前缀共享系统提示哈希，便于按角色统计与清理。
+    """
+    if isinstance(params, str):
+        return _digest(params), ""
+    params = dict(params)
+    model = str(params.pop("model", ""))
+    messages = list(params.pop("messages", []))
+    system = ""
+    if messages and messages[0].get("role") == "system":
+        system = str(messages.pop(0).get("content") or "")
+    prefix = json.dumps({"messages": messages, "params": params}, sort_keys=True, ensure_ascii=False, default=str)
+    return _digest(f"{model}\n{_digest(system)}\n{_digest(prefix)}"), model
+
+
+class ResponseCache:
+    """SQLite响应缓存
+
+    ttl: 条目有效期（秒），过期即视为未命中并删除；None表示永不过期
+    max_bytes: 缓存总大小上限，写入后超出时按最近访问时间淘汰最旧的条目
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, max_bytes=512 * 1024 * 1024):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {}  # 角色 -> {"hits": n, "misses": n}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, agent TEXT, response BLOB,"
+            " size INTEGER, created REAL, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    def for_agent(self, agent_name):
+        """返回绑定到某个角色的缓存视图，可直接赋给 agent.client_cache"""
+        return AgentCacheView(self, agent_name)
+
+    def lookup(self, key, agent_name):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            counter = self.stats.setdefault(agent_name, {"hits": 0, "misses": 0})
+            if row is None:
+                counter["misses"] += 1
+                return None
+            counter["hits"] += 1
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return pickle.loads(row[0])
+
+    def store(self, key, model, agent_name, response):
+        blob = pickle.dumps(response)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, agent, response, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, agent_name, blob, len(blob), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def hit_rates(self):
+        """返回 {角色: (命中数, 总请求数)}"""
+        return {name: (c["hits"], c["hits"] + c["misses"]) for name, c in self.stats.items()}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AgentCacheView:
+    """实现autogen缓存协议（get/set/close与上下文管理），按角色统计命中率"""
+
+    def __init__(self, cache, agent_name):
+        self.cache = cache
+        self.agent_name = agent_name
+
+    def get(self, key, default=None):
+        digest, _ = cache_key(key)
+        response = self.cache.lookup(digest, self.agent_name)
+        return default if response is None else response
+
+    def set(self, key, value):
+        digest, model = cache_key(key)
+        self.cache.store(digest, model, self.agent_name, value)
+
+    def close(self):
+        # 底层连接由 ResponseCache 统一管理，autogen每次请求后调用的 close 不应关闭它
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
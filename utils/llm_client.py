@@ -0,0 +1,344 @@
+# 📁 文件：utils/llm_client.py
+# 自定义模型客户端：所有Agent共用一个连接池，以流式方式调用OpenAI兼容接口，带抖动退避重试与备用模型对冲，并记录每次调用的指标
+
+import json
+import time
+import queue
+import random
+import threading
+from datetime import datetime
+
+import httpx
+import openai
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.completion_usage import CompletionUsage
+
+from utils.metrics import estimate_cost
+
+try:
+    import h2  # noqa: F401  安装了 h2 时连接池使用HTTP/2，否则为HTTP/1.1 keep-alive
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# 透传给 chat.completions.create 的参数；其余（如 model_client_cls）是autogen自身的配置项
+CHAT_PARAMS = ["model", "messages", "temperature", "top_p", "max_tokens", "stop", "seed",
+               "presence_penalty", "frequency_penalty", "response_format", "tools", "tool_choice"]
+
+# 收到首个token之前出现这些错误时重试（429与5xx分别对应 RateLimitError 与 InternalServerError）
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError,
+                    openai.InternalServerError)
+
+POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=90)
+
+# 按HTTP状态码映射到openai的异常类型，与SDK的行为保持一致
+STATUS_ERRORS = {
+    400: openai.BadRequestError, 401: openai.AuthenticationError, 403: openai.PermissionDeniedError,
+    404: openai.NotFoundError, 409: openai.ConflictError, 422: openai.UnprocessableEntityError,
+    429: openai.RateLimitError,
+}
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+def shared_client(base_url, timeout=120):
+    """按 (base_url, timeout) 复用同一个httpx连接池，所有Agent与Manager共用
+
+    没有使用openai SDK的流式接口：它读到 [DONE] 就关闭响应，分块传输的结尾未读完，连接无法放回池中复用。
+    """
+    key = (str(base_url).rstrip("/"), timeout)
+    with _shared_lock:
+        if key not in _shared_clients:
+            _shared_clients[key] = httpx.Client(limits=POOL_LIMITS, http2=HTTP2, follow_redirects=True,
+                                                timeout=httpx.Timeout(timeout, connect=10))
+        return _shared_clients[key]
+
+
+def _status_error(response):
+    try:
+        body = response.json()
+    except ValueError:
+        body = response.text
+    error = body.get("error") if isinstance(body, dict) else None
+    message = (error.get("message") if isinstance(error, dict) else None) or f"HTTP {response.status_code}"
+    status = response.status_code
+    cls = STATUS_ERRORS.get(status) or (openai.InternalServerError if status >= 500 else openai.APIStatusError)
+    return cls(message, response=response, body=body)
+
+
+def close_shared_clients():
+    with _shared_lock:
+        for client in _shared_clients.values():
+            client.close()
+        _shared_clients.clear()
+
+
+class RetryPolicy:
+    """带完全抖动的指数退避：第n次重试前等待 uniform(0, min(cap, base * 2**n)) 秒；
+    429响应带 Retry-After 时按服务端要求等待（不超过cap）"""
+
+    def __init__(self, max_retries=3, base=0.5, cap=20.0):
+        self.max_retries = max_retries
+        self.base = base
+        self.cap = cap
+
+    def delay(self, retries, error=None):
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return min(float(retry_after), self.cap)
+        except (TypeError, ValueError):
+            return random.uniform(0, min(self.cap, self.base * 2 ** retries))
+
+
+class RateLimiter:
+    """令牌桶限流：多个Agent、多个任务共用一个实例，把总请求速率限制在每分钟 per_minute 次以内"""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, min(per_minute, 5))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，不足时阻塞等待；返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class _Attempt(threading.Thread):
+    """在后台线程中发起一次流式请求，把 (attempt, 类型, 内容) 放入共享队列；cancel() 后关闭连接"""
+
+    def __init__(self, http, request, events):
+        super().__init__(daemon=True)
+        self.http = http
+        self.request = request
+        self.events = events
+        self._response = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self._response is not None:
+            try:
+                self._response.close()
+            except Exception:
+                pass
+
+    def run(self):
+        try:
+            response = self._response = self.http.send(self.request, stream=True)
+            try:
+                if response.status_code >= 400:
+                    response.read()
+                    raise _status_error(response)
+                for line in response.iter_lines():
+                    if self._cancelled.is_set():
+                        return
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        continue  # 继续读到响应结束，连接才能放回连接池
+                    payload = json.loads(data)
+                    if isinstance(payload, dict) and payload.get("error"):
+                        raise openai.APIError(str(payload["error"]), request=self.request, body=payload["error"])
+                    self.events.put((self, "chunk", ChatCompletionChunk.model_validate(payload)))
+            finally:
+                response.close()
+            self.events.put((self, "done", None))
+        except Exception as e:
+            if self._cancelled.is_set():
+                return
+            if isinstance(e, httpx.TimeoutException):
+                e = openai.APITimeoutError(request=self.request)
+            elif isinstance(e, httpx.TransportError):
+                e = openai.APIConnectionError(message=str(e) or type(e).__name__, request=self.request)
+            self.events.put((self, "error", e))
+
+
+class DeepSeekClient:
+    """符合autogen ModelClient协议的流式客户端
+
+    在 config_list 中设置 "model_client_cls": "DeepSeekClient"，创建Agent后调用
+    agent.register_model_client(DeepSeekClient, agent_name=..., on_chunk=..., metrics=...) 注册。
+    on_chunk 可选，需提供 begin(agent_name) / feed(agent_name, text) / end(agent_name) 三个方法；
+    metrics 可选，为 utils.metrics.CallMetrics，每次请求结束后记录一条。
+    rate_limiter 可选，为共享的 RateLimiter，每次发出请求（含重试）前取一个令牌。
+    始终以流式方式请求接口，以便测得首token时间；是否向终端回显由 on_chunk 决定。
+
+    config 中可选的调度参数：
+      max_retries     首token前出错的最大重试次数（抖动指数退避）
+      fallback_model  备用模型：主模型重试用尽后改用它；同时用于对冲请求
+      hedge_after     主模型超过该秒数仍未返回任何内容时，同时向备用模型发请求，取先返回者
+    """
+
+    def __init__(self, config, agent_name=None, on_chunk=None, metrics=None, rate_limiter=None, **kwargs):
+        self.config = config
+        self.agent_name = agent_name
+        self.on_chunk = on_chunk
+        self.metrics = metrics
+        self.rate_limiter = rate_limiter
+        self.retry = RetryPolicy(max_retries=config.get("max_retries", 3))
+        self.fallback_model = config.get("fallback_model")
+        self.hedge_after = config.get("hedge_after")
+        self._http = shared_client(config.get("base_url"), config.get("timeout", 120))
+        self._url = str(config.get("base_url")).rstrip("/") + "/chat/completions"
+        self._headers = {"Authorization": f"Bearer {config.get('api_key')}"}
+
+    def _attempt(self, request, events):
+        attempt = _Attempt(self._http, self._http.build_request("POST", self._url, json=request,
+                                                                headers=self._headers), events)
+        attempt.start()
+        return attempt
+
+    def create(self, params):
+        request = {key: params[key] for key in CHAT_PARAMS if key in params}
+        request["stream"] = True
+        request["stream_options"] = {"include_usage": True}
+
+        started_at = datetime.now().isoformat(timespec="seconds")
+        start = time.perf_counter()
+        retries = model_retries = 0
+        while True:
+            if self.rate_limiter is not None:
+                start += self.rate_limiter.acquire()  # 限流排队的时间不计入首token时间与耗时
+            try:
+                return self._stream(request, start, started_at, retries)
+            except RETRYABLE_ERRORS as e:
+                if not getattr(e, "partial", False):
+                    if model_retries < self.retry.max_retries:
+                        time.sleep(self.retry.delay(model_retries, e))
+                        retries, model_retries = retries + 1, model_retries + 1
+                        continue
+                    if self.fallback_model and request["model"] != self.fallback_model:
+                        # 主模型重试用尽，改用备用模型并重新计数
+                        request = dict(request, model=self.fallback_model)
+                        retries, model_retries = retries + 1, 0
+                        continue
+                self._record(request.get("model", ""), None, None, start, retries, started_at,
+                             status=type(e).__name__)
+                raise
+            except openai.APIError as e:  # 400/401等不重试的错误同样记入指标
+                self._record(request.get("model", ""), None, None, start, retries, started_at,
+                             status=type(e).__name__)
+                raise
+
+    def _stream(self, request, start, started_at, retries):
+        pieces, usage, finish_reason, ttft = [], None, "stop", None
+        response_id, model = "", request.get("model", "")
+        events = queue.Queue()
+        attempts = [self._attempt(request, events)]
+        hedge_at = None
+        if self.hedge_after and self.fallback_model and request["model"] != self.fallback_model:
+            hedge_at = time.perf_counter() + self.hedge_after
+        winner, errors = None, []
+        if self.on_chunk:
+            self.on_chunk.begin(self.agent_name)
+        try:
+            while True:
+                timeout = None
+                if winner is None and hedge_at is not None and len(attempts) == 1:
+                    timeout = max(0.0, hedge_at - time.perf_counter())
+                try:
+                    attempt, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    # 主模型迟迟没有返回内容：同时请求备用模型，之后取先返回的一路
+                    attempts.append(self._attempt(dict(request, model=self.fallback_model), events))
+                    continue
+                if winner is not None and attempt is not winner:
+                    continue
+                if kind == "error":
+                    if winner is None:
+                        errors.append(payload)
+                        if len(errors) < len(attempts):
+                            continue  # 另一路仍在进行
+                        payload = errors[0]
+                    if isinstance(payload, RETRYABLE_ERRORS):
+                        payload.partial = bool(pieces)  # 已输出部分内容时不再重试，避免重复
+                    raise payload
+                if winner is None:
+                    winner = attempt
+                    for other in attempts:
+                        if other is not winner:
+                            other.cancel()
+                if kind == "done":
+                    break
+                chunk = payload
+                response_id = response_id or chunk.id
+                model = chunk.model or model
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+                text = choice.delta.content if choice.delta else None
+                if text:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    pieces.append(text)
+                    if self.on_chunk:
+                        self.on_chunk.feed(self.agent_name, text)
+        finally:
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+            if self.on_chunk:
+                self.on_chunk.end(self.agent_name)
+
+        self._record(model, usage, ttft, start, retries, started_at, hedged=winner is not attempts[0])
+        return ChatCompletion(
+            id=response_id or f"stream-{time.time_ns()}",
+            object="chat.completion",
+            created=int(time.time()),
+            model=model,
+            choices=[Choice(index=0, finish_reason=finish_reason,
+                            message=ChatCompletionMessage(role="assistant", content="".join(pieces)))],
+            usage=usage or CompletionUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+        )
+
+    def _record(self, model, usage, ttft, start, retries, started_at, status="ok", hedged=False):
+        if self.metrics is None:
+            return
+        self.metrics.record(
+            self.agent_name, model,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            ttft=ttft, latency=time.perf_counter() - start, retries=retries,
+            status=status, started_at=started_at, hedged=hedged,
+        )
+
+    def message_retrieval(self, response):
+        return [choice.message.content for choice in response.choices]
+
+    def cost(self, response):
+        usage = response.usage
+        if usage is None:
+            return 0.0
+        return estimate_cost(response.model, usage.prompt_tokens, usage.completion_tokens)
+
+    @staticmethod
+    def get_usage(response):
+        usage = response.usage
+        return {
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "total_tokens": usage.total_tokens if usage else 0,
+            "cost": getattr(response, "cost", 0.0),
+            "model": response.model,
+        }
@@ -1,19 +1,138 @@
 # 📁 文件：utils/logger.py
-# 日志追踪工具：记录多智能体协作内容
+# 日志追踪工具：后台线程批量写入JSON-lines记录（轮次、Agent、token、耗时），按大小滚动，多线程/多进程安全
 
 import os
+import json
+import queue
+import atexit
+import threading
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，只保证进程内的线程安全
+    fcntl = None
+
 LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
+DEFAULT_LOG_PATH = os.path.join(LOG_DIR, "agent_turns.jsonl")
+
+
+class AsyncJsonLogger:
+    """队列式日志：log() 只把记录放入队列，由后台线程攒批后一次写入
+
+    max_bytes: 文件超过该大小后滚动为 path.1 … path.<backups>
+    batch_size: 每批最多写入的记录数；flush_interval: 队列空闲时最多等待的秒数
+    写入与滚动在 path.lock 上加文件锁，多个进程可以写同一个日志文件。
+    """
+
+    def __init__(self, path=DEFAULT_LOG_PATH, max_bytes=10 * 1024 * 1024, backups=5, batch_size=256,
+                 flush_interval=0.5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="logger", daemon=True)
+        self._thread.start()
+
+    def log(self, **record):
+        """记录一条日志；自动补充时间戳与进程号"""
+        if self._closed:
+            self.dropped += 1
+            return
+        record.setdefault("ts", datetime.now().isoformat(timespec="milliseconds"))
+        record.setdefault("pid", os.getpid())
+        self._queue.put(record)
+
+    def flush(self):
+        """阻塞直到已提交的记录全部写入磁盘"""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=self.flush_interval if len(batch) == 1 else 0))
+                except queue.Empty:
+                    break
+            records = [r for r in batch if r is not None]
+            try:
+                if records:
+                    self._write(records)
+            except OSError as e:
+                self.dropped += len(records)
+                print(f"⚠️ 日志写入失败（丢弃{len(records)}条）: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def _write(self, records):
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records).encode("utf-8")
+        with self._lock, open(self.path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # 其他进程可能已经滚动过文件，因此每批重新检查大小并以追加方式打开
+                if self.max_bytes and os.path.exists(self.path) \
+                        and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "ab") as f:
+                    f.write(data)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _rotate(self):
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+
+def get_logger(path=DEFAULT_LOG_PATH, **kwargs):
+    """同一路径在进程内共用一个日志线程"""
+    with _loggers_lock:
+        if path not in _loggers:
+            _loggers[path] = AsyncJsonLogger(path, **kwargs)
+        return _loggers[path]
+
+
+def close_loggers():
+    with _loggers_lock:
+        loggers = list(_loggers.values())
+        _loggers.clear()
+    for logger in loggers:
+        logger.close()
+
+
+atexit.register(close_loggers)  # 后台线程为守护线程，退出前写完队列中的记录
 
 
 def log_message(role, message, round_id):
     """按轮次记录Agent的输出信息"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    filename = os.path.join(LOG_DIR, f"round_{round_id}.log")
-    with open(filename, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] [{role}]:\n{message}\n{'-'*60}\n")
+    get_logger().log(round=round_id, agent=role, content=message)
 
 
 def log_summary_report(content, filename="summary_report.md"):
@@ -27,3 +146,4 @@ def log_summary_report(content, filename="summary_report.md"):
 if __name__ == '__main__':
     log_message("Researcher", "以下是模型的背景分析......", round_id=1)
     log_summary_report("# 项目总结报告\n这是最终输出。")
+    close_loggers()
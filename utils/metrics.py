@@ -0,0 +1,99 @@
+# 📁 文件：utils/metrics.py
+# 调用级指标：记录每次LLM请求的token数、首token时间、总耗时、重试次数与估算费用，输出JSON/CSV
+
+import csv
+import json
+import threading
+from datetime import datetime
+
+# 每百万token的美元价格 (输入, 输出)；未列出的模型按0计
+MODEL_PRICES = {
+    "deepseek-chat": (0.27, 1.10),
+    "deepseek-coder": (0.27, 1.10),
+    "deepseek-reasoner": (0.55, 2.19),
+}
+
+FIELDS = ["agent", "round", "model", "prompt_tokens", "completion_tokens", "ttft", "latency",
+          "retries", "hedged", "cost", "status", "started_at"]
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class CallMetrics:
+    """线程安全的调用记录器
+
+    round_of: 可选，round_of(agent_name) -> 当前轮次，由调用方按编排方式提供
+    """
+
+    def __init__(self, round_of=None):
+        self.round_of = round_of
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def record(self, agent, model, prompt_tokens=0, completion_tokens=0, ttft=None, latency=0.0,
+               retries=0, status="ok", started_at=None, hedged=False):
+        call = {
+            "agent": agent,
+            "round": self.round_of(agent) if self.round_of else None,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "ttft": None if ttft is None else round(ttft, 4),
+            "latency": round(latency, 4),
+            "retries": retries,
+            "hedged": hedged,
+            "cost": round(estimate_cost(model, prompt_tokens, completion_tokens), 6),
+            "status": status,
+            "started_at": started_at or datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self.calls.append(call)
+        return call
+
+    def summarize(self, key):
+        """按 key（'agent' 或 'round'）聚合调用次数、token、耗时、重试与费用"""
+        summary = {}
+        with self._lock:
+            calls = list(self.calls)
+        for call in calls:
+            group = summary.setdefault(call[key], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                   "latency": 0.0, "ttft": 0.0, "retries": 0, "hedged": 0,
+                                                   "cost": 0.0})
+            group["calls"] += 1
+            group["prompt_tokens"] += call["prompt_tokens"]
+            group["completion_tokens"] += call["completion_tokens"]
+            group["latency"] = round(group["latency"] + call["latency"], 4)
+            group["ttft"] = round(group["ttft"] + (call["ttft"] or 0.0), 4)
+            group["retries"] += call["retries"]
+            group["hedged"] += int(call.get("hedged", False))
+            group["cost"] = round(group["cost"] + call["cost"], 6)
+        return summary
+
+    def write(self, json_path, csv_path, extra=None):
+        """写出逐次调用明细与按Agent、按轮次的汇总"""
+        with self._lock:
+            calls = list(self.calls)
+        report = {
+            "calls": calls,
+            "by_agent": self.summarize("agent"),
+            "by_round": {str(k): v for k, v in self.summarize("round").items()},
+            "totals": {
+                "calls": len(calls),
+                "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+                "completion_tokens": sum(c["completion_tokens"] for c in calls),
+                "latency": round(sum(c["latency"] for c in calls), 4),
+                "cost": round(sum(c["cost"] for c in calls), 6),
+            },
+        }
+        if extra:
+            report.update(extra)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(calls)
+        return report
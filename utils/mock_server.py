@@ -0,0 +1,339 @@
+# 📁 文件：utils/mock_server.py
+# 本地OpenAI兼容模拟服务器：按模型名配置首token延迟、生成速度与故障注入；可录制真实接口的对话并离线回放，
+# 不访问真实API即可测试客户端的连接复用、重试与对冲，以及整条协作流程的性能
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from utils.llm_cache import cache_key
+
+DEFAULT_UPSTREAM = "https://api.deepseek.com/v1"
+ROLE_CHARS = 24  # 系统提示的前若干个字符用来识别角色
+
+
+def request_role(messages):
+    """请求所属的角色：系统提示的开头，没有系统提示时为空字符串"""
+    if messages and messages[0].get("role") == "system":
+        return str(messages[0].get("content") or "")[:ROLE_CHARS]
+    return ""
+
+
+def request_key(model, messages):
+    return cache_key({"model": model, "messages": messages})[0]
+
+
+class Transcript:
+    """录制的对话记录（JSONL，每行一次请求：key, role, model, content, usage, ttft, latency）
+
+    回放时先按完整请求（模型 + 全部消息）精确匹配；对不上时（消息中含有执行结果、时间等会变化的内容，
+    或并发运行多个任务）按角色依次取下一条，取完后从头循环。role 为请求系统提示的开头即可匹配，
+    手写的记录可以只给出 role 与 content。
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self._exact = {entry["key"]: entry for entry in entries if entry.get("key")}
+        self._roles = {}
+        for entry in entries:
+            self._roles.setdefault(entry.get("role", ""), []).append(entry)
+        self._cursor = dict.fromkeys(self._roles, 0)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    def match(self, model, messages):
+        """返回 (记录, 匹配方式)，匹配方式为 'exact' / 'role'，没有可用记录时为 (None, 'miss')"""
+        entry = self._exact.get(request_key(model, messages))
+        if entry is not None:
+            return entry, "exact"
+        roles = [role for role in self._roles if request_role(messages).startswith(role[:ROLE_CHARS])]
+        if not roles:
+            return None, "miss"
+        role = max(roles, key=len)
+        with self._lock:
+            index = self._cursor[role]
+            self._cursor[role] = (index + 1) % len(self._roles[role])
+        return self._roles[role][index], "role"
+
+
+class MockLLMServer:
+    """在后台线程中运行的 /v1/chat/completions 模拟接口
+
+    profiles: {模型名: 配置}，"*" 为未单独列出的模型的配置，可用配置项：
+      ttft         返回首个token前的等待秒数（回放时默认取录制值）
+      tokens_per_s 生成速度（token/秒），流式响应按此节奏逐段发送；0表示不限速（回放时默认取录制值）
+      jitter       ttft与生成时间的随机浮动比例，例如0.2表示 ±20%
+      fail_first   该模型的前n次请求直接返回错误
+      status       注入错误的HTTP状态码（默认503）
+      retry_after  错误响应附带的 Retry-After 秒数
+    reply: 回复内容，按 chunk_chars 个字符一段以SSE流式返回
+    transcript: 回放模式，为 Transcript 或其JSONL路径，按请求返回录制的回复；对不上的请求返回 reply
+    upstream / record_path: 录制模式，把请求原样转发到真实接口，响应转发回客户端，同时把每次对话追加写入 record_path
+    stats 中记录每个模型的请求数、服务端接受的TCP连接数，以及回放命中与录制条数。
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, profiles=None, reply="模拟回复。", chunk_chars=4,
+                 transcript=None, upstream=None, record_path=None):
+        self.profiles = profiles or {}
+        self.reply = reply
+        self.chunk_chars = chunk_chars
+        self.transcript = Transcript.load(transcript) if isinstance(transcript, str) else transcript
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.record_path = record_path
+        self.stats = {"connections": 0, "requests": {}, "replayed": {"exact": 0, "role": 0, "miss": 0},
+                      "recorded": 0}
+        self._lock = threading.Lock()
+        self._upstream_http = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._upstream_http is not None:
+            self._upstream_http.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _count(self, model):
+        """记录一次请求，返回该模型此前已收到的请求数"""
+        with self._lock:
+            seen = self.stats["requests"].get(model, 0)
+            self.stats["requests"][model] = seen + 1
+            return seen
+
+    def _profile(self, model):
+        return self.profiles.get(model, self.profiles.get("*", {}))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 支持keep-alive
+            disable_nagle_algorithm = True  # 流式小包立即发送，避免与延迟确认叠加出约40ms的停顿
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.stats["connections"] += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                model = body.get("model", "")
+                profile = server._profile(model)
+                if server._count(model) < profile.get("fail_first", 0):
+                    self._send_error(profile.get("status", 503), profile.get("retry_after"))
+                    return
+                if server.upstream:
+                    self._proxy(body)
+                    return
+                reply, usage, ttft, generation = server._plan(model, body.get("messages", []), profile)
+                time.sleep(ttft)
+                if body.get("stream"):
+                    self._send_stream(model, reply, usage, generation)
+                else:
+                    time.sleep(generation)
+                    self._send_json(200, server._completion(model, reply, usage))
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self._send_raw(status, data, "application/json", headers)
+
+            def _send_raw(self, status, data, content_type, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_error(self, status, retry_after=None):
+                headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+                self._send_json(status, {"error": {"message": "模拟错误", "type": "mock_error", "code": status}},
+                                headers)
+
+            def _begin_stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _end_stream(self):
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _send_stream(self, model, reply, usage, generation):
+                self._begin_stream()
+                events = list(server._chunks(model, reply, usage))
+                pieces = len(events) - 2  # 末尾为结束标记与usage
+                delay = generation / max(1, pieces - 1)  # 生成时间均摊到各内容分段之间
+                for i, event in enumerate(events):
+                    if 0 < i < pieces:
+                        time.sleep(delay)
+                    self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self._end_stream()
+
+            def _proxy(self, body):
+                """录制模式：转发到真实接口，流式响应逐行转发，结束后登记一条记录"""
+                headers = {"Authorization": self.headers.get("Authorization", ""), "Content-Type": "application/json"}
+                start = time.perf_counter()
+                pieces, usage, ttft = [], None, None
+                with server._upstream().stream("POST", server.upstream + "/chat/completions", json=body,
+                                               headers=headers) as response:
+                    if response.status_code >= 400 or not body.get("stream"):
+                        data = response.read()
+                        self._send_raw(response.status_code, data,
+                                       response.headers.get("Content-Type", "application/json"))
+                        if response.status_code >= 400:
+                            return
+                        payload = json.loads(data)
+                        pieces.append(payload["choices"][0]["message"].get("content") or "")
+                        usage = payload.get("usage")
+                        ttft = time.perf_counter() - start
+                    else:
+                        self._begin_stream()
+                        for line in response.iter_lines():
+                            if not line.startswith("data:") or line[5:].strip() == "[DONE]":
+                                continue
+                            self._write_chunk(f"{line}\n\n".encode("utf-8"))
+                            payload = json.loads(line[5:])
+                            usage = payload.get("usage") or usage
+                            for choice in payload.get("choices") or []:
+                                text = (choice.get("delta") or {}).get("content")
+                                if text:
+                                    ttft = ttft if ttft is not None else time.perf_counter() - start
+                                    pieces.append(text)
+                        self._end_stream()
+                server._record(body, "".join(pieces), usage, ttft, time.perf_counter() - start)
+
+        return Handler
+
+    # ---- 录制 ----
+    def _upstream(self):
+        with self._lock:
+            if self._upstream_http is None:
+                self._upstream_http = httpx.Client(timeout=httpx.Timeout(300, connect=10))
+            return self._upstream_http
+
+    def _record(self, body, content, usage, ttft, latency):
+        messages = body.get("messages", [])
+        entry = {"key": request_key(body.get("model", ""), messages), "role": request_role(messages),
+                 "model": body.get("model", ""), "content": content, "usage": usage,
+                 "ttft": None if ttft is None else round(ttft, 4), "latency": round(latency, 4)}
+        with self._lock:
+            with open(self.record_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.stats["recorded"] += 1
+
+    # ---- 回放 ----
+    def _plan(self, model, messages, profile):
+        """返回 (回复, usage, 首token等待秒数, 生成秒数)；配置中未给出的延迟取录制值"""
+        entry = None
+        if self.transcript is not None:
+            entry, how = self.transcript.match(model, messages)
+            with self._lock:
+                self.stats["replayed"][how] += 1
+        reply = entry["content"] if entry else self.reply
+        usage = (entry or {}).get("usage") or self._usage(reply)
+        recorded_ttft = (entry or {}).get("ttft") or 0.0
+        ttft = profile.get("ttft", recorded_ttft)
+        rate = profile.get("tokens_per_s")
+        if rate is None:
+            generation = max(0.0, ((entry or {}).get("latency") or 0.0) - recorded_ttft)
+        else:
+            generation = usage["completion_tokens"] / rate if rate else 0.0
+        jitter = profile.get("jitter", 0)
+        if jitter:
+            ttft *= random.uniform(1 - jitter, 1 + jitter)
+            generation *= random.uniform(1 - jitter, 1 + jitter)
+        return reply, usage, ttft, generation
+
+    def _usage(self, reply=None):
+        completion = max(1, len(self.reply if reply is None else reply) // 2)
+        return {"prompt_tokens": 10, "completion_tokens": completion, "total_tokens": 10 + completion}
+
+    def _completion(self, model, reply=None, usage=None):
+        reply = self.reply if reply is None else reply
+        return {"id": f"mock-{time.time_ns()}", "object": "chat.completion", "created": int(time.time()),
+                "model": model, "usage": usage or self._usage(reply),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": reply}}]}
+
+    def _chunks(self, model, reply=None, usage=None):
+        reply = self.reply if reply is None else reply
+        base = {"id": f"mock-{time.time_ns()}", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model}
+        for i in range(0, len(reply), self.chunk_chars):
+            yield {**base, "choices": [{"index": 0, "delta": {"content": reply[i:i + self.chunk_chars]},
+                                        "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield {**base, "choices": [], "usage": usage or self._usage(reply)}
+
+
+# 命令行：
+#   录制  python -m utils.mock_server record transcripts/run.jsonl
+#         DEEPSEEK_BASE_URL=http://127.0.0.1:8765/v1 python main.py
+#   回放  python -m utils.mock_server replay transcripts/run.jsonl --ttft 0.5 --tokens-per-s 40
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地OpenAI兼容模拟服务器：录制真实对话或离线回放')
+    parser.add_argument('mode', choices=['record', 'replay'])
+    parser.add_argument('transcript', help="录制写入 / 回放读取的JSONL文件")
+    parser.add_argument('--upstream', default=DEFAULT_UPSTREAM, help="录制时转发到的真实接口")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--ttft', type=float, default=None, help="回放的首token等待秒数，默认取录制值")
+    parser.add_argument('--tokens-per-s', type=float, default=None, help="回放的生成速度，0为不限速，默认取录制值")
+    parser.add_argument('--jitter', type=float, default=0.0, help="回放延迟的随机浮动比例")
+    cli = parser.parse_args()
+
+    profile = {key: value for key, value in
+               (("ttft", cli.ttft), ("tokens_per_s", cli.tokens_per_s), ("jitter", cli.jitter)) if value is not None}
+    if cli.mode == 'record':
+        server = MockLLMServer(cli.host, cli.port, upstream=cli.upstream, record_path=cli.transcript)
+    else:
+        server = MockLLMServer(cli.host, cli.port, profiles={"*": profile}, transcript=cli.transcript)
+    print(f"{'录制' if cli.mode == 'record' else '回放'}服务已启动: DEEPSEEK_BASE_URL={server.base_url}（Ctrl+C 结束）")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    done = f"录制: {server.stats['recorded']}条" if cli.mode == 'record' else f"回放: {server.stats['replayed']}"
+    print(f"请求数: {server.stats['requests']} | {done}")
@@ -0,0 +1,127 @@
+# 📁 文件：utils/orchestrator.py
+# 异步编排：按依赖DAG调度各Agent，互不依赖的LLM请求并发发出，并按模型限制并发数
+
+import asyncio
+
+
+class Stage:
+    """DAG中的一个阶段
+
+    name: 阶段名，同时作为输出消息的 name
+    agent: 执行该阶段的Agent（需支持 a_generate_reply）
+    deps: 直接依赖的阶段或输入名；本阶段的上下文为全部祖先的输出，按定义顺序排列
+    fan_out: 可选，fan_out(outputs) -> [(标签, 子任务说明), ...]；返回多个子任务时并发请求，
+             结果按标签拼接为本阶段的一条消息
+    footer: fan_out 合并后追加的结尾语（例如交接给下一个角色的固定说法）
+    """
+
+    def __init__(self, name, agent, deps, fan_out=None, footer=None):
+        self.name = name
+        self.agent = agent
+        self.deps = list(deps)
+        self.fan_out = fan_out
+        self.footer = footer
+
+
+def split_code_chunks(code, max_lines=80):
+    """按顶层语句边界把代码切成不超过max_lines行的片段，返回 [(起始行, 结束行, 片段), ...]，行号从1开始"""
+    lines = code.splitlines()
+    if len(lines) <= max_lines:
+        return [(1, len(lines), code)]
+
+    # 顶层语句起点：无缩进且非空、非注释续行的位置
+    boundaries = [i for i, line in enumerate(lines)
+                  if line and not line[0].isspace() and not line.startswith((')', ']', '}'))]
+    chunks, start = [], 0
+    while start < len(lines):
+        limit = start + max_lines
+        cut = max((b for b in boundaries if start < b <= limit), default=None)
+        end = cut if cut is not None and limit < len(lines) else min(limit, len(lines))
+        chunks.append((start + 1, end, "\n".join(lines[start:end])))
+        start = end
+    return chunks
+
+
+class DagOrchestrator:
+    """按依赖关系并发运行各阶段
+
+    inputs 中的项作为无需LLM的伪阶段（可以是消息字典，也可以是尚未完成的awaitable，
+    例如仍在等待用户输入的提示词），依赖它们的阶段会在其就绪后才开始。
+    同一模型的并发请求数不超过 max_concurrency。
+    """
+
+    def __init__(self, stages, max_concurrency=4, on_reply=None):
+        self.stages = list(stages)
+        self.max_concurrency = max_concurrency
+        self.on_reply = on_reply  # on_reply(阶段名, 内容)，每个阶段完成时调用
+        self._limits = {}
+
+    @staticmethod
+    def model_of(agent):
+        llm_config = getattr(agent, "llm_config", None) or {}
+        config_list = llm_config.get("config_list") or [{}]
+        return config_list[0].get("model", "default")
+
+    def _limit(self, model):
+        if model not in self._limits:
+            self._limits[model] = asyncio.Semaphore(self.max_concurrency)
+        return self._limits[model]
+
+    async def _ask(self, agent, messages):
+        async with self._limit(self.model_of(agent)):
+            reply = await agent.a_generate_reply(messages=messages)
+        if isinstance(reply, dict):
+            reply = reply.get("content")
+        return reply or ""
+
+    def _ancestors(self, name, deps_of, order):
+        seen, stack = set(), list(deps_of.get(name, []))
+        while stack:
+            dep = stack.pop()
+            if dep not in seen:
+                seen.add(dep)
+                stack.extend(deps_of.get(dep, []))
+        return [n for n in order if n in seen]
+
+    async def run(self, inputs):
+        """运行全部阶段，返回按定义顺序排列的对话记录（与GroupChat消息格式一致）"""
+        order = list(inputs) + [stage.name for stage in self.stages]
+        deps_of = {stage.name: stage.deps for stage in self.stages}
+        for stage in self.stages:
+            unknown = [d for d in stage.deps if d not in order]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {unknown}")
+
+        outputs, tasks = {}, {}
+
+        async def resolve_input(name, value):
+            if asyncio.isfuture(value) or asyncio.iscoroutine(value):
+                value = await value
+            outputs[name] = value
+
+        async def run_stage(stage):
+            await asyncio.gather(*(tasks[d] for d in stage.deps))
+            context = [outputs[n] for n in self._ancestors(stage.name, deps_of, order)]
+            jobs = stage.fan_out({n: m["content"] for n, m in outputs.items()}) if stage.fan_out else None
+            if jobs and len(jobs) > 1:
+                replies = await asyncio.gather(*(
+                    self._ask(stage.agent, context + [{"role": "user", "content": instruction}])
+                    for _, instruction in jobs))
+                parts = [f"【{label}】\n{reply.strip()}" for (label, _), reply in zip(jobs, replies)]
+                if stage.footer:
+                    parts.append(stage.footer)
+                content = "\n\n".join(parts)
+            else:
+                extra = [{"role": "user", "content": jobs[0][1]}] if jobs else []
+                content = await self._ask(stage.agent, context + extra)
+            outputs[stage.name] = {"role": "user", "name": stage.name, "content": content}
+            if self.on_reply:
+                self.on_reply(stage.name, content)
+
+        # 伪阶段与各阶段都先建成任务，依赖关系由 run_stage 内的 gather 保证
+        for name, value in inputs.items():
+            tasks[name] = asyncio.ensure_future(resolve_input(name, value))
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+        await asyncio.gather(*tasks.values())
+        return [outputs[name] for name in order]
@@ -0,0 +1,86 @@
+# 📁 文件：utils/patching.py
+# 统一diff补丁：应用Agent输出的unified diff并校验结果，生成版本之间的增量
+
+import re
+import difflib
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+DIFF_LANGUAGES = ("diff", "patch", "udiff")
+
+
+class PatchError(ValueError):
+    """补丁无法干净地应用：格式错误、上下文与当前代码不符，或应用后的代码无法编译"""
+
+
+def parse_hunks(diff_text):
+    """解析unified diff，返回 [{"start": 旧文件起始行, "lines": [(标记, 文本), ...]}, ...]
+
+    LLM给出的 @@ 头中的行数经常不准，这里只取起始行作为定位参考，hunk范围以实际内容为准。
+    """
+    hunks, current = [], None
+    lines = diff_text.splitlines()
+    for i, line in enumerate(lines):
+        header = HUNK_HEADER.match(line)
+        if header:
+            current = {"start": int(header.group(1)), "lines": []}
+            hunks.append(current)
+        elif line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            current = None  # 文件头
+        elif line.startswith("+++ ") and current is None:
+            continue
+        elif current is None:
+            if line.strip() and not line.startswith(("diff ", "index ")):
+                raise PatchError(f"hunk之外出现无法识别的行：{line[:60]}")
+        elif line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        elif line == "":
+            current["lines"].append((" ", ""))  # 空的上下文行常被去掉了行首空格
+        elif line[0] in " +-":
+            current["lines"].append((line[0], line[1:]))
+        else:
+            raise PatchError(f"第{len(hunks)}个hunk中出现无法识别的行：{line[:60]}")
+    return [hunk for hunk in hunks if hunk["lines"]]
+
+
+def _locate(lines, old, hint, lowest):
+    """在 lowest 之后寻找与 old 完全一致（忽略行尾空白）的位置，多处匹配时取离 hint 最近的"""
+    if not old:
+        return min(max(hint, lowest), len(lines))
+    target = [line.rstrip() for line in old]
+    matches = [i for i in range(lowest, len(lines) - len(old) + 1)
+               if [line.rstrip() for line in lines[i:i + len(old)]] == target]
+    if not matches:
+        return None
+    return min(matches, key=lambda i: abs(i - hint))
+
+
+def apply_patch(base, diff_text, check_syntax=True):
+    """把diff应用到 base 上，返回新代码；任一hunk无法定位或结果无法编译时抛出 PatchError"""
+    hunks = parse_hunks(diff_text)
+    if not hunks:
+        raise PatchError("补丁中没有任何hunk")
+    lines = base.splitlines()
+    result, position = [], 0
+    for n, hunk in enumerate(hunks, 1):
+        old = [text for tag, text in hunk["lines"] if tag != "+"]
+        new = [text for tag, text in hunk["lines"] if tag != "-"]
+        start = _locate(lines, old, hunk["start"] - 1, position)
+        if start is None:
+            raise PatchError(f"第{n}个hunk（约第{hunk['start']}行）的上下文与当前代码不匹配")
+        result.extend(lines[position:start])
+        result.extend(new)
+        position = start + len(old)
+    result.extend(lines[position:])
+    code = "\n".join(result)
+    if check_syntax:
+        try:
+            compile(code, "<patched>", "exec")
+        except SyntaxError as e:
+            raise PatchError(f"补丁应用后代码无法编译：第{e.lineno}行 {e.msg}") from e
+    return code
+
+
+def make_patch(old, new, name="model_code.py"):
+    """生成 old → new 的unified diff，apply_patch(old, make_patch(old, new)) == new"""
+    return "\n".join(difflib.unified_diff(old.splitlines(), new.splitlines(),
+                                          f"a/{name}", f"b/{name}", lineterm=""))
@@ -0,0 +1,80 @@
+# 📁 文件：utils/plotting.py
+# 绘图输出工具：交互显示，或在后台进程池中通过Agg后端直接写入磁盘，基准测试时可完全关闭
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+RENDER_MODES = ['show', 'save', 'off']
+
+
+def _render_to_file(path, draw, figsize, dpi, args, kwargs):
+    """在工作进程中作图并保存，不经过pyplot与任何显示后端"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    draw(fig, *args, **kwargs)
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+class FigureSink:
+    """统一的图像出口
+
+    mode='show' 时保持原有的 plt.show() 行为；mode='save' 时把作图任务提交到后台进程池，
+    由Agg后端写入 output_dir，调用方立即返回，最后用 wait() 收集结果；mode='off' 时不作图，用于基准测试。
+    draw 函数签名为 draw(fig, *args, **kwargs)，需为模块级函数以便跨进程传递。
+    """
+
+    def __init__(self, mode='show', output_dir=os.path.join('output', 'figures'), workers=2, fmt='png', dpi=100):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Invalid render mode. Must be one of {RENDER_MODES}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.workers = workers
+        self.fmt = fmt
+        self.dpi = dpi
+        self._count = 0
+        self._executor = None
+        self._futures = []
+
+    def __getstate__(self):
+        # 进程池不可序列化；所属对象被送入其他进程时只携带配置
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_futures'] = []
+        return state
+
+    def render(self, name, draw, *args, figsize=(12, 6), **kwargs):
+        """作图；save模式下返回写盘任务的Future"""
+        if self.mode == 'off':
+            return None
+        if self.mode == 'show':
+            import matplotlib.pyplot as plt
+            fig = plt.figure(figsize=figsize)
+            draw(fig, *args, **kwargs)
+            plt.show()
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._count += 1
+        path = os.path.join(self.output_dir, f"{self._count:02d}_{name}.{self.fmt}")
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        future = self._executor.submit(_render_to_file, path, draw, figsize, self.dpi, args, kwargs)
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        """等待所有已提交的图像写盘完成，返回文件路径列表"""
+        paths = [future.result() for future in self._futures]
+        self._futures = []
+        return paths
+
+    def close(self):
+        paths = self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        return paths
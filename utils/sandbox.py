@@ -0,0 +1,180 @@
+# 📁 文件：utils/sandbox.py
+# 本地沙箱执行：在受CPU/内存/时间限制的子进程中运行捕获到的代码版本，记录耗时、峰值内存、异常与生成的图片
+
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".svg", ".pdf")
+
+# 子进程中的引导脚本：先按环境变量设置资源上限，再运行代码、保存仍打开的matplotlib图、把结果写入json。
+# 上限在子进程自身中设置而不用 preexec_fn：后者在多线程的父进程中fork后调用，可能死锁
+BOOTSTRAP = r'''
+import os, json, sys, time, runpy, traceback
+try:
+    import resource
+    cpu_seconds = int(os.environ.pop("SANDBOX_CPU_SECONDS", "0"))
+    memory_mb = float(os.environ.pop("SANDBOX_MEMORY_MB", "0"))
+    if cpu_seconds:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if memory_mb:
+        limit = int(memory_mb * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+except ImportError:  # Windows 下没有 resource 模块，只保留超时限制
+    pass
+result = {"exception": None, "traceback": None}
+start = time.perf_counter()
+try:
+    runpy.run_path(sys.argv[1], run_name="__main__")
+except SystemExit as e:
+    if e.code not in (None, 0):
+        result["exception"] = f"SystemExit: {e.code}"
+except BaseException as e:
+    result["exception"] = f"{type(e).__name__}: {e}"
+    tb = e.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != sys.argv[1]:
+        tb = tb.tb_next  # 去掉引导脚本与runpy的栈帧
+    result["traceback"] = "".join(traceback.format_exception(type(e), e, tb or e.__traceback__))
+result["runtime"] = time.perf_counter() - start
+if "matplotlib.pyplot" in sys.modules:
+    try:
+        plt = sys.modules["matplotlib.pyplot"]
+        for num in plt.get_fignums():
+            plt.figure(num).savefig(f"figure_{num}.png")
+    except Exception:
+        pass
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_mb"] = rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+except ImportError:
+    result["peak_rss_mb"] = None
+with open(sys.argv[2], "w", encoding="utf-8") as f:
+    json.dump(result, f)
+'''
+
+
+def _tail(text, max_chars=3000):
+    return text if len(text) <= max_chars else "……\n" + text[-max_chars:]
+
+
+class ExecutionSandbox:
+    """在子进程池中执行代码版本
+
+    每个版本在 root/ver_N 目录下运行，目录中保存代码、stdout/stderr、result.json 与生成的图片。
+    timeout 为墙钟时间上限（秒），cpu_seconds / memory_mb 通过 setrlimit 限制（仅POSIX）。
+    """
+
+    def __init__(self, root="output/executions", workers=2, timeout=60, cpu_seconds=60, memory_mb=2048):
+        self.root = root
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.results = {}  # 版本号 -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sandbox")
+        os.makedirs(root, exist_ok=True)
+
+    def submit(self, version, agent_name, code):
+        future = self._executor.submit(self.run, version, agent_name, code)
+        with self._lock:
+            self.results[version] = future
+        return future
+
+    def latest(self):
+        """最近提交的版本号及其Future；尚未提交任何版本时返回 (None, None)"""
+        with self._lock:
+            if not self.results:
+                return None, None
+            version = max(self.results)
+            return version, self.results[version]
+
+    def run(self, version, agent_name, code):
+        workdir = os.path.join(self.root, f"ver_{version}")
+        shutil.rmtree(workdir, ignore_errors=True)
+        os.makedirs(workdir)
+        with open(os.path.join(workdir, "model.py"), "w", encoding="utf-8") as f:
+            f.write(code)
+
+        env = dict(os.environ, MPLBACKEND="Agg", PYTHONIOENCODING="utf-8", OPENBLAS_NUM_THREADS="1",
+                   SANDBOX_CPU_SECONDS=str(self.cpu_seconds or 0), SANDBOX_MEMORY_MB=str(self.memory_mb or 0))
+        result = {"version": version, "agent": agent_name, "status": "ok", "runtime": None,
+                  "peak_rss_mb": None, "exception": None, "traceback": None}
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-c", BOOTSTRAP, "model.py", "result.json"], cwd=workdir,
+                                env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            stdout, stderr = proc.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            stdout, stderr = proc.communicate()
+            result["status"] = "timeout"
+            result["exception"] = f"TimeoutError: 超过{self.timeout}秒未结束"
+        elapsed = time.perf_counter() - start
+
+        stdout, stderr = stdout.decode("utf-8", "replace"), stderr.decode("utf-8", "replace")
+        with open(os.path.join(workdir, "stdout.txt"), "w", encoding="utf-8") as f:
+            f.write(stdout)
+        with open(os.path.join(workdir, "stderr.txt"), "w", encoding="utf-8") as f:
+            f.write(stderr)
+
+        result_path = os.path.join(workdir, "result.json")
+        if os.path.exists(result_path):
+            with open(result_path, encoding="utf-8") as f:
+                result.update(json.load(f))
+        elif result["status"] == "ok":
+            # 子进程未能写出结果：通常是超出CPU时间被信号终止，或内存不足导致解释器崩溃
+            result["status"] = "cpu_limit" if proc.returncode == -24 else "crashed"
+            result["exception"] = f"进程异常退出（返回码 {proc.returncode}）"
+            result["traceback"] = _tail(stderr) or None
+        if result["exception"] and result["status"] == "ok":
+            result["status"] = "memory_limit" if result["exception"].startswith("MemoryError") else "error"
+        result["runtime"] = round(result["runtime"] if result["runtime"] is not None else elapsed, 3)
+        if result["peak_rss_mb"] is not None:
+            result["peak_rss_mb"] = round(result["peak_rss_mb"], 1)
+        result["stdout"] = _tail(stdout, 1000)
+        result["figures"] = sorted(os.path.join(folder, name) for folder, _, names in os.walk(workdir)
+                                   for name in names if name.lower().endswith(IMAGE_EXTENSIONS))
+        with open(result_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        return result
+
+    def wait(self):
+        """等待所有已提交的执行结束，按版本号返回结果列表"""
+        with self._lock:
+            futures = dict(self.results)
+        return [futures[version].result() for version in sorted(futures)]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def format_feedback(result):
+    """把执行结果整理成发给BugFinder/Fixer的文字"""
+    lines = [f"【本地执行结果】版本{result['version']}（{result['agent']}）：{result['status']}，"
+             f"耗时{result['runtime']}秒，峰值内存{result['peak_rss_mb']}MB"]
+    if result["figures"]:
+        lines.append(f"生成图片：{', '.join(os.path.basename(p) for p in result['figures'])}")
+    if result["exception"]:
+        lines.append(f"异常：{result['exception']}")
+    if result["traceback"]:
+        lines.append(f"```text\n{_tail(result['traceback'].strip())}\n```")
+    return "\n".join(lines)
+
+
+class ExecutionFeedback:
+    """注册为 process_all_messages_before_reply 钩子：等待最新版本执行完毕，把结果附加到发给LLM的消息末尾"""
+
+    def __init__(self, sandbox):
+        self.sandbox = sandbox
+
+    def __call__(self, messages):
+        version, future = self.sandbox.latest()
+        if future is None:
+            return messages
+        return list(messages) + [{"role": "user", "name": "Executor", "content": format_feedback(future.result())}]
@@ -0,0 +1,85 @@
+# 📁 文件：utils/speaker.py
+# 规则式发言人选择：按各角色固定的交接语句做有限状态机转移，不调用LLM；验证未通过时从Verifier回到Fixer
+
+# 交接语句 -> 下一位发言者
+HANDOFFS = {
+    "请Questioner提出科学问题": "Questioner",
+    "请Coder编写模型代码": "Coder",
+    "请BugFinder检查": "BugFinder",
+    "请Fixer修复": "Fixer",
+    "请Verifier验证": "Verifier",
+    "请Writer撰写论文": "Writer",
+}
+
+# 回复中没有交接语句时的默认下一位
+DEFAULT_NEXT = {
+    "Student": "Researcher",
+    "Researcher": "Questioner",
+    "Questioner": "Coder",
+    "Coder": "BugFinder",
+    "BugFinder": "Fixer",
+    "Fixer": "Verifier",
+    "Verifier": "Writer",
+}
+
+
+def find_handoff(content):
+    """返回回复中最后出现的交接语句对应的角色，没有则返回None"""
+    positions = [(content.rfind(phrase), role) for phrase, role in HANDOFFS.items() if phrase in content]
+    return max(positions)[1] if positions else None
+
+
+class HandoffSelector:
+    """作为 GroupChat 的 speaker_selection_method 使用
+
+    code_check: 可选，Verifier发言后调用，返回 (是否通过, 说明)，例如最新代码版本的本地执行结果；
+                不通过时即使Verifier放行也回到Fixer
+    before_select: 可选，每次选择前调用，用于先保存上一位发言者的代码
+    max_fix_loops: Verifier → Fixer 回退的最多次数，用尽后交给Writer
+    transitions 记录每次转移 (发言者, 下一位, 依据)，供运行报告使用；state()/restore() 用于检查点续跑。
+    """
+
+    def __init__(self, code_check=None, before_select=None, max_fix_loops=2):
+        self.code_check = code_check
+        self.before_select = before_select
+        self.max_fix_loops = max_fix_loops
+        self.fix_loops = 0
+        self.exhausted = False  # 回退次数用尽后未经验证交给了Writer
+        self.transitions = []
+
+    def __call__(self, last_speaker, groupchat):
+        if self.before_select is not None:
+            self.before_select()
+        content = (groupchat.messages[-1].get("content") or "") if groupchat.messages else ""
+        if "TERMINATE" in content:
+            return None
+        target, reason = self.next_role(last_speaker.name, content)
+        self.transitions.append((last_speaker.name, target, reason))
+        return groupchat.agent_by_name(target)
+
+    def state(self):
+        return {"fix_loops": self.fix_loops, "exhausted": self.exhausted,
+                "transitions": [list(t) for t in self.transitions]}
+
+    def restore(self, state):
+        self.fix_loops = state["fix_loops"]
+        self.exhausted = state["exhausted"]
+        self.transitions = [tuple(t) for t in state["transitions"]]
+
+    def next_role(self, name, content):
+        target = find_handoff(content)
+        reason = "交接语句"
+        if target is None or target == name:
+            target, reason = DEFAULT_NEXT.get(name, "Writer"), "默认顺序"
+        if name == "Verifier":
+            if target == "Writer" and self.code_check is not None:
+                passed, detail = self.code_check()
+                if not passed:
+                    target, reason = "Fixer", detail
+            if target == "Fixer":
+                if self.fix_loops >= self.max_fix_loops:
+                    self.exhausted = True
+                    return "Writer", f"已回退{self.fix_loops}次，不再修复"
+                self.fix_loops += 1
+                reason = f"验证未通过（第{self.fix_loops}次回退）：{reason}"
+        return target, reason